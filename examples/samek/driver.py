@@ -0,0 +1,165 @@
+# Copyright (c) 2025 JP Hutchins
+# SPDX-License-Identifier: MIT
+
+"""Run an event script through the Samek machine without a terminal.
+
+The script is a sequence of the events "a" to "h", each optionally repeated
+by a "*count" suffix on its group of events; whitespace separates groups and
+"#" starts a comment. For example, "abcdefgh*1000 ee*2" handles "abcdefgh"
+1000 times, then "e" four times.
+
+python -m examples.samek.driver script.txt --repeat 10 --profile samek.pstats
+"""
+
+import argparse
+import cProfile
+import pstats
+import re
+import sys
+from time import perf_counter_ns
+from typing import Any, Final, Iterable, NamedTuple
+
+from examples.samek.events import (
+	Event,
+	EventA,
+	EventB,
+	EventC,
+	EventD,
+	EventE,
+	EventF,
+	EventG,
+	EventH,
+)
+from examples.samek.headless import build, silenced
+from examples.samek.state import Context
+from spirea.sync import Node, hsm_handle_entries, hsm_handle_event
+
+MAP_CHAR_TO_EVENT: Final[dict[str, Event]] = {
+	"a": EventA(),
+	"b": EventB(),
+	"c": EventC(),
+	"d": EventD(),
+	"e": EventE(),
+	"f": EventF(),
+	"g": EventG(),
+	"h": EventH(),
+}
+
+GROUP: Final = re.compile(r"([a-h]+)(?:\*(\d+))?")
+
+
+def parse_script(script: str) -> list[Event]:
+	"""Parse an event script.
+
+	Args:
+		script (str): The script.
+
+	Returns:
+		list[Event]: The events.
+
+	Raises:
+		ValueError: If a group of the script is not events with an optional count.
+	"""
+
+	events: Final[list[Event]] = []
+	for line_number, line in enumerate(script.splitlines(), 1):
+		for group in line.partition("#")[0].split():
+			if (match := GROUP.fullmatch(group)) is None:
+				raise ValueError(f"Line {line_number}: {group!r} is not events a-h with a *count")
+			letters, count = match.groups()
+			events.extend([MAP_CHAR_TO_EVENT[char] for char in letters] * int(count or 1))
+	return events
+
+
+class Report(NamedTuple):
+	events: int
+	seconds: float
+	events_per_sec: float
+	ns_per_event: float
+	node: type[Node[Event, Context, Any]]
+	"""The state after the last event."""
+	context: Context
+
+
+def run_script(events: Iterable[Event], repeat: int = 1) -> Report:
+	"""Handle the events from the initial state of the machine with printing disabled.
+
+	The machine is built by `examples.samek.headless`, with the callbacks of
+	the example but without the `Mock` that records their calls.
+
+	Args:
+		events (Iterable[Event]): The events, e.g. from `parse_script`.
+		repeat (int, optional): The number of times to handle the events. Defaults to 1.
+
+	Returns:
+		Report: The throughput and the final state.
+	"""
+
+	script: Final = list(events) * repeat
+	context: Final = Context(foo=0)
+	s0: Final = build(Node)
+	s0._context = context
+
+	with silenced():
+		node = hsm_handle_entries(s0)
+		start: Final = perf_counter_ns()
+		for event in script:
+			node = hsm_handle_event(node, event)
+		elapsed: Final = perf_counter_ns() - start
+
+	count: Final = len(script)
+	return Report(
+		events=count,
+		seconds=elapsed / 1e9,
+		events_per_sec=count / elapsed * 1e9 if elapsed else 0.0,
+		ns_per_event=elapsed / count if count else 0.0,
+		node=node,
+		context=context,
+	)
+
+
+def main(argv: list[str] | None = None) -> int:
+	parser: Final = argparse.ArgumentParser(
+		prog="python -m examples.samek.driver",
+		description=__doc__,
+		formatter_class=argparse.RawDescriptionHelpFormatter,
+	)
+	parser.add_argument("script", help="the event script, - for stdin")
+	parser.add_argument("--repeat", type=int, default=1, help="times to run the script")
+	parser.add_argument("--profile", metavar="PATH", help="dump cProfile stats to a file")
+	parser.add_argument(
+		"--sort", default="cumulative", help="the pstats sort key of the printed profile"
+	)
+	parser.add_argument(
+		"--limit", type=int, default=20, help="the functions of the profile to print"
+	)
+	args: Final = parser.parse_args(argv)
+
+	if args.script == "-":
+		text = sys.stdin.read()
+	else:
+		with open(args.script) as file:
+			text = file.read()
+	try:
+		events: Final = parse_script(text)
+	except ValueError as error:
+		parser.error(str(error))
+
+	if args.profile is None:
+		report = run_script(events, args.repeat)
+	else:
+		with cProfile.Profile() as profiler:
+			report = run_script(events, args.repeat)
+		profiler.dump_stats(args.profile)
+		pstats.Stats(profiler).sort_stats(args.sort).print_stats(args.limit)
+
+	print(
+		f"{report.events} events in {report.seconds:.3f} s: "
+		f"{report.events_per_sec:,.0f} events/s, {report.ns_per_event:.0f} ns/event"
+	)
+	print(f"final state {report.node.__qualname__} {report.context}")
+	return 0
+
+
+if __name__ == "__main__":
+	sys.exit(main())
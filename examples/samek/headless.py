@@ -0,0 +1,193 @@
+# Copyright (c) 2025 JP Hutchins
+# SPDX-License-Identifier: MIT
+
+"""The machine of `examples/samek/hsm.py` for load tests and benchmarks.
+
+`build` creates the states, transitions and callbacks of `hsm.py` on any
+`Node` base, `spirea.sync.Node` or `spirea.asyncio.Node`, with the calls
+recorded by a `NullMock` instead of the `Mock` of the example, which keeps
+every call and would dominate the time of an event. `silenced` discards what
+the callbacks print.
+"""
+
+import contextlib
+import os
+from types import ModuleType
+from typing import Any, Callable, Final, Iterator, NamedTuple
+
+import examples.samek.s0 as s0_
+import examples.samek.s1 as s1_
+import examples.samek.s2 as s2_
+import examples.samek.s11 as s11_
+import examples.samek.s21 as s21_
+import examples.samek.s211 as s211_
+from examples.samek.events import (
+	EventA,
+	EventB,
+	EventC,
+	EventD,
+	EventE,
+	EventF,
+	EventG,
+	EventH,
+)
+from spirea.sync import HSMStatus
+
+
+class NullMock:
+	"""Stands in for the `Mock` of the example: every call returns itself, which is truthy."""
+
+	__slots__ = ()
+
+	def __getattr__(self, name: str) -> "NullMock":
+		return self
+
+	def __call__(self, *args: Any, **kwargs: Any) -> "NullMock":
+		return self
+
+
+class _Handler(NamedTuple):
+	event_type: type
+	run: Callable[[Any, Any], Any]
+	target: str | HSMStatus | None
+	"""The qualified name of the target node, a status, or None for the result of `run`."""
+
+
+class _State(NamedTuple):
+	qualname: str
+	module: ModuleType
+	handlers: tuple[_Handler, ...]
+	substates: tuple["_State", ...] = ()
+
+
+S211: Final = _State(
+	"s0.s2.s21.s211",
+	s211_,
+	(_Handler(EventD, s211_.run_d, "s0.s2.s21"), _Handler(EventG, s211_.run_g, "s0")),
+)
+S21: Final = _State(
+	"s0.s2.s21",
+	s21_,
+	(_Handler(EventB, s21_.run_b, "s0.s2.s21.s211"), _Handler(EventH, s21_.run_h, None)),
+	(S211,),
+)
+S2: Final = _State(
+	"s0.s2",
+	s2_,
+	(_Handler(EventC, s2_.run_c, "s0.s1"), _Handler(EventF, s2_.run_f, "s0.s1.s11")),
+	(S21,),
+)
+S11: Final = _State("s0.s1.s11", s11_, (_Handler(EventG, s11_.run_g, "s0.s2.s21.s211"),))
+S1: Final = _State(
+	"s0.s1",
+	s1_,
+	(
+		_Handler(EventA, s1_.run_a, HSMStatus.SELF_TRANSITION),
+		_Handler(EventB, s1_.run_b, "s0.s1.s11"),
+		_Handler(EventC, s1_.run_c, "s0.s2"),
+		_Handler(EventD, s1_.run_d, "s0"),
+		_Handler(EventF, s1_.run_f, "s0.s2.s21.s211"),
+	),
+	(S11,),
+)
+S0: Final = _State("s0", s0_, (_Handler(EventE, s0_.run_e, "s0.s2.s21.s211"),), (S1, S2))
+"""The states of `hsm.py`: each callback records its call, then calls its module."""
+
+
+def build(base: type, mock: Any = None) -> Any:
+	"""Create the machine of `hsm.py` on a `Node` base.
+
+	The root needs a context, e.g. `root._context = Context(foo=0)`, before its
+	entries are done.
+
+	Args:
+		base (type): The `Node` base class, `spirea.sync.Node` or `spirea.asyncio.Node`.
+		mock (Any, optional): What records the calls of the callbacks, like the
+			`Mock` of `hsm.py`. Defaults to a `NullMock`, which records nothing.
+
+	Returns:
+		Type[Node]: The root node, `s0`.
+	"""
+
+	recorder: Final = NullMock() if mock is None else mock
+	nodes: Final[dict[str, Any]] = {}
+
+	def handler(name: str, spec: _Handler) -> Callable[[Any, Any], Any]:
+		record: Final = getattr(recorder, f"{name}_run")
+		run: Final = spec.run
+		target: Final = spec.target
+
+		if target is None:
+
+			def handle(event: Any, context: Any) -> Any:
+				record(event, context)
+				return run(event, context)
+
+		elif isinstance(target, HSMStatus):
+
+			def handle(event: Any, context: Any) -> Any:
+				record(event, context)
+				run(event, context)
+				return target
+
+		else:
+
+			def handle(event: Any, context: Any) -> Any:
+				record(event, context)
+				run(event, context)
+				return nodes[target]
+
+		return handle
+
+	def node(state: _State) -> Any:
+		name: Final = state.qualname.rpartition(".")[2]
+		module: Final = state.module
+		record_entry: Final = getattr(recorder, f"{name}_entry")
+		record_exit: Final = getattr(recorder, f"{name}_exit")
+		# the entry of each node of `hsm.py` enters its first substate
+		next_name: Final = state.substates[0].qualname if state.substates else state.qualname
+
+		def entry(context: Any) -> tuple[Any, Any]:
+			nodes[state.qualname]._context = context
+			record_entry(context)
+			module.entry(context)
+			return nodes[next_name], context
+
+		def exit(context: Any) -> None:
+			record_exit(context)
+			module.exit(context)
+
+		namespace: Final[dict[str, Any]] = {
+			"__module__": __name__,
+			"__qualname__": state.qualname,
+			"entry": staticmethod(entry),
+			"exit": staticmethod(exit),
+		}
+		for substate in state.substates:
+			namespace[substate.qualname.rpartition(".")[2]] = node(substate)
+		namespace["EventHandlers"] = type(
+			"EventHandlers",
+			(),
+			{
+				"__annotations__": {
+					f"on_{spec.event_type.__name__}": Callable[[spec.event_type, Any], Any]
+					for spec in state.handlers
+				},
+				**{
+					f"on_{spec.event_type.__name__}": handler(name, spec) for spec in state.handlers
+				},
+			},
+		)
+
+		nodes[state.qualname] = type(base)(name, (base,), namespace)
+		return nodes[state.qualname]
+
+	return node(S0)
+
+
+@contextlib.contextmanager
+def silenced() -> Iterator[None]:
+	"""Discard what the callbacks print."""
+
+	with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+		yield
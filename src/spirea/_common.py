@@ -1,8 +1,27 @@
 # Copyright (c) 2025 JP Hutchins
 # SPDX-License-Identifier: MIT
 
+import inspect
+import itertools
+import logging
+import weakref
+from array import array
+from collections import deque
+from contextvars import ContextVar
 from enum import Enum, unique
-from typing import Any, Callable, Final, NamedTuple, Type, TypeVar, _ProtocolMeta, final
+from typing import (
+	Any,
+	Callable,
+	Final,
+	Generic,
+	Iterable,
+	NamedTuple,
+	Protocol,
+	Type,
+	TypeVar,
+	_ProtocolMeta,
+	final,
+)
 
 from typing_extensions import TypeIs
 
@@ -10,6 +29,9 @@ TEvent = TypeVar("TEvent")
 TContext = TypeVar("TContext")
 TNode = TypeVar("TNode")
 TEntryContexts = TypeVar("TEntryContexts", contravariant=True)
+TCallback = TypeVar("TCallback", bound=Callable[..., Any])
+
+logger: Final = logging.getLogger(__name__)
 
 
 class NoTransition(NamedTuple): ...
@@ -33,14 +55,59 @@ def is_hsm_status(node: Type[TNode] | HSMStatus) -> TypeIs[HSMStatus]:
 	return isinstance(node, HSMStatus)
 
 
+def pure(callback: TCallback) -> TCallback:
+	"""Mark an event handler, `entry` or `exit` as pure.
+
+	A pure callback has no side effects and its result depends on neither the
+	event nor the context: a handler always returns the same node or status,
+	an `entry` always returns the same next node and an `exit` does nothing.
+	Transitions made only of pure callbacks can be compiled into tables.
+
+	>>> handler = pure(lambda event, context: HSMStatus.NO_TRANSITION)
+	>>> is_pure(handler)
+	True
+	"""
+
+	callback.__hsm_pure__ = True  # type: ignore[attr-defined]
+	return callback
+
+
+def is_pure(callback: Callable[..., Any]) -> bool:
+	return getattr(callback, "__hsm_pure__", False) is True
+
+
 def _is_hsm_node(cls: Any) -> TypeIs[Type["NodeMeta"]]:
 	return hasattr(cls, "__hsm_node")
 
 
+class TransitionPlan(NamedTuple, Generic[TNode]):
+	"""The precomputed steps of a transition from an active node to a target node."""
+
+	exits: tuple[Type[TNode], ...]
+	"""The nodes to exit, from the active node up to, but excluding, the LCA."""
+
+	lca: Type[TNode] | None
+	"""The least common ancestor of the handling node and the target node."""
+
+	entries: tuple[Type[TNode], ...]
+	"""The nodes to enter, from below the LCA down to the target node."""
+
+
 class _NodeMixin:
+	_id: int
 	_superstate: type | None
 	_substates: tuple[type, ...]
+	_depth: int
+	_ancestors: tuple[type, ...]
 	_context: Any
+	_event_handlers: tuple[tuple[Any, Callable[..., Any]], ...]
+	_event_dispatch: dict[type, Callable[..., Any] | None]
+	_transition_plans: dict[tuple[type, type], "TransitionPlan[Any]"]
+	_coroutine_callbacks: frozenset[Callable[..., Any]]
+
+
+_node_ids: Final = itertools.count()
+_nodes_by_id: Final[weakref.WeakValueDictionary[int, type]] = weakref.WeakValueDictionary()
 
 
 class _NodeMeta(type, _NodeMixin):
@@ -52,6 +119,8 @@ class _NodeMeta(type, _NodeMixin):
 	) -> "_NodeMeta":
 		dct["__hsm_node"] = True
 		node_cls = super().__new__(cls, name, bases, dct)
+		node_cls._id = next(_node_ids)
+		_nodes_by_id[node_cls._id] = node_cls
 		node_cls._superstate = None
 
 		substates: Final[list[type]] = []
@@ -62,6 +131,16 @@ class _NodeMeta(type, _NodeMixin):
 		node_cls._substates = tuple(substates)
 		del substates
 
+		# Nested nodes are created before their superstate, so the ancestry of
+		# the whole subtree is refreshed each time a superstate is created.
+		_hsm_set_ancestry(node_cls)
+
+		# The dispatch table is owned by each node class so that lookups that
+		# are cached at runtime never leak into a base or sibling node.
+		node_cls._event_dispatch = {}
+		node_cls._transition_plans = {}
+		node_cls._coroutine_callbacks = _hsm_get_coroutine_callbacks(node_cls)
+
 		if not hasattr(node_cls, "EventHandlers"):
 			return node_cls
 
@@ -86,7 +165,9 @@ class _NodeMeta(type, _NodeMixin):
 					getattr(node_cls.EventHandlers, name),
 				)
 			)
-		node_cls._event_handlers = tuple(event_handlers)  # type: ignore[attr-defined]
+		node_cls._event_handlers = tuple(event_handlers)
+		node_cls._event_dispatch = _hsm_compile_event_dispatch(node_cls._event_handlers)
+		node_cls._coroutine_callbacks = _hsm_get_coroutine_callbacks(node_cls)
 		node_cls._context = None
 		del event_handlers
 
@@ -97,15 +178,499 @@ class _NodeMeta(type, _NodeMixin):
 class NodeMeta(_NodeMeta, _ProtocolMeta): ...
 
 
+class ContextStore(Protocol):
+	"""Where the engines read and write the context of each node."""
+
+	def __getitem__(self, node: type, /) -> Any: ...
+
+	def __setitem__(self, node: type, context: Any, /) -> None: ...
+
+
+@final
+class _NodeContexts:
+	"""The `ContextStore` of the class-level `_context` of each node."""
+
+	__slots__ = ()
+
+	def __getitem__(self, node: type, /) -> Any:
+		return node._context  # type: ignore[attr-defined]
+
+	def __setitem__(self, node: type, context: Any, /) -> None:
+		node._context = context  # type: ignore[attr-defined]
+
+
+NODE_CONTEXTS: Final = _NodeContexts()
+
+
+@final
+class PostedEvents(deque[Any]):
+	"""A queue of the events posted with `hsm_post`.
+
+	Args:
+		machine (Machine, optional): The machine that the events are posted to,
+			or None for the node API and machine pools. Defaults to None.
+	"""
+
+	__slots__ = ("machine",)
+
+	def __init__(self, machine: "Machine | None" = None) -> None:
+		super().__init__()
+		self.machine: Final = machine
+
+
+@final
+class RunningStep:
+	"""The queue of the events posted by the callbacks of the step that is running.
+
+	The synchronous engine runs a step to completion without yielding to
+	other tasks, so it swaps its queue in and out of the `RunningStep` of the
+	context in place; setting a context variable instead would allocate a
+	context and a token on every step. The asyncio engine, whose steps
+	interleave, sets a `RunningStep` of its own for each step.
+
+	A `RunningStep` is shared by the contexts that are copied from the one
+	that set it, so the synchronous engine is not thread-safe across copied
+	contexts: a thread that runs machines in a copied context must first set
+	a `RunningStep` of its own, as the callbacks of `spirea.asyncio.blocking`
+	do.
+
+	Args:
+		posted (PostedEvents, optional): The queue of the running step. Defaults to None.
+	"""
+
+	__slots__ = ("posted", "spare")
+
+	def __init__(self, posted: PostedEvents | None = None) -> None:
+		self.posted = posted
+		self.spare: PostedEvents | None = None
+		"""An empty queue that the node API reuses for its next step."""
+
+
+RUNNING_STEP: Final[ContextVar[RunningStep]] = ContextVar("RUNNING_STEP")
+
+
+def hsm_get_running_step() -> RunningStep:
+	"""Get the `RunningStep` of the current context, setting one on first use."""
+
+	step = RUNNING_STEP.get(None)
+	if step is None:
+		step = RunningStep()
+		RUNNING_STEP.set(step)
+	return step
+
+
+def hsm_get_posted_events() -> PostedEvents | None:
+	"""Get the queue of the step that is running, or None if no step is running."""
+
+	step: Final = RUNNING_STEP.get(None)
+	return None if step is None else step.posted
+
+
+def hsm_post(event: Any) -> None:
+	"""Post an event to the machine whose callback is running.
+
+	The event is handled after the current event, and after the events that
+	were posted before it, have been handled to completion, instead of
+	recursively from inside the callback.
+
+	Args:
+		event (TEvent): The event to post.
+
+	Raises:
+		RuntimeError: If no step of a machine is running.
+	"""
+
+	posted: Final = hsm_get_posted_events()
+	if posted is None:
+		raise RuntimeError("hsm_post must be called from the callback of a running machine")
+	posted.append(event)
+
+
+type TraceHook = Callable[[Any, Any, Any, Any], None]
+"""Called with the source node, the event, the handling node and the result of each step."""
+
+
+@final
+class _Trace:
+	"""The trace hook that the engines read once per call."""
+
+	__slots__ = ("hook",)
+
+	def __init__(self) -> None:
+		self.hook: TraceHook | None = None
+
+
+TRACE: Final = _Trace()
+
+
+def hsm_set_trace_hook(hook: TraceHook | None) -> TraceHook | None:
+	"""Set the function that traces each event handled by the engines.
+
+	The hook is called once per event with the node that got the event, the
+	event, the node whose handler handled it (the root if it was unhandled) and
+	the handler's result, before any exits or entries are done. Tracing costs a
+	single check per event when no hook is set.
+
+	>>> previous = hsm_set_trace_hook(hsm_log_trace)
+	>>> hsm_set_trace_hook(previous) is hsm_log_trace
+	True
+
+	Args:
+		hook (TraceHook | None): The trace hook, or None to disable tracing.
+
+	Returns:
+		TraceHook | None: The previous trace hook.
+	"""
+
+	previous: Final = TRACE.hook
+	TRACE.hook = hook
+	return previous
+
+
+@final
+@unique
+class Callback(Enum):
+	"""The kinds of callback that a `LatencyRecorder` times."""
+
+	ENTRY = "entry"
+	EXIT = "exit"
+	HANDLER = "handler"
+
+
+class LatencyRecorder(Protocol):
+	"""Where the engines record how long each callback took when profiling."""
+
+	def record(
+		self, node: Any, callback: Callback, event_type: type | None, latency_ns: int, /
+	) -> None: ...
+
+
+@final
+class _Profile:
+	"""The latency recorder that the engines read once per call."""
+
+	__slots__ = ("recorder",)
+
+	def __init__(self) -> None:
+		self.recorder: LatencyRecorder | None = None
+
+
+PROFILE: Final = _Profile()
+
+
+def hsm_set_latency_recorder(recorder: LatencyRecorder | None) -> LatencyRecorder | None:
+	"""Set where the engines record the latency of each `entry`, `exit` and handler.
+
+	The event type of an `entry` or `exit` is the type of the event that caused
+	the transition, or None for `hsm_handle_entries`. Profiling costs a single
+	check per callback when no recorder is set.
+
+	Args:
+		recorder (LatencyRecorder | None): The recorder, or None to disable profiling.
+
+	Returns:
+		LatencyRecorder | None: The previous recorder.
+	"""
+
+	previous: Final = PROFILE.recorder
+	PROFILE.recorder = recorder
+	return previous
+
+
+class TimeoutService(Protocol):
+	"""A timer service whose timeouts are cancelled when the node that armed them exits."""
+
+	def exited(self, node: Any, /) -> None: ...
+
+
+@final
+class _Timers:
+	"""The timeout service that the engines read once per transition."""
+
+	__slots__ = ("service",)
+
+	def __init__(self) -> None:
+		self.service: TimeoutService | None = None
+
+
+TIMERS: Final = _Timers()
+
+
+def hsm_set_timeout_service(service: TimeoutService | None) -> TimeoutService | None:
+	"""Set the timer service that is told about each exit.
+
+	Args:
+		service (TimeoutService | None): The service, or None to disable timeouts.
+
+	Returns:
+		TimeoutService | None: The previous service.
+	"""
+
+	previous: Final = TIMERS.service
+	TIMERS.service = service
+	return previous
+
+
+def hsm_log_trace(source: Any, event: Any, handling_node: Any, result: Any) -> None:
+	"""A trace hook that logs each step at the DEBUG level."""
+
+	if not logger.isEnabledFor(logging.DEBUG):
+		return
+	if result is HSMStatus.NO_TRANSITION:
+		logger.debug("No transition for %r in state %s", event, handling_node.__name__)
+	elif result is HSMStatus.EVENT_UNHANDLED:
+		logger.debug(
+			"Unhandled event %r in state %s, reached root state %s",
+			event,
+			source.__name__,
+			handling_node.__name__,
+		)
+	elif result is HSMStatus.SELF_TRANSITION:
+		logger.debug("Self-transition for %r in state %s", event, handling_node.__name__)
+	else:
+		logger.debug(
+			"Transition for %r from state %s to %s in state %s",
+			event,
+			source.__name__,
+			result.__name__,
+			handling_node.__name__,
+		)
+
+
+@final
+class Machine:
+	"""An instance of a state machine: its current node and the context of each node.
+
+	The node classes only describe the machine, so any number of instances can
+	share one node tree.
+
+	Args:
+		node (Type[Node]): The initial node, usually the root of the tree.
+		context (Any, optional): The context passed to the entry of `node`.
+			Defaults to None.
+	"""
+
+	__slots__ = ("node", "contexts", "posted")
+
+	def __init__(self, node: type, context: Any = None) -> None:
+		self.node: Any = node
+		self.contexts: Final[dict[type, Any]] = {node: context}
+		self.posted: Final = PostedEvents(self)
+		"""The events posted with `hsm_post` that the current step has yet to handle."""
+
+	def __repr__(self) -> str:
+		return f"{type(self).__name__}({self.node.__qualname__})"
+
+
+@final
+class MachinePool:
+	"""Many instances of a state machine stored as columns instead of objects.
+
+	The current node of each instance is an integer state id in `states`, and
+	the contexts of each node are a column in `contexts`, indexed like `states`.
+
+	Args:
+		node (Type[Node]): The initial node of every instance.
+		size (int): The number of instances.
+		contexts (Iterable[Any], optional): The context passed to the entry of
+			`node` for each instance. Defaults to None for every instance.
+	"""
+
+	__slots__ = ("states", "contexts")
+
+	def __init__(self, node: type, size: int, contexts: Iterable[Any] | None = None) -> None:
+		self.states: Final = array("q", (node._id,)) * size  # type: ignore[attr-defined]
+		self.contexts: Final[dict[type, list[Any]]] = {
+			node: [None] * size if contexts is None else list(contexts)
+		}
+		if len(self.contexts[node]) != size:
+			raise ValueError(f"Expected {size} contexts, got {len(self.contexts[node])}")
+
+	def __len__(self) -> int:
+		return len(self.states)
+
+	def __repr__(self) -> str:
+		return f"{type(self).__name__}(size={len(self)})"
+
+	def node(self, index: int) -> Any:
+		"""Get the current node of the instance at `index`."""
+
+		return hsm_get_node(self.states[index])
+
+	def group_by_state(self, indices: Iterable[int] | None = None) -> dict[Any, list[int]]:
+		"""Group instances by their current node.
+
+		Args:
+			indices (Iterable[int], optional): The instances to group. Defaults to
+				all instances.
+
+		Returns:
+			dict[Type[Node], list[int]]: The indices of the instances in each node.
+		"""
+
+		states: Final = self.states
+		groups: Final[dict[int, list[int]]] = {}
+		for index in range(len(states)) if indices is None else indices:
+			state = states[index]
+			if (group := groups.get(state)) is None:
+				groups[state] = [index]
+			else:
+				group.append(index)
+
+		return {hsm_get_node(state): group for state, group in groups.items()}
+
+
+@final
+class PoolContexts:
+	"""The `ContextStore` of one instance of a `MachinePool`, selected by `index`."""
+
+	__slots__ = ("columns", "size", "index")
+
+	def __init__(self, pool: MachinePool) -> None:
+		self.columns: Final = pool.contexts
+		self.size: Final = len(pool)
+		self.index = 0
+
+	def __getitem__(self, node: type, /) -> Any:
+		return self.columns[node][self.index]
+
+	def __setitem__(self, node: type, context: Any, /) -> None:
+		if (column := self.columns.get(node)) is None:
+			column = self.columns[node] = [None] * self.size
+		column[self.index] = context
+
+
+def hsm_get_node(state_id: int) -> Any:
+	"""Get the node class that `NodeMeta` assigned `state_id` to.
+
+	Raises:
+		KeyError: If there is no such node.
+	"""
+
+	return _nodes_by_id[state_id]
+
+
+def _hsm_set_ancestry(node: type) -> None:
+	"""Set the depth and the ancestors, from `node` to its root, of a subtree."""
+
+	superstate: Final = node._superstate  # type: ignore[attr-defined]
+	node._ancestors = (node,) if superstate is None else (node, *superstate._ancestors)  # type: ignore[attr-defined]
+	node._depth = len(node._ancestors) - 1  # type: ignore[attr-defined]
+	for substate in node._substates:  # type: ignore[attr-defined]
+		_hsm_set_ancestry(substate)
+
+
+def _hsm_get_coroutine_callbacks(node: type) -> frozenset[Callable[..., Any]]:
+	"""Get the `entry`, `exit` and event handlers of a node that must be awaited."""
+
+	callbacks: Final = [
+		getattr(node, "entry", None),
+		getattr(node, "exit", None),
+		*(handler for _, handler in getattr(node, "_event_handlers", ())),
+	]
+	return frozenset(callback for callback in callbacks if inspect.iscoroutinefunction(callback))
+
+
+def _hsm_compile_event_dispatch(
+	event_handlers: tuple[tuple[Any, Callable[..., Any]], ...],
+) -> dict[type, Callable[..., Any] | None]:
+	"""Precompute the handler of each event class declared in `event_handlers`.
+
+	Handlers are matched in declaration order, so a declared class maps to the
+	first handler whose event type it is a subclass of - the same handler that
+	`isinstance` matching picks for its instances. Event types that cannot be
+	checked with `issubclass` are left to `hsm_resolve_event_handler`.
+	"""
+
+	dispatch: Final[dict[type, Callable[..., Any] | None]] = {}
+	for event_type, _ in event_handlers:
+		if not isinstance(event_type, type) or event_type in dispatch:
+			continue
+		try:
+			dispatch[event_type] = next(
+				(
+					handler
+					for handled_type, handler in event_handlers
+					if issubclass(event_type, handled_type)
+				),
+				None,
+			)
+		except TypeError:
+			continue
+
+	return dispatch
+
+
+def hsm_resolve_event_handler(
+	node: Type[TNode],
+	event: TEvent,
+) -> Callable[..., Any] | None:
+	"""Find the handler of `node` for `event` and cache it by the event's type.
+
+	This is the slow path of the dispatch table built by `NodeMeta`: the first
+	handler whose event type matches with `isinstance` wins, and the result,
+	including the absence of a handler, is cached for `type(event)` so that the
+	next event of the same type is an O(1) lookup. Matching is assumed to depend
+	only on the type of the event.
+
+	Args:
+		node (Type[Node]): The node to find the handler in.
+		event (TEvent): The event to find the handler for.
+
+	Returns:
+		The handler, or `None` if the node does not handle the event.
+	"""
+
+	handler: Callable[..., Any] | None = None
+	for event_type, candidate in node._event_handlers:  # type: ignore[attr-defined]
+		if isinstance(event, event_type):
+			handler = candidate
+			break
+
+	node._event_dispatch[type(event)] = handler  # type: ignore[attr-defined]
+	return handler
+
+
+def hsm_get_event_handlers(
+	node: Type[TNode],
+	event: TEvent,
+) -> tuple[tuple[Type[TNode], Callable[..., Any]], ...]:
+	"""Get the handlers that `event` bubbles through from `node` up to the root.
+
+	Args:
+		node (Type[Node]): The node to start from.
+		event (TEvent): The event to find the handlers for.
+
+	Returns:
+		tuple[tuple[Type[Node], Callable], ...]: Each node that handles the event,
+			with its handler, from `node` up to the root.
+	"""
+
+	event_type: Final = type(event)
+	handlers: Final[list[tuple[Type[TNode], Callable[..., Any]]]] = []
+	for ancestor in node._ancestors:  # type: ignore[attr-defined]
+		try:
+			handler = ancestor._event_dispatch[event_type]
+		except KeyError:
+			handler = hsm_resolve_event_handler(ancestor, event)
+		if handler is not None:
+			handlers.append((ancestor, handler))
+	return tuple(handlers)
+
+
+def hsm_get_nodes(root: Type[TNode]) -> tuple[Type[TNode], ...]:
+	"""Get `root` and all of its substates, depth-first in declaration order."""
+
+	nodes: Final[list[Type[TNode]]] = [root]
+	for substate in root._substates:  # type: ignore[attr-defined]
+		nodes.extend(hsm_get_nodes(substate))
+	return tuple(nodes)
+
+
 def hsm_get_path_to_root(
 	node: Type[TNode],
 ) -> tuple[Type[TNode] | None, ...]:
-	path: Final[list[Type[TNode] | None]] = [node]
-	while node is not None:
-		node = node._superstate  # type: ignore[attr-defined]
-		path.append(node)
-
-	return tuple(path)
+	return (*node._ancestors, None)  # type: ignore[attr-defined]
 
 
 def hsm_get_lca(
@@ -117,3 +682,87 @@ def hsm_get_lca(
 			return node
 
 	return None
+
+
+def hsm_get_node_lca(
+	node1: Type[TNode],
+	node2: Type[TNode],
+) -> Type[TNode] | None:
+	"""Get the least common ancestor of two nodes in O(depth).
+
+	The deeper node is lifted to the depth of the other through its ancestors,
+	then both are walked up in lockstep until they meet.
+
+	Args:
+		node1 (Type[Node]): The first node.
+		node2 (Type[Node]): The second node.
+
+	Returns:
+		Type[Node] | None: The LCA, or `None` if the nodes do not share a root.
+	"""
+
+	depth1: Final[int] = node1._depth  # type: ignore[attr-defined]
+	depth2: Final[int] = node2._depth  # type: ignore[attr-defined]
+	if depth1 > depth2:
+		node1 = node1._ancestors[depth1 - depth2]  # type: ignore[attr-defined]
+	elif depth2 > depth1:
+		node2 = node2._ancestors[depth2 - depth1]  # type: ignore[attr-defined]
+
+	lca1: Type[TNode] | None = node1
+	lca2: Type[TNode] | None = node2
+	while lca1 is not lca2:
+		lca1 = lca1._superstate  # type: ignore[union-attr]
+		lca2 = lca2._superstate  # type: ignore[union-attr]
+
+	return lca1
+
+
+def hsm_get_transition_plan(
+	source: Type[TNode],
+	handler: Type[TNode],
+	target: Type[TNode],
+) -> TransitionPlan[TNode]:
+	"""Get the plan for a transition to `target` that was returned by `handler`.
+
+	Plans are computed on first use and memoized on the `source` node, so a
+	machine with a fixed set of transitions does no path computations once it
+	is warm.
+
+	Args:
+		source (Type[Node]): The active node, where the exits start from.
+		handler (Type[Node]): The node whose event handler returned `target`;
+			`source` or one of its superstates.
+		target (Type[Node]): The node to transition to.
+
+	Returns:
+		TransitionPlan: The exits, LCA and entries of the transition.
+	"""
+
+	plans: Final[dict[tuple[type, type], TransitionPlan[TNode]]] = source._transition_plans  # type: ignore[attr-defined]
+	try:
+		return plans[handler, target]
+	except KeyError:
+		pass
+
+	lca: Final = hsm_get_node_lca(handler, target)
+
+	# the exits from the source node to the LCA, or to the root if there is none
+	exits: Final[list[Type[TNode]]] = []
+	node: Type[TNode] | None = source
+	while node is not None and node != lca:
+		exits.append(node)
+		node = node._superstate  # type: ignore[attr-defined]
+
+	# the entries from past the LCA down to the target
+	target_ancestors: Final[tuple[Type[TNode], ...]] = target._ancestors  # type: ignore[attr-defined]
+	entry_count: Final[int] = (
+		len(target_ancestors) if lca is None else target._depth - lca._depth  # type: ignore[attr-defined]
+	)
+
+	plan: Final = TransitionPlan[TNode](
+		exits=tuple(exits),
+		lca=lca,
+		entries=target_ancestors[entry_count - 1 :: -1] if entry_count else (),
+	)
+	plans[handler, target] = plan
+	return plan
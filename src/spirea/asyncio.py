@@ -3,43 +3,95 @@
 
 """Hierarchical State Machine (HSM) API for asynchronous runtime."""
 
+import asyncio
+import contextvars
+import functools
+import inspect
 import logging
-from typing import Any, Awaitable, Callable, ClassVar, Final, Protocol, Type, assert_never
+from concurrent.futures import Executor
+from time import perf_counter_ns
+from typing import (
+	Any,
+	AsyncIterator,
+	Awaitable,
+	Callable,
+	ClassVar,
+	Coroutine,
+	Final,
+	Iterable,
+	Protocol,
+	Type,
+	final,
+	overload,
+)
 
 from spirea._common import (
+	NODE_CONTEXTS,
+	PROFILE,
+	RUNNING_STEP,
+	TIMERS,
+	TRACE,
+	Callback,
+	ContextStore,
 	HSMStatus,
+	LatencyRecorder,
+	Machine,
+	MachinePool,
 	NodeMeta,
+	PoolContexts,
+	PostedEvents,
+	RunningStep,
 	TContext,
 	TEntryContexts,
 	TEvent,
-	hsm_get_lca,
-	hsm_get_path_to_root,
+	TransitionPlan,
+	_hsm_compile_event_dispatch,
+	_hsm_get_coroutine_callbacks,
+	hsm_get_event_handlers,
+	hsm_get_posted_events,
+	hsm_get_transition_plan,
+	hsm_post,
+	hsm_resolve_event_handler,
 	is_hsm_status,
+	pure,
 )
 
 logger: Final = logging.getLogger(__name__)
 
 
-__all__ = ("HSMStatus",)  # re-exported from _common
+__all__ = ("HSMStatus", "Machine", "MachinePool", "hsm_post", "pure")  # re-exported from _common
 
 
 class Node(Protocol[TEvent, TContext, TEntryContexts], metaclass=NodeMeta):
-	"""The asynchronous `Protocol` for a hierarchical state machine node."""
+	"""The asynchronous `Protocol` for a hierarchical state machine node.
+
+	The `entry`, `exit` and event handlers may be coroutine functions or plain
+	functions. The metaclass records which are coroutine functions, using
+	`inspect.iscoroutinefunction`, and only those are awaited. A plain function
+	that returns an awaitable, e.g. one that returns the coroutine of another
+	function, must be marked with `inspect.markcoroutinefunction`, or calling it
+	raises `TypeError`.
+	"""
 
 	@staticmethod
-	async def entry(
+	def entry(
 		context: TEntryContexts,
-	) -> tuple[type["Node[TEvent, TContext, Any]"], TContext]: ...
+	) -> (
+		tuple[type["Node[TEvent, TContext, Any]"], TContext]
+		| Awaitable[tuple[type["Node[TEvent, TContext, Any]"], TContext]]
+	): ...
 
 	@staticmethod
-	async def exit(context: TContext) -> None: ...
+	def exit(context: TContext) -> None | Awaitable[None]: ...
 
 	_event_handlers: tuple[
 		tuple[
 			Type[TEvent],
 			Callable[
 				[TEvent, TContext],
-				Awaitable[Type["Node[TEvent, TContext, Any]"] | HSMStatus],
+				Type["Node[TEvent, TContext, Any]"]
+				| HSMStatus
+				| Awaitable[Type["Node[TEvent, TContext, Any]"] | HSMStatus],
 			],
 		],
 		...,
@@ -49,15 +101,193 @@ class Node(Protocol[TEvent, TContext, TEntryContexts], metaclass=NodeMeta):
 	_context: ClassVar[Any]
 
 
+@final
+class _Offload:
+	"""The executor that `blocking` callbacks run on."""
+
+	__slots__ = ("executor",)
+
+	def __init__(self) -> None:
+		self.executor: Executor | None = None
+
+
+OFFLOAD: Final = _Offload()
+
+
+def hsm_set_executor(executor: Executor | None) -> Executor | None:
+	"""Set the executor that `blocking` callbacks run on.
+
+	Args:
+		executor (Executor | None): The executor, e.g. a `ThreadPoolExecutor`,
+			or None for the default executor of the event loop.
+
+	Returns:
+		Executor | None: The previous executor.
+	"""
+
+	previous: Final = OFFLOAD.executor
+	OFFLOAD.executor = executor
+	return previous
+
+
+def _hsm_run_offloaded(
+	posted: PostedEvents | None, callback: Callable[..., Any], *args: Any
+) -> Any:
+	# the copied context shares the `RunningStep` of the event loop's context,
+	# which the synchronous engine mutates, so the thread gets one of its own
+	RUNNING_STEP.set(RunningStep(posted))
+	return callback(*args)
+
+
+def _hsm_offload(callback: Callable[..., Any]) -> Callable[..., Awaitable[Any]]:
+	if inspect.iscoroutinefunction(callback):
+		raise TypeError(f"{callback!r} is a coroutine function and cannot be blocking")
+
+	@functools.wraps(callback)
+	async def offloaded(*args: Any) -> Any:
+		# run in a copy of the context so that the callback can `hsm_post`
+		return await asyncio.get_running_loop().run_in_executor(
+			OFFLOAD.executor,
+			contextvars.copy_context().run,
+			_hsm_run_offloaded,
+			hsm_get_posted_events(),
+			callback,
+			*args,
+		)
+
+	return offloaded
+
+
+def _hsm_offload_node(node: Any) -> None:
+	"""Offload the plain `entry`, `exit` and event handlers of a node."""
+
+	def offload(callback: Callable[..., Any]) -> Callable[..., Any]:
+		# coroutine functions do not block the event loop
+		return callback if inspect.iscoroutinefunction(callback) else _hsm_offload(callback)
+
+	for name in ("entry", "exit"):
+		if isinstance(callback := node.__dict__.get(name), staticmethod):
+			setattr(node, name, staticmethod(offload(callback.__func__)))
+	if "_event_handlers" in node.__dict__:
+		node._event_handlers = tuple(
+			(event_type, offload(handler)) for event_type, handler in node._event_handlers
+		)
+		node._event_dispatch = _hsm_compile_event_dispatch(node._event_handlers)
+	node._coroutine_callbacks = _hsm_get_coroutine_callbacks(node)
+
+
+@overload
+def blocking[TNodeClass: type](callback: TNodeClass) -> TNodeClass: ...
+
+
+@overload
+def blocking[**P, R](callback: Callable[P, R]) -> Callable[P, Coroutine[Any, Any, R]]: ...
+
+
+def blocking(callback: Callable[..., Any]) -> Callable[..., Any]:
+	"""Run a blocking `entry`, `exit` or event handler on an executor.
+
+	The callback is awaited like a coroutine function, so the machine still runs
+	to completion while other tasks on the event loop keep running. Decorating a
+	node class makes its own plain `entry`, `exit` and event handlers blocking
+	and leaves its coroutine functions as they are.
+
+	>>> @blocking
+	... def exit(context: list[int]) -> None:
+	... 	context.clear()
+	>>> inspect.iscoroutinefunction(exit)
+	True
+
+	Args:
+		callback (Callable | Type[Node]): A plain function, or a node class.
+
+	Returns:
+		Callable | Type[Node]: The coroutine function that runs the callback on the
+			executor set with `hsm_set_executor`, or the node class.
+
+	Raises:
+		TypeError: If `callback` is a coroutine function.
+	"""
+
+	if isinstance(callback, NodeMeta):
+		_hsm_offload_node(callback)
+		return callback
+	return _hsm_offload(callback)
+
+
 def _hsm_get_event_handler(
 	node: Type[Node[TEvent, TContext, Any]],
 	event: TEvent,
-) -> Callable[[TEvent, TContext], Awaitable[Type[Node[TEvent, TContext, Any]] | HSMStatus]] | None:
-	for eventT, handler in node._event_handlers:
-		if isinstance(event, eventT):
-			return handler
+) -> Callable[..., Any] | None:
+	try:
+		return node._event_dispatch[type(event)]
+	except KeyError:
+		return hsm_resolve_event_handler(node, event)
+
 
-	return None
+# the types of the results of callbacks that are not awaitable, which skip the slower check
+_HSM_PLAIN_RESULTS: Final = frozenset((type(None), tuple, type, NodeMeta, HSMStatus))
+
+
+def _hsm_check_result(callback: Callable[..., Any], result: Any) -> None:
+	"""Raise `TypeError` if a callback that is not a coroutine function returned an awaitable."""
+
+	if inspect.isawaitable(result):
+		if inspect.iscoroutine(result):
+			result.close()
+		raise TypeError(
+			f"{callback!r} returned an awaitable but is not a coroutine function; "
+			"mark it with inspect.markcoroutinefunction"
+		)
+
+
+async def _hsm_timed(
+	recorder: LatencyRecorder,
+	node: Type[Node[Any, Any, Any]],
+	callback: Callback,
+	event_type: type | None,
+	function: Callable[..., Any],
+	*args: Any,
+) -> Any:
+	"""Call a callback of `node` and record its latency."""
+
+	start: Final = perf_counter_ns()
+	try:
+		if function in node._coroutine_callbacks:
+			return await function(*args)
+		result: Final = function(*args)
+		if type(result) not in _HSM_PLAIN_RESULTS:
+			_hsm_check_result(function, result)
+		return result
+	finally:
+		recorder.record(node, callback, event_type, perf_counter_ns() - start)
+
+
+async def _hsm_handle_entries(
+	node: Type[Node[TEvent, TContext, Any]],
+	prev: Type[Node[TEvent, TContext, Any]] | None,
+	contexts: ContextStore,
+	event_type: type | None = None,
+) -> Type[Node[TEvent, TContext, Any]]:
+	profile: Final = PROFILE.recorder
+
+	while node != prev:
+		prev = node
+		if profile is None:
+			entry = node.entry
+			if entry in node._coroutine_callbacks:
+				result = await entry(contexts[node])  # type: ignore[misc]
+			else:
+				result = entry(contexts[node])
+				if type(result) not in _HSM_PLAIN_RESULTS:
+					_hsm_check_result(entry, result)
+			node, context = result
+		else:
+			node, context = await _hsm_timed(
+				profile, node, Callback.ENTRY, event_type, node.entry, contexts[node]
+			)
+		contexts[node] = context
+	return node
 
 
 async def hsm_handle_entries(
@@ -74,13 +304,275 @@ async def hsm_handle_entries(
 		Type[Node]: The node after all entries have been done
 	"""
 
-	while node != prev:
-		prev = node
-		node, context = await node.entry(node._context)
-		node._context = context
+	return await _hsm_enter(node, prev, NODE_CONTEXTS, PostedEvents())
+
+
+async def _hsm_transition(
+	node: Type[Node[TEvent, TContext, Any]],
+	current_node: Type[Node[TEvent, TContext, Any]],
+	node_or_status: Type[Node[TEvent, TContext, Any]] | HSMStatus,
+	contexts: ContextStore,
+	event_type: type,
+	plan: TransitionPlan[Node[TEvent, TContext, Any]] | None = None,
+) -> Type[Node[TEvent, TContext, Any]]:
+	"""Do the transition that the handler of `current_node` returned for `node`.
+
+	The `plan` of a transition to a node is looked up unless it is given.
+	"""
+
+	profile: Final = PROFILE.recorder
+	timers: Final = TIMERS.service
+
+	if node_or_status is HSMStatus.SELF_TRANSITION:
+		# do the exits from the original node up to the handling node
+		exit_node = node
+		while True:
+			if timers is not None:
+				timers.exited(exit_node)
+			if profile is None:
+				if (callback := exit_node.exit) in exit_node._coroutine_callbacks:
+					await callback(contexts[current_node])  # type: ignore[misc]
+				elif type(returned := callback(contexts[current_node])) not in _HSM_PLAIN_RESULTS:
+					_hsm_check_result(callback, returned)
+			else:
+				await _hsm_timed(
+					profile,
+					exit_node,
+					Callback.EXIT,
+					event_type,
+					exit_node.exit,
+					contexts[current_node],
+				)
+			if exit_node is current_node:
+				break
+			exit_node = exit_node._superstate  # type: ignore[assignment]
+		return await _hsm_handle_entries(current_node, None, contexts, event_type)
+
+	# else handle transitions to the new node
+	if is_hsm_status(node_or_status):
+		raise ValueError(f"Unexpected {node_or_status} for a transition")
+	target_node: Final = node_or_status
+
+	if plan is None:
+		plan = hsm_get_transition_plan(node, current_node, target_node)
+
+	# do the exits from the original node to the LCA
+	for exit_node in plan.exits:
+		if timers is not None:
+			timers.exited(exit_node)
+		if profile is None:
+			if (callback := exit_node.exit) in exit_node._coroutine_callbacks:
+				await callback(contexts[exit_node])  # type: ignore[misc]
+			elif type(returned := callback(contexts[exit_node])) not in _HSM_PLAIN_RESULTS:
+				_hsm_check_result(callback, returned)
+		else:
+			await _hsm_timed(
+				profile, exit_node, Callback.EXIT, event_type, exit_node.exit, contexts[exit_node]
+			)
+
+	# check for an exit to a superstate in which no entries are called
+	if not plan.entries:
+		return target_node
+
+	# do the entries from LCA to the new state
+	next_node = plan.entries[0]
+	for entry_node in plan.entries:
+		if entry_node != next_node:
+			logger.warning(f"The entry return disagrees with the path -> Path is {plan.entries}")
+			raise ValueError("The entry return disagrees with the entry path")
+		if profile is None:
+			entry = entry_node.entry
+			if entry in entry_node._coroutine_callbacks:
+				result = await entry(contexts[current_node])  # type: ignore[misc]
+			else:
+				result = entry(contexts[current_node])
+				if type(result) not in _HSM_PLAIN_RESULTS:
+					_hsm_check_result(entry, result)
+			next_node, next_context = result
+		else:
+			next_node, next_context = await _hsm_timed(
+				profile,
+				entry_node,
+				Callback.ENTRY,
+				event_type,
+				entry_node.entry,
+				contexts[current_node],
+			)
+		contexts[entry_node] = next_context
+		current_node = entry_node
+
+	# like in the entries, the context returned with the next node is its entry context
+	contexts[next_node] = next_context
+	return await _hsm_handle_entries(next_node, plan.entries[-1], contexts, event_type)
+
+
+async def _hsm_handle_event(
+	node: Type[Node[TEvent, TContext, Any]],
+	event: TEvent,
+	contexts: ContextStore,
+) -> Type[Node[TEvent, TContext, Any]]:
+	trace: Final = TRACE.hook
+	profile: Final = PROFILE.recorder
+
+	# the node whose handlers are tried, from the starting node up to the root
+	current_node = node
+
+	while True:
+		handler = _hsm_get_event_handler(current_node, event)
+		if handler is None:
+			node_or_status: Any = HSMStatus.EVENT_UNHANDLED
+		elif profile is None:
+			if handler in current_node._coroutine_callbacks:
+				node_or_status = await handler(event, contexts[current_node])
+			else:
+				node_or_status = handler(event, contexts[current_node])
+				if type(node_or_status) not in _HSM_PLAIN_RESULTS:
+					_hsm_check_result(handler, node_or_status)
+		else:
+			node_or_status = await _hsm_timed(
+				profile,
+				current_node,
+				Callback.HANDLER,
+				type(event),
+				handler,
+				event,
+				contexts[current_node],
+			)
+
+		if node_or_status is HSMStatus.EVENT_UNHANDLED and current_node._superstate is not None:
+			current_node = current_node._superstate
+			continue
+
+		if trace is not None:
+			trace(node, event, current_node, node_or_status)
+
+		if node_or_status is HSMStatus.NO_TRANSITION or node_or_status is HSMStatus.EVENT_UNHANDLED:
+			return node
+
+		return await _hsm_transition(node, current_node, node_or_status, contexts, type(event))
+
+
+async def _hsm_handle_events(
+	node: Type[Node[TEvent, TContext, Any]],
+	events: Iterable[TEvent],
+	contexts: ContextStore,
+	posted: PostedEvents,
+) -> Type[Node[TEvent, TContext, Any]]:
+	"""The hot loop of `_hsm_step` for many events.
+
+	Everything that does not depend on the event is hoisted out of the loop
+	and the dispatch is inlined, so that only transitions make a call.
+	"""
+
+	NO_TRANSITION: Final = HSMStatus.NO_TRANSITION
+	EVENT_UNHANDLED: Final = HSMStatus.EVENT_UNHANDLED
+	resolve_event_handler: Final = hsm_resolve_event_handler
+	transition: Final = _hsm_transition
+	trace: Final = TRACE.hook
+	profile: Final = PROFILE.recorder
+	HANDLER: Final = Callback.HANDLER
+
+	token: Final = RUNNING_STEP.set(RunningStep(posted))
+	try:
+		for event in events:
+			event_type = type(event)
+			current_node = node
+			while True:
+				try:
+					handler = current_node._event_dispatch[event_type]
+				except KeyError:
+					handler = resolve_event_handler(current_node, event)
+
+				if handler is None:
+					node_or_status = EVENT_UNHANDLED
+				elif profile is None:
+					if handler in current_node._coroutine_callbacks:
+						node_or_status = await handler(event, contexts[current_node])
+					else:
+						node_or_status = handler(event, contexts[current_node])
+						if type(node_or_status) not in _HSM_PLAIN_RESULTS:
+							_hsm_check_result(handler, node_or_status)
+				else:
+					node_or_status = await _hsm_timed(
+						profile,
+						current_node,
+						HANDLER,
+						event_type,
+						handler,
+						event,
+						contexts[current_node],
+					)
+
+				if (
+					node_or_status is EVENT_UNHANDLED
+					and (superstate := current_node._superstate) is not None
+				):
+					current_node = superstate
+					continue
+
+				if trace is not None:
+					trace(node, event, current_node, node_or_status)
+
+				if node_or_status is not NO_TRANSITION and node_or_status is not EVENT_UNHANDLED:
+					node = await transition(
+						node, current_node, node_or_status, contexts, event_type
+					)
+				break
+
+			# handle the events that the callbacks posted before the next event
+			while posted:
+				node = await _hsm_handle_event(node, posted.popleft(), contexts)
+	except BaseException:
+		posted.clear()
+		raise
+	finally:
+		RUNNING_STEP.reset(token)
+
 	return node
 
 
+async def _hsm_step(
+	node: Type[Node[TEvent, TContext, Any]],
+	event: TEvent,
+	contexts: ContextStore,
+	posted: PostedEvents,
+) -> Type[Node[TEvent, TContext, Any]]:
+	"""Handle an event, then the events that the callbacks post, in order."""
+
+	token: Final = RUNNING_STEP.set(RunningStep(posted))
+	try:
+		node = await _hsm_handle_event(node, event, contexts)
+		while posted:
+			node = await _hsm_handle_event(node, posted.popleft(), contexts)
+		return node
+	except BaseException:
+		posted.clear()
+		raise
+	finally:
+		RUNNING_STEP.reset(token)
+
+
+async def _hsm_enter(
+	node: Type[Node[TEvent, TContext, Any]],
+	prev: Type[Node[TEvent, TContext, Any]] | None,
+	contexts: ContextStore,
+	posted: PostedEvents,
+) -> Type[Node[TEvent, TContext, Any]]:
+	"""Do the entries, then handle the events that the callbacks post, in order."""
+
+	token: Final = RUNNING_STEP.set(RunningStep(posted))
+	try:
+		node = await _hsm_handle_entries(node, prev, contexts)
+		while posted:
+			node = await _hsm_handle_event(node, posted.popleft(), contexts)
+		return node
+	except BaseException:
+		posted.clear()
+		raise
+	finally:
+		RUNNING_STEP.reset(token)
+
+
 async def hsm_handle_event(
 	node: Type[Node[TEvent, TContext, Any]],
 	event: TEvent,
@@ -96,75 +588,215 @@ async def hsm_handle_event(
 		node (Type[Node[TEvent, TState, Any]]): The new node after handling the event.
 	"""
 
-	# the node path from the starting node up to the handling node
-	node_path: Final[list[Type[Node[TEvent, TContext, Any]]]] = [node]
+	return await _hsm_step(node, event, NODE_CONTEXTS, PostedEvents())
 
-	while True:
-		current_node = node_path[-1]
-		node_or_status: Final = (  # type: ignore[misc]
-			await handler(event, current_node._context)
-			if (handler := _hsm_get_event_handler(current_node, event))
-			else HSMStatus.EVENT_UNHANDLED
-		)
 
-		if is_hsm_status(node_or_status):
-			status: Final = node_or_status  # type: ignore[misc]
+async def hsm_handle_events(
+	node: Type[Node[TEvent, TContext, Any]],
+	events: Iterable[TEvent],
+) -> Type[Node[TEvent, TContext, Any]]:
+	"""Handle many events for the hierarchical state machine.
+
+	This is the fast path for `hsm_handle_event` in a loop, e.g. to replay a log.
 
-			if status == HSMStatus.NO_TRANSITION:
-				logger.debug(f"No transition in state {current_node.__name__}")
-				return node
+	Args:
+		node (Type[Node]): The current node of the HSM.
+		events (Iterable[TEvent]): The events to handle, in order.
 
-			elif status == HSMStatus.SELF_TRANSITION:
-				logger.debug(f"Self-transition in state {current_node.__name__}")
-				for n in node_path:
-					await n.exit(current_node._context)
-				return await hsm_handle_entries(current_node)
+	Returns:
+		Type[Node]: The node after handling all of the events.
+	"""
 
-			elif status == HSMStatus.EVENT_UNHANDLED:
-				logger.debug(f"Unhandled event {event} in state {current_node.__name__}")
-				if current_node._superstate is None:
-					logger.debug(f"Reached root state {current_node.__name__}")
-					return node
-				else:
-					node_path.append(current_node._superstate)
-					continue
+	return await _hsm_handle_events(node, events, NODE_CONTEXTS, PostedEvents())
 
-			else:
-				assert_never(status)
 
-		# else handle transitions to the new node
-		target_node: Final = node_or_status  # type: ignore[misc]
+async def hsm_iter_events(
+	node: Type[Node[TEvent, TContext, Any]],
+	events: Iterable[TEvent],
+) -> AsyncIterator[Type[Node[TEvent, TContext, Any]]]:
+	"""Handle many events for the hierarchical state machine, yielding each new node.
 
-		current_node_path_to_root: Final = hsm_get_path_to_root(current_node)  # type: ignore[misc]
-		target_node_path_to_root: Final = hsm_get_path_to_root(target_node)  # type: ignore[misc]
-		lca: Final = hsm_get_lca(target_node_path_to_root, current_node_path_to_root)  # type: ignore[misc]
+	Args:
+		node (Type[Node]): The current node of the HSM.
+		events (Iterable[TEvent]): The events to handle, in order.
 
-		# do the exits from the original node to the LCA
-		next_node = node
-		while next_node != lca:
-			await next_node.exit(next_node._context)
-			if next_node._superstate is None:
-				break
-			next_node = next_node._superstate
-
-		# start the entry path past the LCA
-		entry_path = tuple(reversed(target_node_path_to_root))
-		entry_path = tuple(entry_path[entry_path.index(lca) + 1 :])
-
-		# check for an exit to a superstate in which no entries are called
-		if len(entry_path) == 0:
-			return next_node
-
-		# do the entries from LCA to the new state
-		if entry_path[0] is None:
-			raise ValueError("The entry path is empty")
-		next_node = entry_path[0]
-		for entry_node in entry_path:
-			if entry_node != next_node:
-				logger.warning(f"The entry return disagrees with the path -> Path is {entry_path}")
-				raise ValueError("The entry return disagrees with the entry path")
-			next_node, next_context = await entry_node.entry(current_node._context)
-			entry_node._context = next_context
-			current_node = entry_node
-
-		return await hsm_handle_entries(next_node, entry_path[-1] if entry_path else None)
+	Yields:
+		Type[Node]: The node after handling each event.
+	"""
+
+	posted: Final = PostedEvents()
+	for event in events:
+		node = await _hsm_step(node, event, NODE_CONTEXTS, posted)
+		yield node
+
+
+async def hsm_machine_handle_entries(
+	machine: Machine,
+) -> Type[Node[Any, Any, Any]]:
+	"""Do the entries for the current node of a machine instance.
+
+	Like `hsm_handle_entries`, but the contexts are stored in the machine
+	instead of on the node classes.
+
+	Args:
+		machine (Machine): The machine instance.
+
+	Returns:
+		Type[Node]: The node after all entries have been done
+	"""
+
+	machine.node = node = await _hsm_enter(machine.node, None, machine.contexts, machine.posted)
+	return node
+
+
+async def hsm_machine_handle_event(
+	machine: Machine,
+	event: TEvent,
+) -> Type[Node[Any, Any, Any]]:
+	"""Handle an event for a machine instance.
+
+	Like `hsm_handle_event`, but the contexts are stored in the machine instead
+	of on the node classes, so one node tree can drive any number of machines.
+
+	Args:
+		machine (Machine): The machine instance.
+		event (TEvent): The event to handle.
+
+	Returns:
+		Type[Node]: The new node of the machine after handling the event.
+	"""
+
+	machine.node = node = await _hsm_step(machine.node, event, machine.contexts, machine.posted)
+	return node
+
+
+async def hsm_pool_handle_entries(pool: MachinePool, indices: Iterable[int] | None = None) -> None:
+	"""Do the entries for the current node of instances of a machine pool.
+
+	Args:
+		pool (MachinePool): The machine pool.
+		indices (Iterable[int], optional): The instances to do the entries for.
+			Defaults to all instances.
+	"""
+
+	states: Final = pool.states
+	contexts: Final = PoolContexts(pool)
+	posted: Final = PostedEvents()
+	for node, group in pool.group_by_state(indices).items():
+		for index in group:
+			contexts.index = index
+			states[index] = (await _hsm_enter(node, None, contexts, posted))._id
+
+
+async def hsm_pool_handle_event(
+	pool: MachinePool,
+	event: TEvent,
+	indices: Iterable[int] | None = None,
+) -> None:
+	"""Handle an event for instances of a machine pool.
+
+	The instances are grouped by their current node. The handlers that the
+	event bubbles through from the node, and the plan of the transition that
+	they return, are resolved once per group, so that only the callbacks run
+	for each instance, with its own contexts.
+
+	Args:
+		pool (MachinePool): The machine pool.
+		event (TEvent): The event to handle.
+		indices (Iterable[int], optional): The instances to send the event to.
+			Defaults to all instances.
+	"""
+
+	NO_TRANSITION: Final = HSMStatus.NO_TRANSITION
+	EVENT_UNHANDLED: Final = HSMStatus.EVENT_UNHANDLED
+	transition: Final = _hsm_transition
+	trace: Final = TRACE.hook
+	profile: Final = PROFILE.recorder
+	event_type: Final = type(event)
+
+	states: Final = pool.states
+	contexts: Final = PoolContexts(pool)
+	posted: Final = PostedEvents()
+	token: Final = RUNNING_STEP.set(RunningStep(posted))
+	try:
+		for node, group in pool.group_by_state(indices).items():
+			handlers = hsm_get_event_handlers(node, event)
+			root = node._ancestors[-1]
+			# the plan of the last transition of the group
+			plan = plan_handler = plan_target = None
+			for index in group:
+				contexts.index = index
+				current_node = root
+				node_or_status = EVENT_UNHANDLED
+				for handling_node, handler in handlers:
+					if profile is None:
+						if handler in handling_node._coroutine_callbacks:
+							result = await handler(event, contexts[handling_node])
+						else:
+							result = handler(event, contexts[handling_node])
+							if type(result) not in _HSM_PLAIN_RESULTS:
+								_hsm_check_result(handler, result)
+					else:
+						result = await _hsm_timed(
+							profile,
+							handling_node,
+							Callback.HANDLER,
+							event_type,
+							handler,
+							event,
+							contexts[handling_node],
+						)
+					if result is not EVENT_UNHANDLED:
+						current_node = handling_node
+						node_or_status = result
+						break
+
+				if trace is not None:
+					trace(node, event, current_node, node_or_status)
+
+				if node_or_status is NO_TRANSITION or node_or_status is EVENT_UNHANDLED:
+					next_node = node
+				elif is_hsm_status(node_or_status):
+					next_node = await transition(
+						node, current_node, node_or_status, contexts, event_type
+					)
+				else:
+					if plan_handler is not current_node or plan_target is not node_or_status:
+						plan_handler = current_node
+						plan_target = node_or_status
+						plan = hsm_get_transition_plan(node, current_node, node_or_status)
+					next_node = await transition(
+						node, current_node, node_or_status, contexts, event_type, plan
+					)
+
+				while posted:
+					next_node = await _hsm_handle_event(next_node, posted.popleft(), contexts)
+				states[index] = next_node._id
+	except BaseException:
+		posted.clear()
+		raise
+	finally:
+		RUNNING_STEP.reset(token)
+
+
+async def hsm_machine_handle_events(
+	machine: Machine,
+	events: Iterable[TEvent],
+) -> Type[Node[Any, Any, Any]]:
+	"""Handle many events for a machine instance.
+
+	If a callback raises, the machine keeps the node that it had before the
+	events.
+
+	Args:
+		machine (Machine): The machine instance.
+		events (Iterable[TEvent]): The events to handle, in order.
+
+	Returns:
+		Type[Node]: The new node of the machine after handling all of the events.
+	"""
+
+	machine.node = node = await _hsm_handle_events(
+		machine.node, events, machine.contexts, machine.posted
+	)
+	return node
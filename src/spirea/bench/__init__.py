@@ -0,0 +1,4 @@
+# Copyright (c) 2025 JP Hutchins
+# SPDX-License-Identifier: MIT
+
+"""A benchmark suite of the engines, run with `python -m spirea.bench`."""
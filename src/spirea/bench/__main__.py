@@ -0,0 +1,81 @@
+# Copyright (c) 2025 JP Hutchins
+# SPDX-License-Identifier: MIT
+
+"""Run the benchmark suite and print the results as JSON.
+
+python -m spirea.bench --events 100000 --engine sync --scenario deep_chain
+
+With --save-baseline or --compare, each scenario runs --repeats times and the
+median and IQR of its ns per event are saved as a baseline, or compared
+against one, exiting with 1 if a scenario regressed beyond --threshold.
+"""
+
+import argparse
+import json
+import sys
+from typing import Final
+
+from spirea.bench.baseline import (
+	DEFAULT_THRESHOLD,
+	hsm_compare,
+	hsm_format_deltas,
+	hsm_load_baseline,
+	hsm_save_baseline,
+	hsm_summarize,
+)
+from spirea.bench.scenarios import SCENARIOS
+from spirea.bench.suite import ENGINES, run_suite
+
+
+def main(argv: list[str] | None = None) -> int:
+	names: Final = [scenario.name for scenario in SCENARIOS]
+	parser: Final = argparse.ArgumentParser(prog="python -m spirea.bench", description=__doc__)
+	parser.add_argument("--events", type=int, default=100_000, help="events per scenario")
+	parser.add_argument(
+		"--engine", action="append", choices=ENGINES, help="an engine to run, default all"
+	)
+	parser.add_argument(
+		"--scenario", action="append", choices=names, help="a scenario to run, default all"
+	)
+	parser.add_argument("--output", "-o", help="write the JSON to a file instead of stdout")
+	parser.add_argument(
+		"--repeats", type=int, help="runs of each scenario, default 5 with a baseline, else 1"
+	)
+	parser.add_argument("--save-baseline", metavar="PATH", help="save the results as a baseline")
+	parser.add_argument("--compare", metavar="PATH", help="compare the results against a baseline")
+	parser.add_argument(
+		"--threshold",
+		type=float,
+		default=DEFAULT_THRESHOLD,
+		help="the relative slowdown that is a regression, default %(default)s",
+	)
+	args: Final = parser.parse_args(argv)
+
+	baseline: Final = None if args.compare is None else hsm_load_baseline(args.compare)
+	with_baseline: Final = args.save_baseline is not None or baseline is not None
+	report: Final = run_suite(
+		args.events,
+		args.engine or ENGINES,
+		[scenario for scenario in SCENARIOS if not args.scenario or scenario.name in args.scenario],
+		args.repeats or (5 if with_baseline else 1),
+	)
+	if args.output is not None:
+		with open(args.output, "w") as file:
+			json.dump(report, file, indent=2)
+	elif not with_baseline:
+		json.dump(report, sys.stdout, indent=2)
+		sys.stdout.write("\n")
+
+	summary: Final = hsm_summarize(report)
+	if args.save_baseline is not None:
+		hsm_save_baseline(summary, args.save_baseline)
+	if baseline is not None:
+		deltas: Final = hsm_compare(baseline, summary, args.threshold)
+		print(hsm_format_deltas(deltas))
+		if any(delta.regression for delta in deltas):
+			return 1
+	return 0
+
+
+if __name__ == "__main__":
+	sys.exit(main())
@@ -0,0 +1,175 @@
+# Copyright (c) 2025 JP Hutchins
+# SPDX-License-Identifier: MIT
+
+"""Save benchmark baselines and compare new results against them.
+
+A baseline summarises the ns per event of the repeated runs of each scenario
+on each engine by their median and interquartile range (IQR). A comparison
+reports the change of each median and flags a regression only when it is
+beyond both the threshold and the noise of the runs, i.e. the IQRs of the
+baseline and of the new runs do not overlap.
+
+	>>> report = {"events": 10, "repeats": 3, "results": [
+	...     {"scenario": "s", "engine": "sync", "ns_per_event": ns} for ns in (100, 110, 105)
+	... ]}
+	>>> baseline = hsm_summarize(report)
+	>>> baseline["results"]["s/sync"]["median"]
+	105.0
+	>>> slower = {**report, "results": [
+	...     {"scenario": "s", "engine": "sync", "ns_per_event": ns} for ns in (150, 160, 155)
+	... ]}
+	>>> (delta,) = hsm_compare(baseline, hsm_summarize(slower))
+	>>> round(delta.change, 3), delta.regression
+	(0.476, True)
+"""
+
+import json
+import os
+import platform
+import statistics
+from importlib import metadata
+from typing import Any, Final, Iterable, NamedTuple
+
+BASELINE_FORMAT: Final = 1
+"""The version of the format of baseline files."""
+
+DEFAULT_THRESHOLD: Final = 0.05
+
+
+def _hsm_get_version() -> str:
+	try:
+		return metadata.version("spirea")
+	except metadata.PackageNotFoundError:
+		return "unknown"
+
+
+def _hsm_summarize_samples(samples: list[float]) -> dict[str, Any]:
+	if len(samples) > 1:
+		q1, median, q3 = statistics.quantiles(samples, n=4, method="inclusive")
+	else:
+		q1 = median = q3 = samples[0]
+	return {"median": median, "q1": q1, "q3": q3, "samples": samples}
+
+
+def hsm_summarize(report: dict[str, Any]) -> dict[str, Any]:
+	"""Summarise a report of `run_suite` as a baseline.
+
+	Args:
+		report (dict[str, Any]): The report, usually of repeated runs.
+
+	Returns:
+		dict[str, Any]: The baseline, with the median, quartiles and samples of
+			the ns per event of each "scenario/engine".
+	"""
+
+	samples: Final[dict[str, list[float]]] = {}
+	for result in report["results"]:
+		samples.setdefault(f"{result['scenario']}/{result['engine']}", []).append(
+			result["ns_per_event"]
+		)
+
+	return {
+		"format": BASELINE_FORMAT,
+		"spirea": _hsm_get_version(),
+		"python": report.get("python", platform.python_version()),
+		"events": report["events"],
+		"repeats": report["repeats"],
+		"metric": "ns_per_event",
+		"results": {key: _hsm_summarize_samples(values) for key, values in samples.items()},
+	}
+
+
+def hsm_save_baseline(baseline: dict[str, Any], path: str | os.PathLike[str]) -> None:
+	"""Save a baseline from `hsm_summarize` as JSON."""
+
+	with open(path, "w") as file:
+		json.dump(baseline, file, indent=2)
+		file.write("\n")
+
+
+def hsm_load_baseline(path: str | os.PathLike[str]) -> dict[str, Any]:
+	"""Load a baseline saved with `hsm_save_baseline`.
+
+	Raises:
+		ValueError: If the file is not a baseline of `BASELINE_FORMAT`.
+	"""
+
+	with open(path) as file:
+		baseline: Final = json.load(file)
+	if not isinstance(baseline, dict) or baseline.get("format") != BASELINE_FORMAT:
+		raise ValueError(f"{path} is not a baseline of format {BASELINE_FORMAT}")
+	return baseline
+
+
+class Delta(NamedTuple):
+	"""The change of a scenario on an engine against the baseline."""
+
+	key: str
+	"""The "scenario/engine"."""
+	baseline: float
+	"""The median ns per event of the baseline."""
+	current: float
+	"""The median ns per event of the new runs."""
+	change: float
+	"""The relative change of the median, positive if slower."""
+	noise: float
+	"""The larger relative IQR of the baseline and the new runs."""
+	regression: bool
+
+
+def hsm_compare(
+	baseline: dict[str, Any],
+	current: dict[str, Any],
+	threshold: float = DEFAULT_THRESHOLD,
+) -> list[Delta]:
+	"""Compare the summaries of new runs against a baseline.
+
+	A scenario regressed if its median is slower by more than `threshold`
+	and the IQR of the new runs lies above the IQR of the baseline. Scenarios
+	that only one of the summaries has are not compared.
+
+	Args:
+		baseline (dict[str, Any]): The baseline from `hsm_summarize`.
+		current (dict[str, Any]): The summary of the new runs from `hsm_summarize`.
+		threshold (float, optional): The relative slowdown that is tolerated.
+			Defaults to 0.05.
+
+	Returns:
+		list[Delta]: The delta of each scenario on each engine.
+	"""
+
+	deltas: Final[list[Delta]] = []
+	for key, new in current["results"].items():
+		if (old := baseline["results"].get(key)) is None:
+			continue
+		change = new["median"] / old["median"] - 1
+		noise = max(
+			(old["q3"] - old["q1"]) / old["median"],
+			(new["q3"] - new["q1"]) / new["median"],
+		)
+		deltas.append(
+			Delta(
+				key,
+				old["median"],
+				new["median"],
+				change,
+				noise,
+				change > threshold and new["q1"] > old["q3"],
+			)
+		)
+	return deltas
+
+
+def hsm_format_deltas(deltas: Iterable[Delta]) -> str:
+	"""Format deltas as a table, one line per scenario on an engine."""
+
+	lines: Final = [
+		f"{'scenario/engine':<32} {'baseline ns':>12} {'current ns':>12} {'change':>8} {'noise':>7}"
+	]
+	for delta in deltas:
+		lines.append(
+			f"{delta.key:<32} {delta.baseline:>12.1f} {delta.current:>12.1f} "
+			f"{delta.change:>+8.1%} {delta.noise:>7.1%}"
+			+ ("  REGRESSION" if delta.regression else "")
+		)
+	return "\n".join(lines)
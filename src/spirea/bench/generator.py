@@ -0,0 +1,282 @@
+# Copyright (c) 2025 JP Hutchins
+# SPDX-License-Identifier: MIT
+
+"""Generate node trees and matching event streams of any size.
+
+`hsm_generate_machine` builds a tree of node classes through `NodeMeta` from
+its number of states, depth, branching factor, handlers per state and
+transition locality, and `hsm_generate_events` builds a random stream of the
+events that the tree handles, so benchmarks can chart the cost of dispatch
+against each of them.
+
+	>>> import spirea.sync as hsm
+	>>> generated = hsm_generate_machine(hsm.Node, states=100, depth=6, seed=1)
+	>>> len(generated.nodes), max(node._depth for node in generated.nodes)
+	(100, 5)
+	>>> node = hsm.hsm_handle_entries(generated.root)
+	>>> node = hsm.hsm_handle_events(node, hsm_generate_events(generated, 1000, seed=1))
+	>>> node in generated.nodes
+	True
+"""
+
+import random
+from collections import namedtuple
+from typing import Any, Callable, Final, NamedTuple, Sequence
+
+from spirea._common import pure
+
+type Handlers = Sequence[tuple[type, Callable[[Any, Any], Any]]]
+
+
+def hsm_build_node(
+	base: type,
+	name: str,
+	substates: Sequence[type] = (),
+	handlers: Handlers = (),
+	coroutines: bool = False,
+) -> Any:
+	"""Create a node class whose `entry` enters its first substate.
+
+	Args:
+		base (type): The `Node` base class, `spirea.sync.Node` or `spirea.asyncio.Node`.
+		name (str): The name of the node class.
+		substates (Sequence[type], optional): The substates. Defaults to none.
+		handlers (Handlers, optional): The event type and handler of each event
+			handler. Defaults to none.
+		coroutines (bool, optional): Make `entry` and `exit` coroutine functions,
+			for `spirea.asyncio.Node`. Defaults to False.
+
+	Returns:
+		Type[Node]: The node class.
+	"""
+
+	created: Final[list[type]] = []
+
+	def entry(context: Any) -> tuple[type, Any]:
+		return (substates[0] if substates else created[0]), context
+
+	def exit(context: Any) -> None: ...
+
+	async def async_entry(context: Any) -> tuple[type, Any]:
+		return (substates[0] if substates else created[0]), context
+
+	async def async_exit(context: Any) -> None: ...
+
+	namespace: Final[dict[str, Any]] = {
+		"__module__": __name__,
+		"__qualname__": name,
+		"entry": staticmethod(async_entry if coroutines else entry),
+		"exit": staticmethod(async_exit if coroutines else exit),
+		"_context": None,
+	}
+	for substate in substates:
+		namespace[substate.__name__] = substate
+	if handlers:
+		event_handlers: Final[dict[str, Any]] = {"__annotations__": {}}
+		for i, (event_type, handler) in enumerate(handlers):
+			event_handlers["__annotations__"][f"on_{i}"] = Callable[[event_type, Any], Any]
+			event_handlers[f"on_{i}"] = handler
+		namespace["EventHandlers"] = type("EventHandlers", (), event_handlers)
+
+	node: Final = type(base)(name, (base,), namespace)
+	created.append(node)
+	return node
+
+
+class GeneratedMachine(NamedTuple):
+	root: Any
+	nodes: tuple[Any, ...]
+	"""Every node, parents before their substates."""
+	event_types: tuple[type, ...]
+	targets: tuple[dict[type, Any], ...]
+	"""The target that the handler of each event type of each node returns."""
+
+
+def _hsm_target(targets: list[Any], index: int) -> Callable[[Any, Any], Any]:
+	return pure(lambda event, context: targets[index])
+
+
+def hsm_generate_machine(
+	base: type,
+	states: int,
+	depth: int,
+	branching: int = 4,
+	handlers_per_state: int = 2,
+	event_types: int = 8,
+	locality: float = 0.8,
+	coroutines: bool = False,
+	seed: int | None = None,
+) -> GeneratedMachine:
+	"""Generate a random tree of nodes.
+
+	A spine of `depth` nodes makes the tree as deep as asked; the other nodes
+	are substates of random nodes that have room for them. Every node handles
+	`handlers_per_state` random event types with a `pure` handler that returns
+	a fixed target: with probability `locality` a node under its superstate,
+	so that the transition is short, otherwise any node. Since each `entry`
+	enters the first substate, only targets that the entries of the transition
+	reach are chosen.
+
+	Args:
+		base (type): The `Node` base class, `spirea.sync.Node` or `spirea.asyncio.Node`.
+		states (int): The number of nodes.
+		depth (int): The number of levels, counting the root.
+		branching (int, optional): The most substates of a node. Defaults to 4.
+		handlers_per_state (int, optional): The event handlers of each node. Defaults to 2.
+		event_types (int, optional): The number of event types. Defaults to 8.
+		locality (float, optional): The probability that a transition stays under the
+			superstate of the handling node. Defaults to 0.8.
+		coroutines (bool, optional): Make `entry` and `exit` coroutine functions,
+			for `spirea.asyncio.Node`. Defaults to False.
+		seed (int | None, optional): The seed of the random generator. Defaults to None.
+
+	Returns:
+		GeneratedMachine: The root, the nodes, the event types and the targets.
+
+	Raises:
+		ValueError: If the states do not fit in the depth and branching factor,
+			or there are fewer event types than handlers per state.
+	"""
+
+	if not depth <= states <= sum(branching**level for level in range(depth)):
+		raise ValueError(f"{states} states do not fit {depth} levels of {branching} substates")
+	if handlers_per_state > event_types:
+		raise ValueError(f"{handlers_per_state} handlers per state need as many event types")
+
+	rng: Final = random.Random(seed)
+	parents: Final[list[int]] = [-1, *range(depth - 1)]
+	levels: Final[list[int]] = list(range(depth))
+	children: Final[list[list[int]]] = [[i + 1] for i in range(depth - 1)] + [[]]
+	open_: Final = [i for i in range(depth - 1) if branching > 1]
+	while len(parents) < states:
+		slot = rng.randrange(len(open_))
+		parent = open_[slot]
+		index = len(parents)
+		parents.append(parent)
+		levels.append(levels[parent] + 1)
+		children.append([])
+		children[parent].append(index)
+		if len(children[parent]) == branching:
+			open_[slot] = open_[-1]
+			open_.pop()
+		if levels[index] < depth - 1 and branching:
+			open_.append(index)
+
+	def subtree(index: int) -> list[int]:
+		nodes = [index]
+		for child in children[index]:
+			nodes.extend(subtree(child))
+		return nodes
+
+	# the highest node from which the entries, which enter the first substate, reach a node
+	heads: Final = [0] * states
+	for index in range(1, states):
+		parent = parents[index]
+		heads[index] = heads[parent] if children[parent][0] == index else index
+
+	def lca(a: int, b: int) -> int:
+		while levels[a] > levels[b]:
+			a = parents[a]
+		while levels[b] > levels[a]:
+			b = parents[b]
+		while a != b:
+			a, b = parents[a], parents[b]
+		return a
+
+	def reachable(handler: int, target: int) -> bool:
+		"""Whether the entries of a transition from `handler` end at `target`."""
+		common = lca(handler, target)
+		return common == target or levels[heads[target]] <= levels[common] + 1
+
+	def choose_target(handler: int) -> int:
+		parent = parents[handler]
+		local = subtree(handler if parent < 0 else parent)
+		for _ in range(64):
+			target = rng.choice(local) if rng.random() < locality else rng.randrange(states)
+			if reachable(handler, target):
+				return target
+		return handler if parent < 0 else parent
+
+	types: Final[tuple[type, ...]] = tuple(namedtuple(f"Event{i}", ()) for i in range(event_types))
+	nodes: Final[list[Any]] = [None] * states
+	target_indices: Final[list[dict[type, int]]] = [
+		{event_type: choose_target(index) for event_type in rng.sample(types, handlers_per_state)}
+		for index in range(states)
+	]
+
+	# substates are created before the superstate that holds them
+	for index in reversed(range(states)):
+		nodes[index] = hsm_build_node(
+			base,
+			f"S{index}",
+			[nodes[child] for child in children[index]],
+			[
+				(event_type, _hsm_target(nodes, target))
+				for event_type, target in target_indices[index].items()
+			],
+			coroutines,
+		)
+
+	return GeneratedMachine(
+		nodes[0],
+		tuple(nodes),
+		types,
+		tuple(
+			{event_type: nodes[target] for event_type, target in handlers.items()}
+			for handlers in target_indices
+		),
+	)
+
+
+def hsm_generate_events(
+	generated: GeneratedMachine,
+	count: int,
+	handled: float = 1.0,
+	seed: int | None = None,
+) -> list[Any]:
+	"""Generate a random stream of events for a generated machine.
+
+	The stream follows the machine from its initial leaf: with probability
+	`handled` an event is one that the current node or a superstate handles,
+	otherwise it is of any event type.
+
+	Args:
+		generated (GeneratedMachine): The machine from `hsm_generate_machine`.
+		count (int): The number of events.
+		handled (float, optional): The probability that an event is handled.
+			Defaults to 1.0.
+		seed (int | None, optional): The seed of the random generator. Defaults to None.
+
+	Returns:
+		list[TEvent]: The events.
+	"""
+
+	rng: Final = random.Random(seed)
+	index_of: Final = {node: index for index, node in enumerate(generated.nodes)}
+	leaf_of: Final[dict[Any, Any]] = {}
+	for node in reversed(generated.nodes):
+		leaf_of[node] = leaf_of[node._substates[0]] if node._substates else node
+
+	# the first handler on the path to the root wins, as in the engines
+	dispatch: Final[dict[Any, tuple[dict[type, tuple[Any, Any]], tuple[type, ...]]]] = {}
+	for node in generated.nodes:
+		table: dict[type, tuple[Any, Any]] = {}
+		for ancestor in reversed(node._ancestors):
+			for event_type, target in generated.targets[index_of[ancestor]].items():
+				table[event_type] = ancestor, target
+		dispatch[node] = table, tuple(table)
+
+	events: Final[list[Any]] = []
+	node = leaf_of[generated.root]
+	for _ in range(count):
+		table, handled_types = dispatch[node]
+		if handled_types and rng.random() < handled:
+			event_type = rng.choice(handled_types)
+		else:
+			event_type = rng.choice(generated.event_types)
+		events.append(event_type())
+		if (transition := table.get(event_type)) is not None:
+			handler, target = transition
+			# a transition to a superstate of the handler only exits, any other enters a leaf
+			node = target if target in handler._ancestors else leaf_of[target]
+	return events
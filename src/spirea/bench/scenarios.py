@@ -0,0 +1,175 @@
+# Copyright (c) 2025 JP Hutchins
+# SPDX-License-Identifier: MIT
+
+"""The standard scenarios of the benchmark suite.
+
+Each scenario builds a node tree on a `Node` base, `spirea.sync.Node` or
+`spirea.asyncio.Node`, and a stream of events that exercises one part of the
+engines over and over.
+"""
+
+import itertools
+from typing import Any, Callable, Final, NamedTuple
+
+from spirea._common import HSMStatus
+from spirea.bench.generator import (
+	Handlers,
+	hsm_build_node,
+	hsm_generate_events,
+	hsm_generate_machine,
+)
+
+DEPTH: Final = 16
+"""The depth of the chains of the deep scenarios."""
+
+WIDTH: Final = 256
+"""The number of substates of the wide fan-out scenario."""
+
+
+class Toggle(NamedTuple): ...
+
+
+class Next(NamedTuple): ...
+
+
+class Tick(NamedTuple): ...
+
+
+class Ping(NamedTuple): ...
+
+
+class Go(NamedTuple): ...
+
+
+class Back(NamedTuple): ...
+
+
+def _hsm_build_chain(
+	base: type, prefix: str, depth: int, handlers: Handlers = ()
+) -> tuple[Any, Any]:
+	"""Create a chain of `depth` nested nodes with `handlers` at the leaf.
+
+	Returns:
+		tuple[Type[Node], Type[Node]]: The top and the leaf of the chain.
+	"""
+
+	leaf: Final = hsm_build_node(base, f"{prefix}{depth - 1}", handlers=handlers)
+	top = leaf
+	for level in reversed(range(depth - 1)):
+		top = hsm_build_node(base, f"{prefix}{level}", (top,))
+	return top, leaf
+
+
+def samek(base: type, events: int) -> tuple[Any, list[Any]]:
+	"""The machine of `examples/samek/hsm.py` with the events "abcdefgh" repeated.
+
+	The machine is built on `base` by `examples.samek.headless`, with the
+	callbacks of the example but without the `Mock` that records their calls.
+
+	Raises:
+		ImportError: If the examples are not importable, e.g. when installed.
+	"""
+
+	from examples.samek.events import (
+		EventA,
+		EventB,
+		EventC,
+		EventD,
+		EventE,
+		EventF,
+		EventG,
+		EventH,
+	)
+	from examples.samek.headless import build
+	from examples.samek.state import Context
+
+	root: Final = build(base)
+	root._context = Context(foo=0)
+	script: Final = (EventA(), EventB(), EventC(), EventD(), EventE(), EventF(), EventG(), EventH())
+	return root, list(itertools.islice(itertools.cycle(script), events))
+
+
+def deep_chain(base: type, events: int) -> tuple[Any, list[Any]]:
+	"""Transitions between the leaves of two chains of `DEPTH` nodes."""
+
+	targets: Final[list[Any]] = []
+	left, left_leaf = _hsm_build_chain(base, "L", DEPTH, ((Toggle, lambda e, c: targets[1]),))
+	right, right_leaf = _hsm_build_chain(base, "R", DEPTH, ((Toggle, lambda e, c: targets[0]),))
+	targets.extend((left_leaf, right_leaf))
+	return hsm_build_node(base, "DeepChain", (left, right)), [Toggle()] * events
+
+
+def wide_fanout(base: type, events: int) -> tuple[Any, list[Any]]:
+	"""Transitions around a ring of `WIDTH` sibling nodes."""
+
+	children: Final[list[Any]] = []
+	for i in range(WIDTH):
+		handler = (lambda j: lambda e, c: children[j])((i + 1) % WIDTH)
+		children.append(hsm_build_node(base, f"C{i}", handlers=((Next, handler),)))
+	return hsm_build_node(base, "WideFanout", children), [Next()] * events
+
+
+def self_transition(base: type, events: int) -> tuple[Any, list[Any]]:
+	"""Self-transitions of a leaf, which exit and enter it again."""
+
+	leaf: Final = hsm_build_node(
+		base, "Leaf", handlers=((Tick, lambda e, c: HSMStatus.SELF_TRANSITION),)
+	)
+	return hsm_build_node(base, "SelfTransition", (leaf,)), [Tick()] * events
+
+
+def unhandled_bubbling(base: type, events: int) -> tuple[Any, list[Any]]:
+	"""Events that no node of a chain of `DEPTH` nodes handles."""
+
+	top, _ = _hsm_build_chain(base, "U", DEPTH)
+	return top, [Ping()] * events
+
+
+def long_entry_chain(base: type, events: int) -> tuple[Any, list[Any]]:
+	"""Transitions into the top of a chain of `DEPTH` nodes, whose entries drill down."""
+
+	targets: Final[list[Any]] = []
+	chain, _ = _hsm_build_chain(base, "E", DEPTH, ((Back, lambda e, c: targets[0]),))
+	start: Final = hsm_build_node(base, "Start", handlers=((Go, lambda e, c: chain),))
+	targets.append(start)
+	return (
+		hsm_build_node(base, "LongEntryChain", (start, chain)),
+		list(itertools.islice(itertools.cycle((Go(), Back())), events)),
+	)
+
+
+class Scenario(NamedTuple):
+	name: str
+	build: Callable[[type, int], tuple[Any, list[Any]]]
+	"""Build the root node on a `Node` base and a number of events."""
+
+
+SCENARIOS: Final = tuple(
+	Scenario(build.__name__, build)
+	for build in (
+		samek,
+		deep_chain,
+		wide_fanout,
+		self_transition,
+		unhandled_bubbling,
+		long_entry_chain,
+	)
+)
+
+
+def hsm_generated_scenario(name: str, **parameters: Any) -> Scenario:
+	"""Make a `Scenario` of the benchmark suite from the parameters of a generated machine.
+
+	Args:
+		name (str): The name of the scenario.
+		**parameters: The parameters of `hsm_generate_machine` other than `base`.
+
+	Returns:
+		Scenario: The scenario.
+	"""
+
+	def build(base: type, events: int) -> tuple[Any, list[Any]]:
+		generated = hsm_generate_machine(base, **parameters)
+		return generated.root, hsm_generate_events(generated, events, seed=parameters.get("seed"))
+
+	return Scenario(name, build)
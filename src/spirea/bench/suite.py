@@ -0,0 +1,223 @@
+# Copyright (c) 2025 JP Hutchins
+# SPDX-License-Identifier: MIT
+
+"""Run the scenarios of the benchmark suite against the engines."""
+
+import asyncio
+import contextlib
+import gc
+import os
+import platform
+import tracemalloc
+from time import perf_counter_ns
+from typing import Any, Final, Iterable, Iterator, NamedTuple
+
+import spirea.asyncio as hsm_async
+import spirea.sync as hsm_sync
+from spirea._common import HSMStatus, hsm_set_trace_hook
+from spirea.bench.scenarios import SCENARIOS, Scenario
+
+ENGINES: Final = ("sync", "asyncio")
+
+TRACED_EVENTS: Final = 10_000
+"""The number of events that are traced to measure their allocations, which is slow."""
+
+
+class Result(NamedTuple):
+	"""The measurements of a scenario on an engine."""
+
+	scenario: str
+	engine: str
+	events: int
+	transitions: int
+	"""The number of events whose handler returned a node or a self-transition."""
+	seconds: float
+	events_per_sec: float
+	ns_per_event: float
+	ns_per_transition: float | None
+	"""None if no event made a transition."""
+	transient_bytes_per_event: float
+	"""The mean of the bytes that handling an event allocated and freed again.
+
+	Up to `TRACED_EVENTS` events are handled with `tracemalloc` tracing, and
+	the peak traced memory of each above the memory traced once it was handled
+	is counted: a step that allocates nothing that does not outlive it counts
+	0. Objects that are reused from the free lists of the interpreter are not
+	traced.
+	"""
+
+
+class _TransitionCounter:
+	__slots__ = ("count",)
+
+	def __init__(self) -> None:
+		self.count = 0
+
+	def __call__(self, source: Any, event: Any, handling_node: Any, result: Any) -> None:
+		if result is not HSMStatus.NO_TRANSITION and result is not HSMStatus.EVENT_UNHANDLED:
+			self.count += 1
+
+
+@contextlib.contextmanager
+def _hsm_traced() -> Iterator[None]:
+	"""Trace the allocations, without collections that would free memory of earlier events."""
+
+	enabled: Final = gc.isenabled()
+	tracing: Final = tracemalloc.is_tracing()
+	gc.disable()
+	if not tracing:
+		tracemalloc.start()
+	try:
+		yield
+	finally:
+		if not tracing:
+			tracemalloc.stop()
+		if enabled:
+			gc.enable()
+
+
+def _hsm_run_sync(root: Any, events: list[Any]) -> tuple[int, int, int]:
+	"""Count the transitions, time the events and count the bytes they allocate in passing."""
+
+	handle_event: Final = hsm_sync.hsm_handle_event
+
+	node = hsm_sync.hsm_handle_entries(root)
+	counter: Final = _TransitionCounter()
+	previous: Final = hsm_set_trace_hook(counter)
+	try:
+		for event in events:
+			node = handle_event(node, event)
+	finally:
+		hsm_set_trace_hook(previous)
+
+	start: Final = perf_counter_ns()
+	for event in events:
+		node = handle_event(node, event)
+	elapsed: Final = perf_counter_ns() - start
+
+	transient = 0
+	with _hsm_traced():
+		for event in events[:TRACED_EVENTS]:
+			tracemalloc.reset_peak()
+			node = handle_event(node, event)
+			current, peak = tracemalloc.get_traced_memory()
+			transient += peak - current
+	return counter.count, elapsed, transient
+
+
+async def _hsm_run_async(root: Any, events: list[Any]) -> tuple[int, int, int]:
+	"""Like `_hsm_run_sync`, awaiting `spirea.asyncio.hsm_handle_event`."""
+
+	handle_event: Final = hsm_async.hsm_handle_event
+
+	node = await hsm_async.hsm_handle_entries(root)
+	counter: Final = _TransitionCounter()
+	previous: Final = hsm_set_trace_hook(counter)
+	try:
+		for event in events:
+			node = await handle_event(node, event)
+	finally:
+		hsm_set_trace_hook(previous)
+
+	start: Final = perf_counter_ns()
+	for event in events:
+		node = await handle_event(node, event)
+	elapsed: Final = perf_counter_ns() - start
+
+	transient = 0
+	with _hsm_traced():
+		for event in events[:TRACED_EVENTS]:
+			tracemalloc.reset_peak()
+			node = await handle_event(node, event)
+			current, peak = tracemalloc.get_traced_memory()
+			transient += peak - current
+	return counter.count, elapsed, transient
+
+
+def run_scenario(scenario: Scenario, engine: str, events: int) -> Result:
+	"""Run a scenario on an engine.
+
+	The events are handled three times with `hsm_handle_event`: once to warm
+	up and count the transitions, once timed and once traced by `tracemalloc`
+	to measure the memory that each event allocates in passing. Output of the
+	callbacks is discarded.
+
+	Args:
+		scenario (Scenario): The scenario.
+		engine (str): "sync" or "asyncio".
+		events (int): The number of events.
+
+	Returns:
+		Result: The measurements.
+
+	Raises:
+		ValueError: If the engine is unknown.
+	"""
+
+	if engine not in ENGINES:
+		raise ValueError(f"Unknown engine {engine!r}, expected one of {ENGINES}")
+
+	with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+		if engine == "sync":
+			root, stream = scenario.build(hsm_sync.Node, events)
+			transitions, elapsed, transient = _hsm_run_sync(root, stream)
+		else:
+			root, stream = scenario.build(hsm_async.Node, events)
+			transitions, elapsed, transient = asyncio.run(_hsm_run_async(root, stream))
+
+	count: Final = len(stream)
+	return Result(
+		scenario=scenario.name,
+		engine=engine,
+		events=count,
+		transitions=transitions,
+		seconds=elapsed / 1e9,
+		events_per_sec=count / elapsed * 1e9,
+		ns_per_event=elapsed / count,
+		ns_per_transition=elapsed / transitions if transitions else None,
+		transient_bytes_per_event=transient / min(count, TRACED_EVENTS),
+	)
+
+
+def run_suite(
+	events: int = 100_000,
+	engines: Iterable[str] = ENGINES,
+	scenarios: Iterable[Scenario] = SCENARIOS,
+	repeats: int = 1,
+) -> dict[str, Any]:
+	"""Run scenarios on engines.
+
+	Scenarios that cannot be built, e.g. `samek` without the examples, are
+	skipped.
+
+	Args:
+		events (int, optional): The number of events of each scenario. Defaults to 100,000.
+		engines (Iterable[str], optional): The engines. Defaults to all of `ENGINES`.
+		scenarios (Iterable[Scenario], optional): The scenarios. Defaults to `SCENARIOS`.
+		repeats (int, optional): The number of runs of each scenario on each engine,
+			each with its own result. Defaults to 1.
+
+	Returns:
+		dict[str, Any]: The environment and the results, ready to dump as JSON.
+	"""
+
+	results: Final[list[dict[str, Any]]] = []
+	skipped: Final[list[str]] = []
+	engines = tuple(engines)
+	for scenario in scenarios:
+		try:
+			for engine in engines:
+				for _ in range(repeats):
+					results.append(run_scenario(scenario, engine, events)._asdict())
+		except ImportError:
+			skipped.append(scenario.name)
+
+	return {
+		"python": platform.python_version(),
+		"implementation": platform.python_implementation(),
+		"machine": platform.machine(),
+		"events": events,
+		"repeats": repeats,
+		"results": results,
+		"skipped": skipped,
+	}
@@ -0,0 +1,272 @@
+# Copyright (c) 2025 JP Hutchins
+# SPDX-License-Identifier: MIT
+
+"""An append-only journal of the events that a machine accepted.
+
+A `Journal` appends each event to segment files in a directory as a record of
+its timestamp, its type id and its encoded fields. `hsm_replay` memory-maps
+the segments and feeds the events through `hsm_machine_handle_events` to
+rebuild the state of a machine after a crash, and `hsm_read_journal` reads
+them for an audit.
+
+Events are `NamedTuple`s. The type id of an event is the index of its type in
+the `event_types` given to the journal, so the same sequence, in the same
+order, must be given to read the journal back; new event types are appended.
+
+Each segment starts with `MAGIC`, followed by records of a `RECORD` header
+and the payload. The payload is the pickled tuple of the event's fields.
+"""
+
+import logging
+import mmap
+import os
+import pickle
+import struct
+import time
+from contextvars import ContextVar
+from pathlib import Path
+from types import TracebackType
+from typing import Any, BinaryIO, Callable, Final, Iterator, NamedTuple, Sequence, final
+
+from spirea._common import Machine
+from spirea.sync import hsm_machine_handle_event, hsm_machine_handle_events
+
+logger: Final = logging.getLogger(__name__)
+
+MAGIC: Final = b"HSMJ\x00\x00\x00\x01"
+"""The first bytes of every segment."""
+
+RECORD: Final = struct.Struct("<qHI")
+"""The header of a record: the timestamp in ns, the type id and the payload length."""
+
+SUFFIX: Final = ".journal"
+
+REPLAYING: Final[ContextVar[bool]] = ContextVar("REPLAYING", default=False)
+
+
+def hsm_is_replaying() -> bool:
+	"""Whether the current step is a side-effect free replay of a journal.
+
+	A callback that is not `pure` checks this to skip its side effects, e.g.
+	sending a message, while it still computes the next node and context.
+	"""
+
+	return REPLAYING.get()
+
+
+class JournalRecord(NamedTuple):
+	timestamp: int
+	"""The time in ns at which the event was appended."""
+	event: Any
+
+
+class JournalPosition(NamedTuple):
+	segment: int
+	"""The index of the segment, the number in its file name."""
+	offset: int
+	"""The offset of the record in the segment."""
+
+
+@final
+class Journal:
+	"""Append events to segment files in a directory.
+
+	A new segment is started when the journal is opened and whenever the
+	current segment would grow past `segment_size`, so that the segment that
+	was written during a crash is never appended to.
+
+	Args:
+		directory (str | os.PathLike[str]): The directory of the segments,
+			created if it does not exist.
+		event_types (Sequence[type]): The types of the events, indexed by type id.
+		segment_size (int, optional): The size of a segment in bytes before a new
+			one is started. Defaults to 64 MiB.
+		clock (Callable[[], int], optional): The clock of the timestamps in ns.
+			Defaults to `time.time_ns`.
+	"""
+
+	__slots__ = ("directory", "segment_size", "clock", "_type_ids", "_file", "_index", "_size")
+
+	def __init__(
+		self,
+		directory: str | os.PathLike[str],
+		event_types: Sequence[type],
+		segment_size: int = 64 << 20,
+		clock: Callable[[], int] = time.time_ns,
+	) -> None:
+		self.directory: Final = Path(directory)
+		self.segment_size: Final = segment_size
+		self.clock: Final = clock
+		self._type_ids: Final = {event_type: i for i, event_type in enumerate(event_types)}
+		self.directory.mkdir(parents=True, exist_ok=True)
+		segments: Final = _hsm_get_segments(self.directory)
+		self._index = int(segments[-1].stem) + 1 if segments else 0
+		self._file: BinaryIO | None = None
+		self._size = 0
+
+	def __repr__(self) -> str:
+		return f"{type(self).__name__}({str(self.directory)!r}, segment={self._index})"
+
+	def __enter__(self) -> "Journal":
+		return self
+
+	def __exit__(
+		self,
+		exc_type: type[BaseException] | None,
+		exc: BaseException | None,
+		traceback: TracebackType | None,
+	) -> None:
+		self.close()
+
+	def append(self, event: Any) -> JournalPosition:
+		"""Append an event.
+
+		Returns:
+			JournalPosition: Where the record of the event starts.
+
+		Raises:
+			KeyError: If the type of the event is not one of `event_types`.
+		"""
+
+		type_id: Final = self._type_ids[type(event)]
+		payload: Final = pickle.dumps(tuple(event), protocol=5)
+		header: Final = RECORD.pack(self.clock(), type_id, len(payload))
+		size: Final = len(header) + len(payload)
+		if self._file is None or self._size + size > self.segment_size:
+			self._rotate()
+		file: Final = self._file
+		assert file is not None
+		position: Final = JournalPosition(self._index - 1, self._size)
+		file.write(header)
+		file.write(payload)
+		self._size += size
+		return position
+
+	def flush(self, fsync: bool = False) -> None:
+		"""Write the buffered records to the segment, and to the disk if `fsync`."""
+
+		if self._file is not None:
+			self._file.flush()
+			if fsync:
+				os.fsync(self._file.fileno())
+
+	def close(self) -> None:
+		if self._file is not None:
+			self._file.close()
+			self._file = None
+
+	def _rotate(self) -> None:
+		self.close()
+		self._file = file = open(self.directory / f"{self._index:08d}{SUFFIX}", "xb")
+		self._index += 1
+		file.write(MAGIC)
+		self._size = len(MAGIC)
+
+
+def _hsm_get_segments(directory: Path) -> list[Path]:
+	return sorted(directory.glob(f"*{SUFFIX}"))
+
+
+def hsm_journal_handle_event(journal: Journal, machine: Machine, event: Any) -> Any:
+	"""Handle an event for a machine and append it to a journal if it was accepted.
+
+	An event is accepted if handling it did not raise. The events that the
+	machine posts with `hsm_post` are not appended, because replaying the
+	accepted event posts them again.
+
+	Returns:
+		Type[Node]: The new node of the machine.
+	"""
+
+	node: Final = hsm_machine_handle_event(machine, event)
+	journal.append(event)
+	return node
+
+
+def hsm_read_journal(
+	directory: str | os.PathLike[str],
+	event_types: Sequence[type],
+	until: int | None = None,
+	start: JournalPosition | None = None,
+) -> Iterator[JournalRecord]:
+	"""Read the records of a journal, memory-mapping one segment at a time.
+
+	A record that was cut short by a crash ends its segment.
+
+	Args:
+		directory (str | os.PathLike[str]): The directory of the segments.
+		event_types (Sequence[type]): The types of the events, indexed by type id.
+		until (int | None, optional): Stop before the first record with a later
+			timestamp in ns. Defaults to None.
+		start (JournalPosition | None, optional): Start at the record returned by
+			`Journal.append`. Defaults to the first record.
+
+	Yields:
+		JournalRecord: The records, in the order they were appended.
+
+	Raises:
+		ValueError: If a segment does not start with `MAGIC`.
+	"""
+
+	unpack: Final = RECORD.unpack_from
+	header_size: Final = RECORD.size
+	for segment in _hsm_get_segments(Path(directory)):
+		offset = len(MAGIC)
+		if start is not None:
+			if (index := int(segment.stem)) < start.segment:
+				continue
+			if index == start.segment:
+				offset = start.offset
+		with open(segment, "rb") as file:
+			if os.fstat(file.fileno()).st_size == 0:
+				continue
+			with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+				if mapped[: len(MAGIC)] != MAGIC:
+					raise ValueError(f"{segment} is not a journal segment")
+				end = len(mapped)
+				while offset < end:
+					if offset + header_size > end:
+						logger.warning("Truncated record at %s:%d", segment, offset)
+						break
+					timestamp, type_id, length = unpack(mapped, offset)
+					if until is not None and timestamp > until:
+						return
+					offset += header_size
+					if offset + length > end:
+						logger.warning("Truncated record at %s:%d", segment, offset - header_size)
+						break
+					fields = pickle.loads(mapped[offset : offset + length])
+					offset += length
+					yield JournalRecord(timestamp, event_types[type_id](*fields))
+
+
+def hsm_replay(
+	directory: str | os.PathLike[str],
+	event_types: Sequence[type],
+	machine: Machine,
+	side_effect_free: bool = True,
+	until: int | None = None,
+) -> Any:
+	"""Rebuild the state of a machine by handling the events of a journal.
+
+	Args:
+		directory (str | os.PathLike[str]): The directory of the segments.
+		event_types (Sequence[type]): The types of the events, indexed by type id.
+		machine (Machine): The machine, in the state it had when the journal
+			was started, e.g. a new machine with its entries handled.
+		side_effect_free (bool, optional): Handle the events with
+			`hsm_is_replaying` returning True. Defaults to True.
+		until (int | None, optional): Only replay the events appended at or
+			before this timestamp in ns. Defaults to None.
+
+	Returns:
+		Type[Node]: The node of the machine after the replay.
+	"""
+
+	token: Final = REPLAYING.set(side_effect_free)
+	try:
+		return hsm_machine_handle_events(
+			machine, (record.event for record in hsm_read_journal(directory, event_types, until))
+		)
+	finally:
+		REPLAYING.reset(token)
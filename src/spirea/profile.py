@@ -0,0 +1,109 @@
+# Copyright (c) 2025 JP Hutchins
+# SPDX-License-Identifier: MIT
+
+"""Latency histograms of the `entry`, `exit` and event handler callbacks.
+
+`LatencyHistograms` is a `LatencyRecorder` that counts the latency of each
+callback in fixed log-scale buckets per (node, callback, event type):
+
+>>> from spirea._common import hsm_set_latency_recorder
+>>> histograms = LatencyHistograms()
+>>> previous = hsm_set_latency_recorder(histograms)
+>>> hsm_set_latency_recorder(previous) is histograms
+True
+"""
+
+from array import array
+from typing import Any, Final, NamedTuple, final
+
+from spirea._common import Callback
+
+BUCKETS: Final = 40
+"""The number of buckets of a histogram.
+
+Bucket 0 counts latencies of 0 ns and bucket `i` counts latencies in
+[2 ** (i - 1), 2 ** i) ns. The last bucket also counts all longer latencies.
+"""
+
+
+class HistogramKey(NamedTuple):
+	node: Any
+	callback: Callback
+	event_type: type | None
+	"""The type of the event that caused the callback, None for initial entries."""
+
+
+class LatencyHistogram(NamedTuple):
+	"""A snapshot of the bucket counts of a histogram."""
+
+	counts: tuple[int, ...]
+
+	@property
+	def total(self) -> int:
+		"""The number of recorded latencies."""
+		return sum(self.counts)
+
+	def percentile(self, percent: float) -> int:
+		"""Get the upper bound in ns of the bucket that contains a percentile.
+
+		>>> LatencyHistogram((0, 1, 2, 1) + (0,) * (BUCKETS - 4)).percentile(50)
+		4
+
+		Args:
+			percent (float): The percentile, from 0 to 100.
+
+		Returns:
+			int: The exclusive upper bound of the bucket, 0 if nothing was recorded.
+		"""
+
+		threshold: Final = self.total * percent / 100
+		count = 0
+		for bucket, bucket_count in enumerate(self.counts):
+			count += bucket_count
+			if count and count >= threshold:
+				return 1 << bucket
+		return 0
+
+
+@final
+class LatencyHistograms:
+	"""Fixed-bucket log-scale latency histograms per (node, callback, event type)."""
+
+	__slots__ = ("_histograms",)
+
+	def __init__(self) -> None:
+		self._histograms: Final[dict[tuple[Any, Callback, type | None], array[int]]] = {}
+
+	def record(
+		self, node: Any, callback: Callback, event_type: type | None, latency_ns: int, /
+	) -> None:
+		try:
+			histogram = self._histograms[node, callback, event_type]
+		except KeyError:
+			histogram = self._histograms[node, callback, event_type] = array(
+				"Q", bytes(8 * BUCKETS)
+			)
+		histogram[min(latency_ns.bit_length(), BUCKETS - 1)] += 1
+
+	def __len__(self) -> int:
+		return len(self._histograms)
+
+	def __repr__(self) -> str:
+		return f"{type(self).__name__}({len(self)} histograms)"
+
+	def snapshot(self) -> dict[HistogramKey, LatencyHistogram]:
+		"""Copy the current bucket counts.
+
+		Returns:
+			dict[HistogramKey, LatencyHistogram]: The histogram of each key.
+		"""
+
+		return {
+			HistogramKey(*key): LatencyHistogram(tuple(histogram))
+			for key, histogram in self._histograms.items()
+		}
+
+	def reset(self) -> None:
+		"""Forget all recorded latencies."""
+
+		self._histograms.clear()
@@ -0,0 +1,212 @@
+# Copyright (c) 2025 JP Hutchins
+# SPDX-License-Identifier: MIT
+
+"""Record a machine so that its state after any event can be rebuilt quickly.
+
+A `TimeTravelRecorder` appends each event that a machine accepts to a
+`spirea.journal.Journal` and writes a `spirea.snapshot` of the machine every
+`interval` events, with an index from the sequence number of the snapshot to
+the offsets of the snapshot and of the next event. `hsm_seek` restores the
+nearest snapshot and replays at most `interval` events from there, instead
+of replaying the whole journal.
+
+The directory of a recording holds the `events` journal, the `snapshots`
+file and the `index` file of `INDEX` rows.
+"""
+
+import mmap
+import os
+import pickle
+import struct
+import time
+from array import array
+from bisect import bisect_right
+from itertools import islice
+from pathlib import Path
+from types import TracebackType
+from typing import Any, Callable, Final, Sequence, final
+
+from spirea._common import Machine
+from spirea.journal import REPLAYING, Journal, JournalPosition, hsm_read_journal
+from spirea.snapshot import Snapshot, hsm_restore, hsm_snapshot
+from spirea.sync import hsm_machine_handle_event, hsm_machine_handle_events
+
+INDEX: Final = struct.Struct("<qqqq")
+"""A row of the index: the sequence number, the offset of the snapshot and the
+segment and offset of the next event in the journal."""
+
+SNAPSHOT: Final = struct.Struct("<QI")
+"""The header of a snapshot: the length of its data and its number of buffers."""
+
+BUFFER: Final = struct.Struct("<Q")
+"""The header of an out-of-band buffer of a snapshot: its length."""
+
+
+@final
+class TimeTravelRecorder:
+	"""Handle events for a machine and record them with periodic snapshots.
+
+	Args:
+		directory (str | os.PathLike[str]): The directory of the recording,
+			created if it does not exist.
+		event_types (Sequence[type]): The types of the events, indexed by type id.
+		machine (Machine): The machine, with its entries handled.
+		interval (int, optional): The number of events between snapshots.
+			Defaults to 1000.
+		clock (Callable[[], int], optional): The clock of the timestamps in ns.
+			Defaults to `time.time_ns`.
+
+	Raises:
+		FileExistsError: If the directory already holds a recording.
+	"""
+
+	__slots__ = (
+		"directory",
+		"machine",
+		"interval",
+		"sequence",
+		"journal",
+		"_snapshots",
+		"_index",
+		"_snapshot_offset",
+	)
+
+	def __init__(
+		self,
+		directory: str | os.PathLike[str],
+		event_types: Sequence[type],
+		machine: Machine,
+		interval: int = 1000,
+		clock: Callable[[], int] = time.time_ns,
+	) -> None:
+		self.directory: Final = Path(directory)
+		self.machine: Final = machine
+		self.interval: Final = interval
+		self.sequence = 0
+		"""The number of recorded events."""
+		self.directory.mkdir(parents=True, exist_ok=True)
+		self._snapshots: Final = open(self.directory / "snapshots", "xb")
+		self._index: Final = open(self.directory / "index", "xb")
+		self.journal: Final = Journal(self.directory / "events", event_types, clock=clock)
+		self._snapshot_offset: int | None = None
+		"""The offset of the snapshot of `sequence` if it is not indexed yet."""
+
+	def __repr__(self) -> str:
+		return f"{type(self).__name__}({str(self.directory)!r}, sequence={self.sequence})"
+
+	def __enter__(self) -> "TimeTravelRecorder":
+		return self
+
+	def __exit__(
+		self,
+		exc_type: type[BaseException] | None,
+		exc: BaseException | None,
+		traceback: TracebackType | None,
+	) -> None:
+		self.close()
+
+	def handle_event(self, event: Any) -> Any:
+		"""Handle an event for the machine and record it if it was accepted.
+
+		Returns:
+			Type[Node]: The new node of the machine.
+		"""
+
+		if self._snapshot_offset is None and self.sequence % self.interval == 0:
+			self._snapshot_offset = self._write_snapshot()
+		node: Final = hsm_machine_handle_event(self.machine, event)
+		position: Final = self.journal.append(event)
+		if self._snapshot_offset is not None:
+			self._index.write(INDEX.pack(self.sequence, self._snapshot_offset, *position))
+			self._snapshot_offset = None
+		self.sequence += 1
+		return node
+
+	def flush(self) -> None:
+		"""Write the buffered events, snapshots and index rows to the files."""
+
+		self.journal.flush()
+		self._snapshots.flush()
+		self._index.flush()
+
+	def close(self) -> None:
+		self.journal.close()
+		self._snapshots.close()
+		self._index.close()
+
+	def _write_snapshot(self) -> int:
+		file: Final = self._snapshots
+		offset: Final = file.tell()
+		data, buffers = hsm_snapshot((self.machine,))
+		file.write(SNAPSHOT.pack(len(data), len(buffers)))
+		file.write(data)
+		for buffer in buffers:
+			raw = buffer.raw()
+			file.write(BUFFER.pack(raw.nbytes))
+			file.write(raw)
+		return offset
+
+
+def _hsm_read_snapshot(path: Path, offset: int) -> Snapshot:
+	with open(path, "rb") as file:
+		with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+			length, count = SNAPSHOT.unpack_from(mapped, offset)
+			offset += SNAPSHOT.size
+			data: Final = mapped[offset : offset + length]
+			offset += length
+			buffers: Final[list[pickle.PickleBuffer]] = []
+			for _ in range(count):
+				(length,) = BUFFER.unpack_from(mapped, offset)
+				offset += BUFFER.size
+				# copied, so that the contexts do not keep the file mapped
+				buffers.append(pickle.PickleBuffer(bytearray(mapped[offset : offset + length])))
+				offset += length
+	return Snapshot(data, tuple(buffers))
+
+
+def hsm_seek(
+	directory: str | os.PathLike[str],
+	event_types: Sequence[type],
+	sequence: int,
+) -> Machine:
+	"""Rebuild a recorded machine as it was after a number of events.
+
+	The nearest snapshot at or before `sequence` is restored and the events
+	after it are replayed with `spirea.journal.hsm_is_replaying` returning True.
+
+	Args:
+		directory (str | os.PathLike[str]): The directory of the recording.
+		event_types (Sequence[type]): The types of the events, indexed by type id.
+		sequence (int): The number of events to rebuild the machine after.
+
+	Returns:
+		Machine: A new machine in the state after `sequence` events.
+
+	Raises:
+		IndexError: If fewer than `sequence` events were recorded.
+	"""
+
+	path: Final = Path(directory)
+	index: Final = array("q", (path / "index").read_bytes())
+	row: Final = bisect_right(index[::4], sequence) - 1
+	if sequence < 0 or row < 0:
+		raise IndexError(f"No snapshot at or before event {sequence}")
+	base, snapshot_offset, segment, offset = index[row * 4 : row * 4 + 4]
+
+	(machine,) = hsm_restore(_hsm_read_snapshot(path / "snapshots", snapshot_offset))
+	events: Final = [
+		record.event
+		for record in islice(
+			hsm_read_journal(path / "events", event_types, start=JournalPosition(segment, offset)),
+			sequence - base,
+		)
+	]
+	if len(events) < sequence - base:
+		raise IndexError(f"Only {base + len(events)} events were recorded, not {sequence}")
+
+	token: Final = REPLAYING.set(True)
+	try:
+		hsm_machine_handle_events(machine, events)
+	finally:
+		REPLAYING.reset(token)
+	return machine
@@ -0,0 +1,488 @@
+# Copyright (c) 2025 JP Hutchins
+# SPDX-License-Identifier: MIT
+
+"""Run-to-completion mailboxes for `spirea.asyncio` machines.
+
+An `AsyncMachineRunner` owns a bounded `asyncio.Queue` mailbox for one
+machine and a task that handles the events in the mailbox strictly in order,
+one at a time, so that callers only post events. An `AsyncMachineScheduler`
+does the same for many machines with a fixed pool of worker tasks.
+"""
+
+import asyncio
+import logging
+from array import array
+from collections import deque
+from enum import Enum, unique
+from time import perf_counter_ns
+from typing import Any, Final, NamedTuple, final
+
+from spirea._common import Machine
+from spirea.asyncio import hsm_machine_handle_event
+from spirea.profile import BUCKETS, LatencyHistogram
+
+logger: Final = logging.getLogger(__name__)
+
+
+@final
+@unique
+class Overflow(Enum):
+	"""What posting to a full mailbox does."""
+
+	BLOCK = "block"
+	"""Wait until there is room in the mailbox."""
+
+	DROP_OLDEST = "drop_oldest"
+	"""Drop the oldest event in the mailbox to make room."""
+
+	DROP_NEWEST = "drop_newest"
+	"""Drop the posted event."""
+
+
+class RunnerStats(NamedTuple):
+	"""A snapshot of the counters of an `AsyncMachineRunner`."""
+
+	depth: int
+	"""The number of events in the mailbox."""
+	handled: int
+	dropped: int
+	errors: int
+	"""The number of events whose handling raised."""
+	queueing_delay_ns_mean: float
+	queueing_delay_ns_max: int
+
+
+@final
+class AsyncMachineRunner:
+	"""Handle the events posted to a machine in order, one at a time.
+
+	The machine should have done its entries before the runner is started.
+	If handling an event raises, the exception is logged and counted, and the
+	runner goes on to the next event.
+
+	Args:
+		machine (Machine): The machine to run.
+		maxsize (int, optional): The capacity of the mailbox, 0 for unbounded.
+			Defaults to 0.
+		overflow (Overflow, optional): What posting to a full mailbox does.
+			Defaults to `Overflow.BLOCK`.
+	"""
+
+	__slots__ = (
+		"machine",
+		"overflow",
+		"handled",
+		"dropped",
+		"errors",
+		"_mailbox",
+		"_task",
+		"_busy",
+		"_stopping",
+		"_delay_total",
+		"_delay_max",
+	)
+
+	def __init__(
+		self, machine: Machine, maxsize: int = 0, overflow: Overflow = Overflow.BLOCK
+	) -> None:
+		if maxsize <= 0 and overflow is not Overflow.BLOCK:
+			raise ValueError(f"{overflow} requires a bounded mailbox")
+
+		self.machine: Final = machine
+		self.overflow: Final = overflow
+		self.handled = 0
+		self.dropped = 0
+		self.errors = 0
+
+		self._mailbox: Final[asyncio.Queue[tuple[int, Any]]] = asyncio.Queue(maxsize)
+		self._task: asyncio.Task[None] | None = None
+		self._busy = False
+		self._stopping = False
+		self._delay_total = 0
+		self._delay_max = 0
+
+	def __repr__(self) -> str:
+		return f"{type(self).__name__}({self.machine!r}, depth={self.depth})"
+
+	@property
+	def depth(self) -> int:
+		"""The number of events in the mailbox."""
+		return self._mailbox.qsize()
+
+	def stats(self) -> RunnerStats:
+		"""Get a snapshot of the counters."""
+
+		return RunnerStats(
+			depth=self.depth,
+			handled=self.handled,
+			dropped=self.dropped,
+			errors=self.errors,
+			queueing_delay_ns_mean=self._delay_total / self.handled if self.handled else 0.0,
+			queueing_delay_ns_max=self._delay_max,
+		)
+
+	def post_nowait(self, event: Any) -> bool:
+		"""Post an event without waiting.
+
+		Args:
+			event (TEvent): The event to post.
+
+		Returns:
+			bool: Whether the event was put in the mailbox.
+
+		Raises:
+			asyncio.QueueFull: If the mailbox is full and the overflow is `Overflow.BLOCK`.
+		"""
+
+		mailbox: Final = self._mailbox
+		if mailbox.full():
+			if self.overflow is Overflow.DROP_NEWEST:
+				self.dropped += 1
+				return False
+			if self.overflow is Overflow.DROP_OLDEST:
+				mailbox.get_nowait()
+				mailbox.task_done()
+				self.dropped += 1
+		mailbox.put_nowait((perf_counter_ns(), event))
+		return True
+
+	async def post(self, event: Any) -> bool:
+		"""Post an event, waiting for room in a full mailbox if the overflow is `Overflow.BLOCK`.
+
+		Args:
+			event (TEvent): The event to post.
+
+		Returns:
+			bool: Whether the event was put in the mailbox.
+		"""
+
+		if self.overflow is Overflow.BLOCK:
+			await self._mailbox.put((perf_counter_ns(), event))
+			return True
+		return self.post_nowait(event)
+
+	def start(self) -> asyncio.Task[None]:
+		"""Start handling the events in the mailbox.
+
+		Returns:
+			asyncio.Task[None]: The task of the runner.
+		"""
+
+		if self._task is not None and not self._task.done():
+			raise RuntimeError(f"{self!r} is already running")
+		self._stopping = False
+		self._task = asyncio.create_task(self._run())
+		return self._task
+
+	async def join(self) -> None:
+		"""Wait until every posted event has been handled or dropped."""
+
+		await self._mailbox.join()
+
+	async def stop(self) -> None:
+		"""Stop the runner after the event that it is handling, if any.
+
+		The events left in the mailbox are kept for the next `start`.
+		"""
+
+		task: Final = self._task
+		if task is None:
+			return
+		self._stopping = True
+		if not self._busy:
+			task.cancel()
+		try:
+			await task
+		except asyncio.CancelledError:
+			pass
+		self._task = None
+
+	async def __aenter__(self) -> "AsyncMachineRunner":
+		self.start()
+		return self
+
+	async def __aexit__(self, exc_type: type[BaseException] | None, *_: Any) -> None:
+		if exc_type is None:
+			await self.join()
+		await self.stop()
+
+	async def _run(self) -> None:
+		mailbox: Final = self._mailbox
+		machine: Final = self.machine
+
+		while not self._stopping:
+			posted_ns, event = await mailbox.get()
+			self._busy = True
+			delay = perf_counter_ns() - posted_ns
+			self._delay_total += delay
+			if delay > self._delay_max:
+				self._delay_max = delay
+			try:
+				await hsm_machine_handle_event(machine, event)
+			except Exception:
+				self.errors += 1
+				logger.exception(f"Error handling {event!r} in {machine!r}")
+			finally:
+				self.handled += 1
+				self._busy = False
+				mailbox.task_done()
+
+
+class SchedulerStats(NamedTuple):
+	"""A snapshot of the counters of an `AsyncMachineScheduler`."""
+
+	machines: int
+	depth: int
+	"""The number of events in all of the mailboxes."""
+	handled: int
+	dropped: int
+	errors: int
+	"""The number of events whose handling raised."""
+	throughput: float
+	"""The handled events per second since the scheduler was started."""
+	latency_ns_p99: int
+	"""The upper bound of the 99th percentile of the time from post to handled."""
+
+
+@final
+class _Mailbox:
+	"""The events of a machine that is run by an `AsyncMachineScheduler`."""
+
+	__slots__ = ("machine", "events", "maxsize", "overflow", "scheduled", "not_full")
+
+	def __init__(self, machine: Machine, maxsize: int, overflow: Overflow) -> None:
+		self.machine: Final = machine
+		self.events: Final[deque[tuple[int, Any]]] = deque()
+		self.maxsize: Final = maxsize
+		self.overflow: Final = overflow
+		self.scheduled = False
+		"""Whether the mailbox is in the ready queue or being handled by a worker."""
+		self.not_full: Final = asyncio.Event()
+		self.not_full.set()
+
+	def full(self) -> bool:
+		return 0 < self.maxsize <= len(self.events)
+
+
+@final
+class AsyncMachineScheduler:
+	"""Run many machines on a fixed pool of worker tasks.
+
+	Each machine has its own mailbox and its events are handled in order, one
+	at a time, while different machines are handled concurrently. A machine
+	with events is put at the back of a ready queue, and a worker handles up to
+	`quantum` of its events before putting it at the back again, so a chatty
+	machine cannot starve the others.
+
+	Args:
+		workers (int, optional): The number of worker tasks. Defaults to 4.
+		max_in_flight (int, optional): The most events that are handled at once
+			across all workers. Defaults to no limit beyond `workers`.
+		quantum (int, optional): The most events of a machine that a worker
+			handles in a row. Defaults to 1.
+	"""
+
+	__slots__ = (
+		"workers",
+		"quantum",
+		"handled",
+		"dropped",
+		"errors",
+		"_mailboxes",
+		"_ready",
+		"_semaphore",
+		"_tasks",
+		"_idle",
+		"_stopping",
+		"_started_ns",
+		"_latencies",
+	)
+
+	def __init__(
+		self, workers: int = 4, max_in_flight: int | None = None, quantum: int = 1
+	) -> None:
+		if workers < 1 or quantum < 1:
+			raise ValueError("The workers and quantum must be positive")
+
+		self.workers: Final = workers
+		self.quantum: Final = quantum
+		self.handled = 0
+		self.dropped = 0
+		self.errors = 0
+
+		self._mailboxes: Final[dict[Machine, _Mailbox]] = {}
+		self._ready: Final[asyncio.Queue[_Mailbox]] = asyncio.Queue()
+		self._semaphore: Final = None if max_in_flight is None else asyncio.Semaphore(max_in_flight)
+		self._tasks: list[asyncio.Task[None]] = []
+		self._idle: Final[set[asyncio.Task[Any]]] = set()
+		self._stopping = False
+		self._started_ns = 0
+		self._latencies: Final = array("Q", bytes(8 * BUCKETS))
+
+	def __repr__(self) -> str:
+		return f"{type(self).__name__}({len(self._mailboxes)} machines, {self.workers} workers)"
+
+	def add(self, machine: Machine, maxsize: int = 0, overflow: Overflow = Overflow.BLOCK) -> None:
+		"""Add a machine with its own mailbox.
+
+		The machine should have done its entries before its events are handled.
+
+		Args:
+			machine (Machine): The machine to run.
+			maxsize (int, optional): The capacity of the mailbox, 0 for unbounded.
+				Defaults to 0.
+			overflow (Overflow, optional): What posting to a full mailbox does.
+				Defaults to `Overflow.BLOCK`.
+		"""
+
+		if maxsize <= 0 and overflow is not Overflow.BLOCK:
+			raise ValueError(f"{overflow} requires a bounded mailbox")
+		if machine in self._mailboxes:
+			raise ValueError(f"{machine!r} was already added")
+		self._mailboxes[machine] = _Mailbox(machine, maxsize, overflow)
+
+	def depth(self, machine: Machine) -> int:
+		"""Get the number of events in the mailbox of a machine."""
+
+		return len(self._mailboxes[machine].events)
+
+	def stats(self) -> SchedulerStats:
+		"""Get a snapshot of the counters."""
+
+		elapsed_ns: Final = perf_counter_ns() - self._started_ns if self._started_ns else 0
+		return SchedulerStats(
+			machines=len(self._mailboxes),
+			depth=sum(len(mailbox.events) for mailbox in self._mailboxes.values()),
+			handled=self.handled,
+			dropped=self.dropped,
+			errors=self.errors,
+			throughput=self.handled * 1e9 / elapsed_ns if elapsed_ns else 0.0,
+			latency_ns_p99=LatencyHistogram(tuple(self._latencies)).percentile(99),
+		)
+
+	def post_nowait(self, machine: Machine, event: Any) -> bool:
+		"""Post an event to a machine without waiting.
+
+		Args:
+			machine (Machine): The machine.
+			event (TEvent): The event to post.
+
+		Returns:
+			bool: Whether the event was put in the mailbox.
+
+		Raises:
+			asyncio.QueueFull: If the mailbox is full and the overflow is `Overflow.BLOCK`.
+		"""
+
+		mailbox: Final = self._mailboxes[machine]
+		if mailbox.full():
+			if mailbox.overflow is Overflow.BLOCK:
+				raise asyncio.QueueFull
+			self.dropped += 1
+			if mailbox.overflow is Overflow.DROP_NEWEST:
+				return False
+			mailbox.events.popleft()
+		self._put(mailbox, event)
+		return True
+
+	async def post(self, machine: Machine, event: Any) -> bool:
+		"""Post an event, waiting for room in a full mailbox if the overflow is `Overflow.BLOCK`.
+
+		Args:
+			machine (Machine): The machine.
+			event (TEvent): The event to post.
+
+		Returns:
+			bool: Whether the event was put in the mailbox.
+		"""
+
+		mailbox: Final = self._mailboxes[machine]
+		if mailbox.overflow is not Overflow.BLOCK:
+			return self.post_nowait(machine, event)
+		while mailbox.full():
+			mailbox.not_full.clear()
+			await mailbox.not_full.wait()
+		self._put(mailbox, event)
+		return True
+
+	def _put(self, mailbox: _Mailbox, event: Any) -> None:
+		mailbox.events.append((perf_counter_ns(), event))
+		if not mailbox.scheduled:
+			mailbox.scheduled = True
+			self._ready.put_nowait(mailbox)
+
+	def start(self) -> None:
+		"""Start the worker tasks."""
+
+		if self._tasks:
+			raise RuntimeError(f"{self!r} is already running")
+		self._stopping = False
+		self._started_ns = perf_counter_ns()
+		self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+	async def join(self) -> None:
+		"""Wait until every posted event has been handled or dropped."""
+
+		await self._ready.join()
+
+	async def stop(self) -> None:
+		"""Stop the workers after the events that they are handling, if any.
+
+		The events left in the mailboxes are kept for the next `start`.
+		"""
+
+		self._stopping = True
+		for task in self._idle:
+			task.cancel()
+		await asyncio.gather(*self._tasks, return_exceptions=True)
+		self._tasks = []
+
+	async def __aenter__(self) -> "AsyncMachineScheduler":
+		self.start()
+		return self
+
+	async def __aexit__(self, exc_type: type[BaseException] | None, *_: Any) -> None:
+		if exc_type is None:
+			await self.join()
+		await self.stop()
+
+	async def _work(self) -> None:
+		ready: Final = self._ready
+		semaphore: Final = self._semaphore
+		latencies: Final = self._latencies
+		task: Final = asyncio.current_task()
+		assert task is not None
+
+		while not self._stopping:
+			self._idle.add(task)
+			try:
+				mailbox = await ready.get()
+			finally:
+				self._idle.discard(task)
+
+			events = mailbox.events
+			try:
+				for _ in range(self.quantum):
+					if not events or self._stopping:
+						break
+					posted_ns, event = events.popleft()
+					mailbox.not_full.set()
+					try:
+						if semaphore is None:
+							await hsm_machine_handle_event(mailbox.machine, event)
+						else:
+							async with semaphore:
+								await hsm_machine_handle_event(mailbox.machine, event)
+					except Exception:
+						self.errors += 1
+						logger.exception(f"Error handling {event!r} in {mailbox.machine!r}")
+					self.handled += 1
+					latency = perf_counter_ns() - posted_ns
+					latencies[min(latency.bit_length(), BUCKETS - 1)] += 1
+			finally:
+				# put the machine at the back of the ready queue for fairness
+				if events:
+					ready.put_nowait(mailbox)
+				else:
+					mailbox.scheduled = False
+				ready.task_done()
@@ -0,0 +1,153 @@
+# Copyright (c) 2025 JP Hutchins
+# SPDX-License-Identifier: MIT
+
+"""Discrete-event simulation of many machines on a virtual clock.
+
+A `Simulation` owns a virtual clock, a priority queue of scheduled events and
+a `spirea.timers.TimerService` for the timeouts that the machines arm. Time
+jumps straight to the next scheduled event or timeout, so days of behaviour
+run in moments. Events are handled with `spirea.sync.hsm_machine_handle_event`,
+the same dispatch path as in production.
+"""
+
+import heapq
+import itertools
+import math
+from typing import Any, Final, final
+
+from spirea._common import hsm_set_timeout_service
+from spirea.sync import Machine, hsm_machine_handle_event
+from spirea.timers import TimerService
+
+
+@final
+class Simulation:
+	"""A virtual clock and a queue of events for many machines.
+
+	The timeouts that the machines arm with `spirea.timers.hsm_arm_timeout`
+	are served by `timers` while the simulation runs. A timeout and an event
+	that are due on the same tick are handled timeout first, and events that
+	are due on the same tick are handled in the order they were scheduled.
+
+	Args:
+		resolution (float, optional): The length of a tick of the virtual clock in
+			seconds. Defaults to 0.001.
+	"""
+
+	__slots__ = ("timers", "handled", "_queue", "_sequence")
+
+	def __init__(self, resolution: float = 0.001) -> None:
+		self.timers: Final = TimerService(resolution)
+		self.handled = 0
+		"""The number of events and timeouts that were handled."""
+		self._queue: Final[list[tuple[int, int, Machine, Any]]] = []
+		self._sequence: Final = itertools.count()
+
+	def __repr__(self) -> str:
+		return (
+			f"{type(self).__name__}(now={self.now}, {len(self._queue)} events, "
+			f"{len(self.timers.wheel)} timers)"
+		)
+
+	@property
+	def now(self) -> float:
+		"""The virtual time in seconds."""
+		return self.timers.now
+
+	def __len__(self) -> int:
+		return len(self._queue) + len(self.timers.wheel)
+
+	def schedule(self, machine: Machine, event: Any, delay: float = 0.0) -> None:
+		"""Schedule an event for a machine.
+
+		Args:
+			machine (Machine): The machine, with its entries handled.
+			event (TEvent): The event.
+			delay (float, optional): The delay from now in seconds, rounded to the
+				nearest tick. Defaults to 0.0.
+
+		Raises:
+			ValueError: If the delay is negative.
+		"""
+
+		if delay < 0:
+			raise ValueError(f"Cannot schedule {event!r} {-delay} seconds in the past")
+		heapq.heappush(
+			self._queue,
+			(
+				self.timers.wheel.current + round(delay / self.timers.resolution),
+				next(self._sequence),
+				machine,
+				event,
+			),
+		)
+
+	def step(self, until: float | None = None) -> bool:
+		"""Handle the next event or the timeouts of the next tick.
+
+		Args:
+			until (float | None, optional): Do nothing if the next event or timeout
+				is due after this time. Defaults to None.
+
+		Returns:
+			bool: False if there was nothing to handle.
+		"""
+
+		previous: Final = hsm_set_timeout_service(self.timers)
+		try:
+			return self._step(self._limit(until))
+		finally:
+			hsm_set_timeout_service(previous)
+
+	def run(self, until: float | None = None) -> int:
+		"""Handle events and timeouts until none are left or the next is due after a time.
+
+		A machine that keeps arming timeouts or scheduling events runs forever
+		unless `until` is given.
+
+		Args:
+			until (float | None, optional): Stop before the events and timeouts that
+				are due after this time and advance the clock to it. Defaults to None.
+
+		Returns:
+			int: The number of events and timeouts that were handled.
+		"""
+
+		handled: Final = self.handled
+		limit: Final = self._limit(until)
+		previous: Final = hsm_set_timeout_service(self.timers)
+		try:
+			while self._step(limit):
+				pass
+			if until is not None:
+				self.timers.tick(until)
+		finally:
+			hsm_set_timeout_service(previous)
+		return self.handled - handled
+
+	def _limit(self, until: float | None) -> float:
+		return math.inf if until is None else self.timers.to_tick(until)
+
+	def _step(self, limit: float) -> bool:
+		queue: Final = self._queue
+		timers: Final = self.timers
+		wheel: Final = timers.wheel
+
+		due: Final = queue[0][0] if queue else math.inf
+		if wheel.count:
+			# a tick of the wheel may only cascade timers to a lower level
+			tick = wheel.next_tick()
+			if tick <= due:
+				if tick > limit:
+					return False
+				self.handled += timers.expire(tick)
+				return True
+
+		if not queue or due > limit:
+			return False
+		tick, _, machine, event = heapq.heappop(queue)
+		# nothing expires before the event; this only moves the clock
+		timers.expire(tick)
+		hsm_machine_handle_event(machine, event)
+		self.handled += 1
+		return True
@@ -0,0 +1,115 @@
+# Copyright (c) 2025 JP Hutchins
+# SPDX-License-Identifier: MIT
+
+"""Snapshot and restore the state of machines.
+
+A snapshot stores the current node of each machine as a stable state id, the
+module and qualified name of the node class, and the context of each node
+from the root to the current node. Restoring sets the node and the contexts
+of new machines without calling any `entry`, so a machine resumes exactly
+where it was.
+
+The snapshot is pickled with protocol 5. Contexts that support out-of-band
+buffers, e.g. NumPy arrays or objects that reduce to a `pickle.PickleBuffer`,
+are not copied into `data` but referenced from `buffers`, which the caller
+writes and reads alongside it.
+"""
+
+import importlib
+import pickle
+from array import array
+from typing import Any, Final, Iterable, NamedTuple
+
+from spirea._common import Machine
+
+
+class Snapshot(NamedTuple):
+	"""The pickled state of some machines."""
+
+	data: bytes
+	buffers: tuple[pickle.PickleBuffer, ...]
+	"""The out-of-band buffers of the contexts, in the order `data` refers to them."""
+
+
+def hsm_get_state_id(node: type) -> str:
+	"""Get the stable state id of a node: its module and qualified name.
+
+	Unlike the integer `_id` that `NodeMeta` assigns, the state id does not
+	depend on the order in which node classes are created.
+	"""
+
+	return f"{node.__module__}:{node.__qualname__}"
+
+
+def hsm_get_node_by_state_id(state_id: str) -> Any:
+	"""Get the node class of a state id, importing its module if needed.
+
+	Raises:
+		ImportError: If the module cannot be imported.
+		AttributeError: If the module has no such node.
+	"""
+
+	module, _, qualname = state_id.partition(":")
+	node: Any = importlib.import_module(module)
+	for name in qualname.split("."):
+		node = getattr(node, name)
+	return node
+
+
+def hsm_snapshot(machines: Iterable[Machine]) -> Snapshot:
+	"""Snapshot the current node and the active contexts of machines.
+
+	Args:
+		machines (Iterable[Machine]): The machines, between steps.
+
+	Returns:
+		Snapshot: The snapshot, to restore with `hsm_restore`.
+
+	Raises:
+		KeyError: If a machine has no context for one of its active nodes.
+	"""
+
+	state_ids: Final[dict[type, int]] = {}
+	states: Final = array("q")
+	contexts: Final[list[tuple[Any, ...]]] = []
+	for machine in machines:
+		node = machine.node
+		if (state := state_ids.get(node)) is None:
+			state = state_ids[node] = len(state_ids)
+		states.append(state)
+		machine_contexts = machine.contexts
+		contexts.append(tuple([machine_contexts[active] for active in node._ancestors]))
+
+	buffers: Final[list[pickle.PickleBuffer]] = []
+	data: Final = pickle.dumps(
+		(tuple(map(hsm_get_state_id, state_ids)), states, contexts),
+		protocol=5,
+		buffer_callback=buffers.append,
+	)
+	return Snapshot(data, tuple(buffers))
+
+
+def hsm_restore(snapshot: Snapshot) -> list[Machine]:
+	"""Restore machines from a snapshot without calling any `entry`.
+
+	Args:
+		snapshot (Snapshot): The snapshot from `hsm_snapshot`.
+
+	Returns:
+		list[Machine]: New machines, in the order they were snapshot.
+
+	Raises:
+		ImportError: If the module of a node cannot be imported.
+		AttributeError: If a node no longer exists.
+	"""
+
+	state_ids, states, contexts = pickle.loads(snapshot.data, buffers=snapshot.buffers)
+	nodes: Final = tuple(map(hsm_get_node_by_state_id, state_ids))
+
+	machines: Final[list[Machine]] = []
+	for state, active_contexts in zip(states, contexts):
+		node = nodes[state]
+		machine = Machine(node)
+		machine.contexts.update(zip(node._ancestors, active_contexts))
+		machines.append(machine)
+	return machines
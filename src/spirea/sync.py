@@ -4,23 +4,40 @@
 """Hierarchical State Machine (HSM) API for synchronous runtime."""
 
 import logging
-from typing import Any, Callable, ClassVar, Final, Protocol, Type, assert_never
+from time import perf_counter_ns
+from typing import Any, Callable, ClassVar, Final, Iterable, Iterator, Protocol, Type
 
 from spirea._common import (
+	NODE_CONTEXTS,
+	PROFILE,
+	TIMERS,
+	TRACE,
+	Callback,
+	ContextStore,
 	HSMStatus,
+	LatencyRecorder,
+	Machine,
+	MachinePool,
 	NodeMeta,
+	PoolContexts,
+	PostedEvents,
 	TContext,
 	TEntryContexts,
 	TEvent,
-	hsm_get_lca,
-	hsm_get_path_to_root,
+	TransitionPlan,
+	hsm_get_event_handlers,
+	hsm_get_running_step,
+	hsm_get_transition_plan,
+	hsm_post,
+	hsm_resolve_event_handler,
 	is_hsm_status,
+	pure,
 )
 
 logger: Final = logging.getLogger(__name__)
 
 
-__all__ = ("HSMStatus",)  # re-exported from _common
+__all__ = ("HSMStatus", "Machine", "MachinePool", "hsm_post", "pure")  # re-exported from _common
 
 
 class Node(Protocol[TEvent, TContext, TEntryContexts], metaclass=NodeMeta):
@@ -56,11 +73,47 @@ def _hsm_get_event_handler(
 	node: Type[Node[TEvent, TContext, Any]],
 	event: TEvent,
 ) -> Callable[[TEvent, TContext], Type[Node[TEvent, TContext, Any]] | HSMStatus] | None:
-	for eventT, handler in node._event_handlers:
-		if isinstance(event, eventT):
-			return handler
+	try:
+		return node._event_dispatch[type(event)]
+	except KeyError:
+		return hsm_resolve_event_handler(node, event)
+
+
+def _hsm_timed(
+	recorder: LatencyRecorder,
+	node: Type[Node[Any, Any, Any]],
+	callback: Callback,
+	event_type: type | None,
+	function: Callable[..., Any],
+	*args: Any,
+) -> Any:
+	"""Call a callback of `node` and record its latency."""
+
+	start: Final = perf_counter_ns()
+	try:
+		return function(*args)
+	finally:
+		recorder.record(node, callback, event_type, perf_counter_ns() - start)
+
+
+def _hsm_handle_entries(
+	node: Type[Node[TEvent, TContext, Any]],
+	prev: Type[Node[TEvent, TContext, Any]] | None,
+	contexts: ContextStore,
+	event_type: type | None = None,
+) -> Type[Node[TEvent, TContext, Any]]:
+	profile: Final = PROFILE.recorder
 
-	return None
+	while node != prev:
+		prev = node
+		if profile is None:
+			node, context = node.entry(contexts[node])
+		else:
+			node, context = _hsm_timed(
+				profile, node, Callback.ENTRY, event_type, node.entry, contexts[node]
+			)
+		contexts[node] = context
+	return node
 
 
 def hsm_handle_entries(
@@ -77,13 +130,266 @@ def hsm_handle_entries(
 		Type[Node]: The node after all entries have been done
 	"""
 
-	while node != prev:
-		prev = node
-		node, context = node.entry(node._context)
-		node._context = context
+	return _hsm_enter(node, prev, NODE_CONTEXTS, PostedEvents())
+
+
+def _hsm_transition(
+	node: Type[Node[TEvent, TContext, Any]],
+	current_node: Type[Node[TEvent, TContext, Any]],
+	node_or_status: Type[Node[TEvent, TContext, Any]] | HSMStatus,
+	contexts: ContextStore,
+	event_type: type,
+	plan: TransitionPlan[Node[TEvent, TContext, Any]] | None = None,
+) -> Type[Node[Any, Any, Any]]:
+	"""Do the transition that the handler of `current_node` returned for `node`.
+
+	The `plan` of a transition to a node is looked up unless it is given.
+	"""
+
+	profile: Final = PROFILE.recorder
+	timers: Final = TIMERS.service
+
+	if node_or_status is HSMStatus.SELF_TRANSITION:
+		# do the exits from the original node up to the handling node
+		exit_node = node
+		while True:
+			if timers is not None:
+				timers.exited(exit_node)
+			if profile is None:
+				exit_node.exit(contexts[current_node])
+			else:
+				_hsm_timed(
+					profile,
+					exit_node,
+					Callback.EXIT,
+					event_type,
+					exit_node.exit,
+					contexts[current_node],
+				)
+			if exit_node is current_node:
+				break
+			exit_node = exit_node._superstate  # type: ignore[assignment]
+		return _hsm_handle_entries(current_node, None, contexts, event_type)
+
+	# else handle transitions to the new node
+	if is_hsm_status(node_or_status):
+		raise ValueError(f"Unexpected {node_or_status} for a transition")
+	target_node: Final = node_or_status
+
+	if plan is None:
+		plan = hsm_get_transition_plan(node, current_node, target_node)
+
+	# do the exits from the original node to the LCA
+	for exit_node in plan.exits:
+		if timers is not None:
+			timers.exited(exit_node)
+		if profile is None:
+			exit_node.exit(contexts[exit_node])
+		else:
+			_hsm_timed(
+				profile, exit_node, Callback.EXIT, event_type, exit_node.exit, contexts[exit_node]
+			)
+
+	# check for an exit to a superstate in which no entries are called
+	if not plan.entries:
+		return target_node
+
+	# do the entries from LCA to the new state
+	next_node = plan.entries[0]
+	for entry_node in plan.entries:
+		if entry_node != next_node:
+			logger.warning(f"The entry return disagrees with the path -> Path is {plan.entries}")
+			raise ValueError("The entry return disagrees with the entry path")
+		if profile is None:
+			next_node, next_context = entry_node.entry(contexts[current_node])
+		else:
+			next_node, next_context = _hsm_timed(
+				profile,
+				entry_node,
+				Callback.ENTRY,
+				event_type,
+				entry_node.entry,
+				contexts[current_node],
+			)
+		contexts[entry_node] = next_context
+		current_node = entry_node
+
+	# like in the entries, the context returned with the next node is its entry context
+	contexts[next_node] = next_context
+	return _hsm_handle_entries(next_node, plan.entries[-1], contexts, event_type)
+
+
+def _hsm_handle_event(
+	node: Type[Node[TEvent, TContext, Any]],
+	event: TEvent,
+	contexts: ContextStore,
+) -> Type[Node[Any, Any, Any]]:
+	trace: Final = TRACE.hook
+	profile: Final = PROFILE.recorder
+
+	# the node whose handlers are tried, from the starting node up to the root
+	current_node = node
+
+	while True:
+		handler = _hsm_get_event_handler(current_node, event)
+		if handler is None:
+			node_or_status: Any = HSMStatus.EVENT_UNHANDLED
+		elif profile is None:
+			node_or_status = handler(event, contexts[current_node])
+		else:
+			node_or_status = _hsm_timed(
+				profile,
+				current_node,
+				Callback.HANDLER,
+				type(event),
+				handler,
+				event,
+				contexts[current_node],
+			)
+
+		if node_or_status is HSMStatus.EVENT_UNHANDLED and current_node._superstate is not None:
+			current_node = current_node._superstate
+			continue
+
+		if trace is not None:
+			trace(node, event, current_node, node_or_status)
+
+		if node_or_status is HSMStatus.NO_TRANSITION or node_or_status is HSMStatus.EVENT_UNHANDLED:
+			return node
+
+		return _hsm_transition(node, current_node, node_or_status, contexts, type(event))
+
+
+def _hsm_handle_events(
+	node: Type[Node[TEvent, TContext, Any]],
+	events: Iterable[TEvent],
+	contexts: ContextStore,
+	posted: PostedEvents,
+) -> Type[Node[Any, Any, Any]]:
+	"""The hot loop of `_hsm_step` for many events.
+
+	Everything that does not depend on the event is hoisted out of the loop
+	and the dispatch is inlined, so that only transitions make a call.
+	"""
+
+	NO_TRANSITION: Final = HSMStatus.NO_TRANSITION
+	EVENT_UNHANDLED: Final = HSMStatus.EVENT_UNHANDLED
+	resolve_event_handler: Final = hsm_resolve_event_handler
+	transition: Final = _hsm_transition
+	trace: Final = TRACE.hook
+	profile: Final = PROFILE.recorder
+	HANDLER: Final = Callback.HANDLER
+
+	step: Final = hsm_get_running_step()
+	outer: Final = step.posted
+	step.posted = posted
+	try:
+		for event in events:
+			event_type = type(event)
+			current_node = node
+			while True:
+				try:
+					handler = current_node._event_dispatch[event_type]
+				except KeyError:
+					handler = resolve_event_handler(current_node, event)
+
+				if handler is None:
+					node_or_status = EVENT_UNHANDLED
+				elif profile is None:
+					node_or_status = handler(event, contexts[current_node])
+				else:
+					node_or_status = _hsm_timed(
+						profile,
+						current_node,
+						HANDLER,
+						event_type,
+						handler,
+						event,
+						contexts[current_node],
+					)
+
+				if (
+					node_or_status is EVENT_UNHANDLED
+					and (superstate := current_node._superstate) is not None
+				):
+					current_node = superstate
+					continue
+
+				if trace is not None:
+					trace(node, event, current_node, node_or_status)
+
+				if node_or_status is not NO_TRANSITION and node_or_status is not EVENT_UNHANDLED:
+					node = transition(node, current_node, node_or_status, contexts, event_type)
+				break
+
+			# handle the events that the callbacks posted before the next event
+			while posted:
+				node = _hsm_handle_event(node, posted.popleft(), contexts)
+	except BaseException:
+		posted.clear()
+		raise
+	finally:
+		step.posted = outer
+
 	return node
 
 
+def _hsm_step(
+	node: Type[Node[TEvent, TContext, Any]],
+	event: TEvent,
+	contexts: ContextStore,
+	posted: PostedEvents | None,
+) -> Type[Node[Any, Any, Any]]:
+	"""Handle an event, then the events that the callbacks post, in order.
+
+	If `posted` is None, the spare queue of the running step is borrowed, so
+	that a warm machine handles events without allocating.
+	"""
+
+	step: Final = hsm_get_running_step()
+	outer: Final = step.posted
+	borrowed: Final = posted is None
+	if posted is None:
+		posted = PostedEvents() if step.spare is None else step.spare
+		step.spare = None
+	step.posted = posted
+	try:
+		node = _hsm_handle_event(node, event, contexts)
+		while posted:
+			node = _hsm_handle_event(node, posted.popleft(), contexts)
+		return node
+	except BaseException:
+		posted.clear()
+		raise
+	finally:
+		step.posted = outer
+		if borrowed:
+			step.spare = posted
+
+
+def _hsm_enter(
+	node: Type[Node[TEvent, TContext, Any]],
+	prev: Type[Node[TEvent, TContext, Any]] | None,
+	contexts: ContextStore,
+	posted: PostedEvents,
+) -> Type[Node[TEvent, TContext, Any]]:
+	"""Do the entries, then handle the events that the callbacks post, in order."""
+
+	step: Final = hsm_get_running_step()
+	outer: Final = step.posted
+	step.posted = posted
+	try:
+		node = _hsm_handle_entries(node, prev, contexts)
+		while posted:
+			node = _hsm_handle_event(node, posted.popleft(), contexts)
+		return node
+	except BaseException:
+		posted.clear()
+		raise
+	finally:
+		step.posted = outer
+
+
 def hsm_handle_event(
 	node: Type[Node[TEvent, TContext, Any]],
 	event: TEvent,
@@ -100,75 +406,208 @@ def hsm_handle_event(
 		node (Type[Node[TEvent, TState, Any]]): The new node after handling the event.
 	"""
 
-	# the node path from the starting node up to the handling node
-	node_path: Final[list[Type[Node[TEvent, TContext, Any]]]] = [node]
+	return _hsm_step(node, event, NODE_CONTEXTS, None)
 
-	while True:
-		current_node = node_path[-1]
-		node_or_status: Final = (  # type: ignore[misc]
-			handler(event, current_node._context)
-			if (handler := _hsm_get_event_handler(current_node, event))
-			else HSMStatus.EVENT_UNHANDLED
-		)
-
-		if is_hsm_status(node_or_status):
-			status: Final = node_or_status  # type: ignore[misc]
-
-			if status == HSMStatus.NO_TRANSITION:
-				logger.debug(f"No transition in state {current_node.__name__}")
-				return node
-
-			elif status == HSMStatus.SELF_TRANSITION:
-				logger.debug(f"Self-transition in state {current_node.__name__}")
-				for n in node_path:
-					n.exit(current_node._context)
-				return hsm_handle_entries(current_node)
-
-			elif status == HSMStatus.EVENT_UNHANDLED:
-				logger.debug(f"Unhandled event {event} in state {current_node.__name__}")
-				if current_node._superstate is None:
-					logger.debug(f"Reached root state {current_node.__name__}")
-					return node
+
+def hsm_handle_events(
+	node: Type[Node[TEvent, TContext, Any]],
+	events: Iterable[TEvent],
+) -> Type[Node[Any, Any, Any]]:
+	"""Handle many events for the hierarchical state machine.
+
+	This is the fast path for `hsm_handle_event` in a loop, e.g. to replay a log.
+
+	Args:
+		node (Type[Node]): The current node of the HSM.
+		events (Iterable[TEvent]): The events to handle, in order.
+
+	Returns:
+		Type[Node]: The node after handling all of the events.
+	"""
+
+	return _hsm_handle_events(node, events, NODE_CONTEXTS, PostedEvents())
+
+
+def hsm_iter_events(
+	node: Type[Node[TEvent, TContext, Any]],
+	events: Iterable[TEvent],
+) -> Iterator[Type[Node[Any, Any, Any]]]:
+	"""Handle many events for the hierarchical state machine, yielding each new node.
+
+	Args:
+		node (Type[Node]): The current node of the HSM.
+		events (Iterable[TEvent]): The events to handle, in order.
+
+	Yields:
+		Type[Node]: The node after handling each event.
+	"""
+
+	posted: Final = PostedEvents()
+	for event in events:
+		node = _hsm_step(node, event, NODE_CONTEXTS, posted)
+		yield node
+
+
+def hsm_machine_handle_entries(
+	machine: Machine,
+) -> Type[Node[Any, Any, Any]]:
+	"""Do the entries for the current node of a machine instance.
+
+	Like `hsm_handle_entries`, but the contexts are stored in the machine
+	instead of on the node classes.
+
+	Args:
+		machine (Machine): The machine instance.
+
+	Returns:
+		Type[Node]: The node after all entries have been done
+	"""
+
+	machine.node = node = _hsm_enter(machine.node, None, machine.contexts, machine.posted)
+	return node
+
+
+def hsm_machine_handle_event(
+	machine: Machine,
+	event: TEvent,
+) -> Type[Node[Any, Any, Any]]:
+	"""Handle an event for a machine instance.
+
+	Like `hsm_handle_event`, but the contexts are stored in the machine instead
+	of on the node classes, so one node tree can drive any number of machines.
+
+	Args:
+		machine (Machine): The machine instance.
+		event (TEvent): The event to handle.
+
+	Returns:
+		Type[Node]: The new node of the machine after handling the event.
+	"""
+
+	machine.node = node = _hsm_step(machine.node, event, machine.contexts, machine.posted)
+	return node
+
+
+def hsm_pool_handle_entries(pool: MachinePool, indices: Iterable[int] | None = None) -> None:
+	"""Do the entries for the current node of instances of a machine pool.
+
+	Args:
+		pool (MachinePool): The machine pool.
+		indices (Iterable[int], optional): The instances to do the entries for.
+			Defaults to all instances.
+	"""
+
+	states: Final = pool.states
+	contexts: Final = PoolContexts(pool)
+	posted: Final = PostedEvents()
+	for node, group in pool.group_by_state(indices).items():
+		for index in group:
+			contexts.index = index
+			states[index] = _hsm_enter(node, None, contexts, posted)._id
+
+
+def hsm_pool_handle_event(
+	pool: MachinePool,
+	event: TEvent,
+	indices: Iterable[int] | None = None,
+) -> None:
+	"""Handle an event for instances of a machine pool.
+
+	The instances are grouped by their current node. The handlers that the
+	event bubbles through from the node, and the plan of the transition that
+	they return, are resolved once per group, so that only the callbacks run
+	for each instance, with its own contexts.
+
+	Args:
+		pool (MachinePool): The machine pool.
+		event (TEvent): The event to handle.
+		indices (Iterable[int], optional): The instances to send the event to.
+			Defaults to all instances.
+	"""
+
+	NO_TRANSITION: Final = HSMStatus.NO_TRANSITION
+	EVENT_UNHANDLED: Final = HSMStatus.EVENT_UNHANDLED
+	transition: Final = _hsm_transition
+	trace: Final = TRACE.hook
+	profile: Final = PROFILE.recorder
+	event_type: Final = type(event)
+
+	states: Final = pool.states
+	contexts: Final = PoolContexts(pool)
+	posted: Final = PostedEvents()
+	step: Final = hsm_get_running_step()
+	outer: Final = step.posted
+	step.posted = posted
+	try:
+		for node, group in pool.group_by_state(indices).items():
+			handlers = hsm_get_event_handlers(node, event)
+			root = node._ancestors[-1]
+			# the plan of the last transition of the group
+			plan = plan_handler = plan_target = None
+			for index in group:
+				contexts.index = index
+				current_node = root
+				node_or_status = EVENT_UNHANDLED
+				for handling_node, handler in handlers:
+					if profile is None:
+						result = handler(event, contexts[handling_node])
+					else:
+						result = _hsm_timed(
+							profile,
+							handling_node,
+							Callback.HANDLER,
+							event_type,
+							handler,
+							event,
+							contexts[handling_node],
+						)
+					if result is not EVENT_UNHANDLED:
+						current_node = handling_node
+						node_or_status = result
+						break
+
+				if trace is not None:
+					trace(node, event, current_node, node_or_status)
+
+				if node_or_status is NO_TRANSITION or node_or_status is EVENT_UNHANDLED:
+					next_node = node
+				elif is_hsm_status(node_or_status):
+					next_node = transition(node, current_node, node_or_status, contexts, event_type)
 				else:
-					node_path.append(current_node._superstate)
-					continue
+					if plan_handler is not current_node or plan_target is not node_or_status:
+						plan_handler = current_node
+						plan_target = node_or_status
+						plan = hsm_get_transition_plan(node, current_node, node_or_status)
+					next_node = transition(
+						node, current_node, node_or_status, contexts, event_type, plan
+					)
+
+				while posted:
+					next_node = _hsm_handle_event(next_node, posted.popleft(), contexts)
+				states[index] = next_node._id
+	except BaseException:
+		posted.clear()
+		raise
+	finally:
+		step.posted = outer
+
+
+def hsm_machine_handle_events(
+	machine: Machine,
+	events: Iterable[TEvent],
+) -> Type[Node[Any, Any, Any]]:
+	"""Handle many events for a machine instance.
 
-			else:
-				assert_never(status)
+	If a callback raises, the machine keeps the node that it had before the
+	events.
 
-		# else handle transitions to the new node
-		target_node: Final = node_or_status  # type: ignore[misc]
+	Args:
+		machine (Machine): The machine instance.
+		events (Iterable[TEvent]): The events to handle, in order.
 
-		current_node_path_to_root: Final = hsm_get_path_to_root(current_node)  # type: ignore[misc]
-		target_node_path_to_root: Final = hsm_get_path_to_root(target_node)  # type: ignore[misc]
-		lca: Final = hsm_get_lca(target_node_path_to_root, current_node_path_to_root)  # type: ignore[misc]
+	Returns:
+		Type[Node]: The new node of the machine after handling all of the events.
+	"""
 
-		# do the exits from the original node to the LCA
-		next_node = node
-		while next_node != lca:
-			next_node.exit(next_node._context)
-			if next_node._superstate is None:
-				break
-			next_node = next_node._superstate
-
-		# start the entry path past the LCA
-		entry_path = tuple(reversed(target_node_path_to_root))
-		entry_path = tuple(entry_path[entry_path.index(lca) + 1 :])
-
-		# check for an exit to a superstate in which no entries are called
-		if len(entry_path) == 0:
-			return next_node
-
-		# do the entries from LCA to the new state
-		if entry_path[0] is None:
-			raise ValueError("The entry path is empty")
-		next_node = entry_path[0]
-		for entry_node in entry_path:
-			if entry_node != next_node:
-				logger.warning(f"The entry return disagrees with the path -> Path is {entry_path}")
-				raise ValueError("The entry return disagrees with the entry path")
-			next_node, next_context = entry_node.entry(current_node._context)
-			entry_node._context = next_context
-			current_node = entry_node
-
-		return hsm_handle_entries(next_node, entry_path[-1] if entry_path else None)
+	machine.node = node = _hsm_handle_events(machine.node, events, machine.contexts, machine.posted)
+	return node
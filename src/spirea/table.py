@@ -0,0 +1,243 @@
+# Copyright (c) 2025 JP Hutchins
+# SPDX-License-Identifier: MIT
+
+"""Table-driven bulk stepping of `MachinePool` instances with NumPy.
+
+A transition whose handler, exits and entries are all marked `pure` is a
+function of the current node and the event type only, so a `TransitionTable`
+compiles it into a state x event type matrix of target state ids. Stepping a
+pool is then one NumPy gather; the instances whose cell could not be compiled
+go through `spirea.sync.hsm_pool_handle_event`.
+
+A pure `entry` must return the context that it was given, so a table step
+gives every node that it enters the context of the handling node, which is
+the context that the Python engine would have passed down to it.
+
+A table step calls no callbacks, so it cannot call the trace hook, record
+latencies or tell the timer service about exits. While any of them is set,
+every instance goes through the Python engine instead.
+
+Requires the `numpy` extra.
+"""
+
+from typing import Any, Final, Iterable, final
+
+import numpy as np
+import numpy.typing as npt
+
+from spirea._common import (
+	PROFILE,
+	TIMERS,
+	TRACE,
+	HSMStatus,
+	MachinePool,
+	TransitionPlan,
+	hsm_get_nodes,
+	hsm_get_transition_plan,
+	is_hsm_status,
+	is_pure,
+)
+from spirea.sync import hsm_pool_handle_event
+
+FALLBACK: Final = -1
+"""The matrix value of a cell that must be stepped by the Python engine."""
+
+
+@final
+class TransitionTable:
+	"""The compiled pure transitions of a node tree.
+
+	Args:
+		root (Type[Node]): The root of the node tree.
+		event_types (Iterable[type]): The event types to compile a column for.
+			Events of other types, including subclasses, are always stepped by
+			the Python engine.
+	"""
+
+	__slots__ = ("base", "columns", "matrix", "entries")
+
+	def __init__(self, root: type, event_types: Iterable[type]) -> None:
+		nodes: Final[tuple[type, ...]] = hsm_get_nodes(root)
+		ids: Final[list[int]] = [node._id for node in nodes]  # type: ignore[attr-defined]
+
+		self.base: Final = min(ids)
+		"""The state id of the first row of the matrix."""
+
+		self.columns: Final[dict[type, int]] = {
+			event_type: column for column, event_type in enumerate(event_types)
+		}
+		"""The matrix column of each event type."""
+
+		self.matrix: Final[npt.NDArray[np.int64]] = np.full(
+			(max(ids) - self.base + 1, len(self.columns)), FALLBACK, dtype=np.int64
+		)
+		"""The target state id of each state id and event type, or `FALLBACK`."""
+
+		self.entries: Final[dict[tuple[int, int], tuple[type, tuple[type, ...]]]] = {}
+		"""The handling node and the entered nodes of each compiled cell that enters nodes."""
+
+		for node in nodes:
+			row = node._id - self.base  # type: ignore[attr-defined]
+			for event_type, column in self.columns.items():
+				entered: list[type] = []
+				handler_node, target = _hsm_compile_transition(node, event_type, entered)
+				self.matrix[row, column] = target
+				if target != FALLBACK and entered:
+					self.entries[row, column] = (handler_node, tuple(entered))
+
+	def __repr__(self) -> str:
+		rows, columns = self.matrix.shape
+		compiled: Final = int(np.count_nonzero(self.matrix != FALLBACK))
+		return f"{type(self).__name__}({compiled}/{rows * columns} compiled)"
+
+
+def _hsm_get_handler_for_type(node: type, event_type: type) -> Any:
+	dispatch: Final[dict[type, Any]] = node._event_dispatch  # type: ignore[attr-defined]
+	if event_type in dispatch:
+		return dispatch[event_type]
+
+	for handled_type, handler in node._event_handlers:  # type: ignore[attr-defined]
+		if issubclass(event_type, handled_type):
+			return handler
+	return None
+
+
+_CONTEXT: Final = object()
+"""Passed to pure entries to check that they return the context that they are given."""
+
+
+def _hsm_enter(node: type, prev: type | None, entered: list[type]) -> int:
+	"""Follow pure entries like `hsm_handle_entries`, or return `FALLBACK`."""
+
+	while node != prev:
+		if not is_pure(node.entry):  # type: ignore[attr-defined]
+			return FALLBACK
+		entered.append(node)
+		prev = node
+		node, context = node.entry(_CONTEXT)  # type: ignore[attr-defined]
+		if context is not _CONTEXT:
+			return FALLBACK
+	return node._id  # type: ignore[attr-defined,no-any-return]
+
+
+def _hsm_compile_transition(
+	state: type,
+	event_type: type,
+	entered: list[type],
+) -> tuple[type, int]:
+	"""Get the handling node and the target state id of `state` for `event_type`.
+
+	The target is `FALLBACK` if the transition is not pure, and the nodes that
+	the transition enters are appended to `entered`.
+	"""
+
+	# the node path from the state up to the handling node
+	node_path: Final[list[type]] = [state]
+
+	while True:
+		node = node_path[-1]
+		try:
+			handler = _hsm_get_handler_for_type(node, event_type)
+		except TypeError:
+			return node, FALLBACK
+
+		if handler is None:
+			result: Any = HSMStatus.EVENT_UNHANDLED
+		elif is_pure(handler):
+			result = handler(None, None)
+		else:
+			return node, FALLBACK
+
+		if not is_hsm_status(result):
+			break
+		elif result == HSMStatus.NO_TRANSITION:
+			return node, state._id  # type: ignore[attr-defined]
+		elif result == HSMStatus.SELF_TRANSITION:
+			if not all(is_pure(n.exit) for n in node_path):  # type: ignore[attr-defined]
+				return node, FALLBACK
+			return node, _hsm_enter(node, None, entered)
+		elif node._superstate is None:  # type: ignore[attr-defined]
+			return node, state._id  # type: ignore[attr-defined]
+		else:
+			node_path.append(node._superstate)  # type: ignore[attr-defined]
+
+	if not isinstance(result, type) or not hasattr(result, "_id"):
+		return node, FALLBACK
+
+	plan: Final[TransitionPlan[Any]] = hsm_get_transition_plan(state, node, result)
+	if not all(is_pure(n.exit) for n in plan.exits):
+		return node, FALLBACK
+	if not plan.entries:
+		return node, result._id
+
+	next_node: type = plan.entries[0]
+	for entry_node in plan.entries:
+		if entry_node != next_node or not is_pure(entry_node.entry):
+			return node, FALLBACK
+		entered.append(entry_node)
+		next_node, context = entry_node.entry(_CONTEXT)
+		if context is not _CONTEXT:
+			return node, FALLBACK
+
+	return node, _hsm_enter(next_node, plan.entries[-1], entered)
+
+
+def hsm_table_handle_event(
+	table: TransitionTable,
+	pool: MachinePool,
+	event: Any,
+	indices: Iterable[int] | None = None,
+) -> None:
+	"""Handle an event for instances of a machine pool through a transition table.
+
+	The instances go through `spirea.sync.hsm_pool_handle_event` instead if
+	a trace hook, latency recorder or timer service is set, so that they are
+	traced, profiled and timed like without the table.
+
+	Args:
+		table (TransitionTable): The transition table of the pool's node tree.
+		pool (MachinePool): The machine pool.
+		event (TEvent): The event to handle.
+		indices (Iterable[int], optional): The instances to send the event to.
+			Defaults to all instances.
+	"""
+
+	column: Final = table.columns.get(type(event))
+	if (
+		column is None
+		or TRACE.hook is not None
+		or PROFILE.recorder is not None
+		or TIMERS.service is not None
+	):
+		hsm_pool_handle_event(pool, event, indices)
+		return
+
+	states: Final = np.frombuffer(pool.states, dtype=np.int64)
+	selected: Final = (
+		np.arange(len(states)) if indices is None else np.fromiter(indices, dtype=np.intp)
+	)
+	rows: Final = states[selected] - table.base
+	in_table: Final = (rows >= 0) & (rows < len(table.matrix))
+
+	targets: Final = np.full(len(selected), FALLBACK, dtype=np.int64)
+	targets[in_table] = table.matrix[rows[in_table], column]
+	compiled: Final = targets != FALLBACK
+
+	# pass the context of the handling node down to the entered nodes
+	compiled_rows: Final = rows[compiled]
+	compiled_indices: Final = selected[compiled]
+	for row in np.unique(compiled_rows).tolist():
+		if (entries := table.entries.get((row, column))) is None:
+			continue
+		handler_node, entered = entries
+		source = pool.contexts[handler_node]
+		row_indices = compiled_indices[compiled_rows == row].tolist()
+		for node in entered:
+			if (destination := pool.contexts.get(node)) is None:
+				destination = pool.contexts[node] = [None] * len(pool)
+			for index in row_indices:
+				destination[index] = source[index]
+
+	states[compiled_indices] = targets[compiled]
+	if not compiled.all():
+		hsm_pool_handle_event(pool, event, selected[~compiled].tolist())
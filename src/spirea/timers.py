@@ -0,0 +1,436 @@
+# Copyright (c) 2025 JP Hutchins
+# SPDX-License-Identifier: MIT
+
+"""State timeouts on a hierarchical timing wheel.
+
+An `entry` arms a timeout with `hsm_arm_timeout`, and the timeout is
+cancelled when the node that armed it exits. The timeouts of every machine
+share one `TimingWheel`, so arming, cancelling and expiring a timeout are
+O(1) no matter how many machines there are.
+
+A `TimerService` is driven by calls to `tick(now)` and delivers each expired
+timeout with `spirea.sync.hsm_machine_handle_event`. An `AsyncTimerService`
+is driven by a single event loop callback and delivers each expired timeout
+with a `deliver` callable, e.g. `AsyncMachineScheduler.post_nowait`, so that
+the machine still runs to completion.
+"""
+
+import asyncio
+import logging
+import math
+from typing import Any, Callable, Final, final
+
+from spirea._common import TIMERS, Machine, hsm_get_posted_events
+from spirea.sync import hsm_machine_handle_event
+
+logger: Final = logging.getLogger(__name__)
+
+BITS: Final = 6
+"""The log2 of the number of slots of each level of the wheel."""
+
+SLOTS: Final = 1 << BITS
+
+LEVELS: Final = 4
+"""The number of levels of the wheel.
+
+Timeouts up to `SLOTS ** LEVELS` ticks away are placed directly; further ones
+wait in an overflow slot until the top level wraps around.
+"""
+
+_MASK: Final = SLOTS - 1
+
+
+@final
+class Timer:
+	"""A timeout armed on a `TimingWheel`."""
+
+	__slots__ = ("deadline", "machine", "node", "event", "slot")
+
+	def __init__(self, deadline: int, machine: Machine, node: Any, event: Any) -> None:
+		self.deadline: Final = deadline
+		"""The tick at which the timer expires."""
+		self.machine: Final = machine
+		self.node: Final = node
+		self.event: Final = event
+		self.slot: dict[Timer, None] | None = None
+		"""The slot that holds the timer, None once it has expired or was cancelled."""
+
+	def __repr__(self) -> str:
+		return f"{type(self).__name__}({self.node.__qualname__}, {self.event!r} @ {self.deadline})"
+
+
+@final
+class TimingWheel:
+	"""A hierarchical timing wheel of `Timer`s.
+
+	Level `l` has `SLOTS` slots of `SLOTS ** l` ticks each. A timer is placed
+	in the lowest level whose current block contains its deadline, and the
+	timers of a slot are cascaded to the lower levels when the wheel reaches
+	the slot.
+	"""
+
+	__slots__ = ("current", "count", "_levels", "_overflow")
+
+	def __init__(self, current: int = 0) -> None:
+		self.current = current
+		"""The last tick that was processed."""
+		self.count = 0
+		"""The number of armed timers."""
+		self._levels: Final[tuple[tuple[dict[Timer, None], ...], ...]] = tuple(
+			tuple({} for _ in range(SLOTS)) for _ in range(LEVELS)
+		)
+		self._overflow: Final[dict[Timer, None]] = {}
+
+	def __len__(self) -> int:
+		return self.count
+
+	def _place(self, timer: Timer) -> None:
+		deadline: Final = timer.deadline
+		current: Final = self.current
+		for level in range(LEVELS):
+			shift = BITS * (level + 1)
+			if deadline >> shift == current >> shift:
+				slot = self._levels[level][(deadline >> (BITS * level)) & _MASK]
+				break
+		else:
+			slot = self._overflow
+		slot[timer] = None
+		timer.slot = slot
+
+	def schedule(self, timer: Timer) -> None:
+		"""Arm a timer. A deadline that has passed expires on the next tick."""
+
+		if timer.deadline <= self.current:
+			raise ValueError(f"{timer!r} is due before the next tick {self.current + 1}")
+		self._place(timer)
+		self.count += 1
+
+	def cancel(self, timer: Timer) -> None:
+		"""Disarm a timer if it has not expired."""
+
+		if timer.slot is not None:
+			del timer.slot[timer]
+			timer.slot = None
+			self.count -= 1
+
+	def _cascade(self, slot: dict[Timer, None]) -> None:
+		timers: Final = tuple(slot)
+		slot.clear()
+		for timer in timers:
+			self._place(timer)
+
+	def next_tick(self) -> int:
+		"""Get the next tick at which a timer may expire or a slot is cascaded.
+
+		Nothing happens in the ticks before it, so the wheel can jump over them.
+		"""
+
+		current: Final = self.current
+		for level, slots in enumerate(self._levels):
+			shift = BITS * level
+			index = (current >> shift) & _MASK
+			block = current >> (shift + BITS) << (shift + BITS)
+			for later in range(index + 1, SLOTS):
+				if slots[later]:
+					return block | (later << shift)
+		# the top level wraps around
+		return (current >> (BITS * LEVELS) << (BITS * LEVELS)) + (1 << (BITS * LEVELS))
+
+	def advance(self, tick: int) -> list[Timer]:
+		"""Process the ticks up to and including `tick`.
+
+		Args:
+			tick (int): The tick to advance to.
+
+		Returns:
+			list[Timer]: The expired timers, in order of their deadlines.
+		"""
+
+		expired: Final[list[Timer]] = []
+		while self.current < tick:
+			if not self.count:
+				self.current = tick
+				break
+
+			next_tick = self.next_tick()
+			if next_tick > tick:
+				self.current = tick
+				break
+
+			self.current = current = next_tick
+			for level in range(1, LEVELS):
+				if current & ((1 << (BITS * level)) - 1):
+					break
+				self._cascade(self._levels[level][(current >> (BITS * level)) & _MASK])
+			else:
+				self._cascade(self._overflow)
+
+			slot = self._levels[0][current & _MASK]
+			for timer in slot:
+				timer.slot = None
+			self.count -= len(slot)
+			expired.extend(slot)
+			slot.clear()
+
+		return expired
+
+
+def _hsm_get_machine() -> Machine:
+	posted: Final = hsm_get_posted_events()
+	if posted is None or posted.machine is None:
+		raise RuntimeError("Timeouts must be armed from the callback of a running Machine")
+	return posted.machine
+
+
+@final
+class TimerService:
+	"""Timeouts for machines, driven by calls to `tick`.
+
+	Args:
+		resolution (float, optional): The length of a tick in seconds. Defaults to 0.001.
+		now (float, optional): The time of the first tick. Defaults to 0.0.
+		deliver (Callable[[Machine, TEvent], object], optional): Called with the
+			machine and the event of each expired timeout. Defaults to
+			`spirea.sync.hsm_machine_handle_event`.
+	"""
+
+	__slots__ = ("resolution", "deliver", "wheel", "_armed")
+
+	def __init__(
+		self,
+		resolution: float = 0.001,
+		now: float = 0.0,
+		deliver: Callable[[Machine, Any], object] = hsm_machine_handle_event,
+	) -> None:
+		self.resolution: Final = resolution
+		self.deliver: Final = deliver
+		self.wheel: Final = TimingWheel(self.to_tick(now))
+		self._armed: Final[dict[tuple[Machine, Any], Timer]] = {}
+
+	def __repr__(self) -> str:
+		return f"{type(self).__name__}({len(self.wheel)} timers)"
+
+	def to_tick(self, time: float) -> int:
+		"""Get the last tick at or before a time."""
+		return math.floor(time / self.resolution)
+
+	@property
+	def now(self) -> float:
+		"""The time of the last tick."""
+		return self.wheel.current * self.resolution
+
+	def arm(
+		self, machine: Machine, node: Any, delay: float, event: Any, now: float | None = None
+	) -> Timer:
+		"""Arm a timeout that handles `event` in `machine` unless `node` exits first.
+
+		A timeout that `node` armed before is cancelled.
+
+		Args:
+			machine (Machine): The machine.
+			node (Type[Node]): The node whose exit cancels the timeout.
+			delay (float): The delay in seconds, rounded up to the next tick.
+			event (TEvent): The event to handle when the timeout expires.
+			now (float, optional): The time that the delay counts from. Defaults
+				to the time of the last tick.
+
+		Returns:
+			Timer: The armed timer.
+		"""
+
+		self.cancel(machine, node)
+		current: Final = self.wheel.current
+		start: Final = current if now is None else max(self.to_tick(now), current)
+		timer: Final = Timer(
+			max(start + math.ceil(delay / self.resolution), current + 1), machine, node, event
+		)
+		self.wheel.schedule(timer)
+		self._armed[machine, node] = timer
+		return timer
+
+	def cancel(self, machine: Machine, node: Any) -> None:
+		"""Cancel the timeout that `node` armed in `machine`, if any."""
+
+		if (timer := self._armed.pop((machine, node), None)) is not None:
+			self.wheel.cancel(timer)
+
+	def exited(self, node: Any, /) -> None:
+		"""Cancel the timeout of a node that the running machine exits."""
+
+		posted: Final = hsm_get_posted_events()
+		if posted is not None and posted.machine is not None:
+			self.cancel(posted.machine, node)
+
+	def expire(self, tick: int) -> int:
+		"""Advance the wheel to a tick and deliver the expired timeouts.
+
+		If a delivery raises, the exception is logged and the remaining
+		timeouts are still delivered.
+
+		Returns:
+			int: The number of delivered timeouts, including those whose delivery raised.
+		"""
+
+		delivered = 0
+		for timer in self.wheel.advance(tick):
+			# the delivery of an earlier timeout can rearm this one
+			if self._armed.get((timer.machine, timer.node)) is timer:
+				del self._armed[timer.machine, timer.node]
+				delivered += 1
+				try:
+					self.deliver(timer.machine, timer.event)
+				except Exception:
+					logger.exception(f"Error delivering {timer!r} to {timer.machine!r}")
+		return delivered
+
+	def tick(self, now: float) -> int:
+		"""Deliver the timeouts that expired by a time.
+
+		Args:
+			now (float): The current time in seconds.
+
+		Returns:
+			int: The number of delivered timeouts.
+		"""
+
+		return self.expire(self.to_tick(now))
+
+
+@final
+class AsyncTimerService:
+	"""Timeouts for machines, driven by a single callback of an event loop.
+
+	The wheel and the loop callback belong to the thread of the loop. A timeout
+	that is armed or cancelled from another thread, e.g. by a callback that is
+	`spirea.asyncio.blocking`, is forwarded to the loop's thread, and the call
+	waits for it.
+
+	Args:
+		deliver (Callable[[Machine, TEvent], object]): Called with the machine and
+			the event of each expired timeout, e.g. `AsyncMachineScheduler.post_nowait`.
+		resolution (float, optional): The length of a tick in seconds. Defaults to 0.001.
+		loop (asyncio.AbstractEventLoop, optional): The event loop. Defaults to the
+			running event loop.
+	"""
+
+	__slots__ = ("service", "loop", "_handle", "_handle_tick")
+
+	def __init__(
+		self,
+		deliver: Callable[[Machine, Any], object],
+		resolution: float = 0.001,
+		loop: asyncio.AbstractEventLoop | None = None,
+	) -> None:
+		self.loop: Final = asyncio.get_running_loop() if loop is None else loop
+		self.service: Final = TimerService(resolution, self.loop.time(), deliver)
+		self._handle: asyncio.TimerHandle | None = None
+		self._handle_tick = 0
+
+	def __repr__(self) -> str:
+		return f"{type(self).__name__}({len(self.service.wheel)} timers)"
+
+	def _is_elsewhere(self) -> bool:
+		"""Whether the loop is running in another thread than the caller's."""
+
+		if not self.loop.is_running():
+			return False
+		try:
+			return asyncio.get_running_loop() is not self.loop
+		except RuntimeError:
+			return True
+
+	def _arm(self, machine: Machine, node: Any, delay: float, event: Any, now: float) -> Timer:
+		timer: Final = self.service.arm(machine, node, delay, event, now)
+		self._reschedule()
+		return timer
+
+	async def _arm_on_loop(
+		self, machine: Machine, node: Any, delay: float, event: Any, now: float
+	) -> Timer:
+		return self._arm(machine, node, delay, event, now)
+
+	async def _cancel_on_loop(self, machine: Machine, node: Any) -> None:
+		self.service.cancel(machine, node)
+
+	def arm(self, machine: Machine, node: Any, delay: float, event: Any) -> Timer:
+		"""Like `TimerService.arm`, with the delay counted from the loop's time."""
+
+		now: Final = self.loop.time()
+		if self._is_elsewhere():
+			return asyncio.run_coroutine_threadsafe(
+				self._arm_on_loop(machine, node, delay, event, now), self.loop
+			).result()
+		return self._arm(machine, node, delay, event, now)
+
+	def cancel(self, machine: Machine, node: Any) -> None:
+		if self._is_elsewhere():
+			asyncio.run_coroutine_threadsafe(
+				self._cancel_on_loop(machine, node), self.loop
+			).result()
+		else:
+			self.service.cancel(machine, node)
+
+	def exited(self, node: Any, /) -> None:
+		self.service.exited(node)
+
+	def close(self) -> None:
+		"""Stop the loop callback."""
+
+		if self._handle is not None:
+			self._handle.cancel()
+			self._handle = None
+
+	def _reschedule(self) -> None:
+		wheel: Final = self.service.wheel
+		if not wheel.count:
+			self.close()
+			return
+		tick: Final = wheel.next_tick()
+		if self._handle is not None:
+			if self._handle_tick <= tick:
+				return
+			self._handle.cancel()
+		self._handle_tick = tick
+		self._handle = self.loop.call_at(tick * self.service.resolution, self._on_tick)
+
+	def _on_tick(self) -> None:
+		self._handle = None
+		try:
+			# the loop can call back up to its clock resolution early
+			self.service.expire(max(self.service.to_tick(self.loop.time()), self._handle_tick))
+		finally:
+			self._reschedule()
+
+
+def hsm_arm_timeout(node: Any, delay: float, event: Any) -> Timer:
+	"""Arm a timeout from a callback of a running `Machine`.
+
+	The timeout handles `event` in the machine after `delay` seconds unless
+	`node` exits first, e.g. in the `entry` of `node`:
+
+		hsm_arm_timeout(Session.Active, 30.0, Expire())
+
+	Args:
+		node (Type[Node]): The node whose exit cancels the timeout.
+		delay (float): The delay in seconds.
+		event (TEvent): The event to handle when the timeout expires.
+
+	Returns:
+		Timer: The armed timer.
+
+	Raises:
+		RuntimeError: If there is no timer service or no running machine.
+	"""
+
+	service: Final = TIMERS.service
+	if not isinstance(service, (TimerService, AsyncTimerService)):
+		raise RuntimeError("Set a TimerService or AsyncTimerService with hsm_set_timeout_service")
+	return service.arm(_hsm_get_machine(), node, delay, event)
+
+
+def hsm_cancel_timeout(node: Any) -> None:
+	"""Cancel the timeout that `node` armed, from a callback of a running `Machine`."""
+
+	service: Final = TIMERS.service
+	if isinstance(service, (TimerService, AsyncTimerService)):
+		service.cancel(_hsm_get_machine(), node)
@@ -0,0 +1,149 @@
+# Copyright (c) 2025 JP Hutchins
+# SPDX-License-Identifier: MIT
+
+"""A fixed-size ring buffer of the steps traced by the engines.
+
+`TraceRingBuffer` is a trace hook that records each step as integers in
+preallocated `array` columns, so it is cheap enough to leave installed in
+production and to `dump` for a post-mortem:
+
+>>> from spirea._common import hsm_set_trace_hook
+>>> ring = TraceRingBuffer(1024)
+>>> previous = hsm_set_trace_hook(ring)
+>>> hsm_set_trace_hook(previous) is ring
+True
+"""
+
+import time
+from array import array
+from typing import Any, Callable, Final, NamedTuple, final
+
+from spirea._common import HSMStatus, hsm_get_node
+
+TARGET_NO_TRANSITION: Final = -1
+"""The target id of a step whose handler returned `HSMStatus.NO_TRANSITION`."""
+
+TARGET_SELF_TRANSITION: Final = -2
+"""The target id of a step whose handler returned `HSMStatus.SELF_TRANSITION`."""
+
+TARGET_EVENT_UNHANDLED: Final = -3
+"""The target id of a step whose event was not handled up to the root."""
+
+_STATUS_TARGETS: Final[dict[HSMStatus, int]] = {
+	HSMStatus.NO_TRANSITION: TARGET_NO_TRANSITION,
+	HSMStatus.SELF_TRANSITION: TARGET_SELF_TRANSITION,
+	HSMStatus.EVENT_UNHANDLED: TARGET_EVENT_UNHANDLED,
+}
+_TARGET_STATUSES: Final[dict[int, HSMStatus]] = {
+	target: status for status, target in _STATUS_TARGETS.items()
+}
+
+
+class TraceRecord(NamedTuple):
+	"""A decoded step of a `TraceRingBuffer`."""
+
+	timestamp_ns: int
+	source: Any
+	event_type: type
+	handling_node: Any
+	target: Any
+	"""The node that the handler returned, or the `HSMStatus`."""
+
+
+@final
+class TraceRingBuffer:
+	"""A trace hook that keeps the last `size` steps.
+
+	Each step is stored as a timestamp, the state id of the source node, an
+	event type id, the state id of the handling node and the state id of the
+	target node, or one of the negative `TARGET_*` ids for a status.
+
+	Args:
+		size (int): The number of steps to keep.
+		clock (Callable[[], int], optional): The timestamp clock in nanoseconds.
+			Defaults to `time.time_ns`.
+	"""
+
+	__slots__ = (
+		"size",
+		"count",
+		"timestamps",
+		"sources",
+		"event_type_ids",
+		"handling_nodes",
+		"targets",
+		"event_types",
+		"_event_type_ids",
+		"_clock",
+	)
+
+	def __init__(self, size: int, clock: Callable[[], int] = time.time_ns) -> None:
+		if size < 1:
+			raise ValueError(f"The size must be positive, got {size}")
+
+		self.size: Final = size
+		self.count = 0
+		"""The number of steps recorded since the buffer was created or cleared."""
+
+		self.timestamps: Final = array("q", bytes(8 * size))
+		self.sources: Final = array("q", bytes(8 * size))
+		self.event_type_ids: Final = array("q", bytes(8 * size))
+		self.handling_nodes: Final = array("q", bytes(8 * size))
+		self.targets: Final = array("q", bytes(8 * size))
+
+		self.event_types: Final[list[type]] = []
+		"""The event type of each event type id."""
+
+		self._event_type_ids: Final[dict[type, int]] = {}
+		self._clock: Final = clock
+
+	def __call__(self, source: Any, event: Any, handling_node: Any, result: Any) -> None:
+		index: Final = self.count % self.size
+		self.count += 1
+
+		event_type: Final = type(event)
+		try:
+			event_type_id = self._event_type_ids[event_type]
+		except KeyError:
+			event_type_id = self._event_type_ids[event_type] = len(self.event_types)
+			self.event_types.append(event_type)
+
+		self.timestamps[index] = self._clock()
+		self.sources[index] = source._id
+		self.event_type_ids[index] = event_type_id
+		self.handling_nodes[index] = handling_node._id
+		self.targets[index] = _STATUS_TARGETS[result] if type(result) is HSMStatus else result._id
+
+	def __len__(self) -> int:
+		return min(self.count, self.size)
+
+	def __repr__(self) -> str:
+		return f"{type(self).__name__}({len(self)}/{self.size} steps)"
+
+	def clear(self) -> None:
+		"""Forget the recorded steps."""
+
+		self.count = 0
+
+	def dump(self) -> list[TraceRecord]:
+		"""Decode the recorded steps, oldest first.
+
+		Returns:
+			list[TraceRecord]: The recorded steps.
+		"""
+
+		start: Final = self.count - len(self)
+		records: Final[list[TraceRecord]] = []
+		for step in range(start, self.count):
+			index = step % self.size
+			target = self.targets[index]
+			records.append(
+				TraceRecord(
+					timestamp_ns=self.timestamps[index],
+					source=hsm_get_node(self.sources[index]),
+					event_type=self.event_types[self.event_type_ids[index]],
+					handling_node=hsm_get_node(self.handling_nodes[index]),
+					target=_TARGET_STATUSES[target] if target < 0 else hsm_get_node(target),
+				)
+			)
+		return records
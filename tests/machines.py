@@ -0,0 +1,256 @@
+# Copyright (c) 2025 JP Hutchins
+# SPDX-License-Identifier: MIT
+
+"""Node trees that several test modules share, and helpers to start machines."""
+
+from typing import Any, Awaitable, Callable, NamedTuple, Type
+
+import spirea.asyncio as hsm_async
+from spirea.journal import hsm_is_replaying
+from spirea.sync import Machine, Node, hsm_machine_handle_entries, hsm_post
+from spirea.timers import hsm_arm_timeout
+
+
+def entered(node: Any, context: Any) -> Machine:
+	"""Create a machine and do its entries."""
+
+	machine = Machine(node, context)
+	hsm_machine_handle_entries(machine)
+	return machine
+
+
+async def async_entered(node: Any, context: Any) -> hsm_async.Machine:
+	"""Create an asyncio machine and do its entries."""
+
+	machine = hsm_async.Machine(node, context)
+	await hsm_async.hsm_machine_handle_entries(machine)
+	return machine
+
+
+class Login(NamedTuple): ...
+
+
+class Logout(NamedTuple): ...
+
+
+type SessionEvent = Login | Logout
+
+
+class ActiveContext(NamedTuple):
+	session_id: str
+	logins: int
+
+
+class Session(Node[SessionEvent, str, str]):
+	@staticmethod
+	def entry(context: str) -> tuple[Type["Session.Idle"], str]:
+		return Session.Idle, context
+
+	@staticmethod
+	def exit(context: str) -> None: ...
+
+	class Idle(Node[SessionEvent, str, str | ActiveContext]):
+		@staticmethod
+		def entry(context: str | ActiveContext) -> tuple[Type["Session.Idle"], str]:
+			return Session.Idle, context if isinstance(context, str) else context.session_id
+
+		class EventHandlers:
+			login: Callable[[Login, str], Type["Session.Active"]] = lambda e, s: Session.Active
+
+		@staticmethod
+		def exit(context: str) -> None: ...
+
+	class Active(Node[SessionEvent, ActiveContext, str]):
+		@staticmethod
+		def entry(context: str) -> tuple[Type["Session.Active"], ActiveContext]:
+			return Session.Active, ActiveContext(context, 1)
+
+		class EventHandlers:
+			logout: Callable[[Logout, ActiveContext], Type["Session.Idle"]] = lambda e, s: (
+				Session.Idle
+			)
+
+		@staticmethod
+		def exit(context: ActiveContext) -> None: ...
+
+
+class Tick(NamedTuple): ...
+
+
+async def count(event: Tick, context: list[int]) -> Type["Counting"]:
+	context.append(len(context))
+	return Counting
+
+
+class Counting(hsm_async.Node[Tick, list[int], list[int]]):
+	@staticmethod
+	async def entry(context: list[int]) -> tuple[Type["Counting"], list[int]]:
+		return Counting, context
+
+	class EventHandlers:
+		tick: Callable[[Tick, list[int]], Awaitable[Type["Counting"]]] = count
+
+	@staticmethod
+	async def exit(context: list[int]) -> None: ...
+
+
+class Dial(NamedTuple): ...
+
+
+class Expire(NamedTuple): ...
+
+
+class Hangup(NamedTuple): ...
+
+
+type PhoneEvent = Dial | Expire | Hangup
+
+
+class Phone(Node[PhoneEvent, list[str], list[str]]):
+	@staticmethod
+	def entry(context: list[str]) -> tuple[Type["Phone.Idle"], list[str]]:
+		return Phone.Idle, context
+
+	@staticmethod
+	def exit(context: list[str]) -> None: ...
+
+	class Idle(Node[PhoneEvent, list[str], list[str]]):
+		@staticmethod
+		def entry(context: list[str]) -> tuple[Type["Phone.Idle"], list[str]]:
+			context.append("idle")
+			return Phone.Idle, context
+
+		@staticmethod
+		def exit(context: list[str]) -> None: ...
+
+		class EventHandlers:
+			dial: Callable[[Dial, list[str]], Type["Phone.Ringing"]] = lambda e, s: Phone.Ringing
+
+	class Ringing(Node[PhoneEvent, list[str], list[str]]):
+		@staticmethod
+		def entry(context: list[str]) -> tuple[Type["Phone.Ringing"], list[str]]:
+			context.append("ringing")
+			hsm_arm_timeout(Phone.Ringing, 0.5, Expire())
+			return Phone.Ringing, context
+
+		@staticmethod
+		def exit(context: list[str]) -> None: ...
+
+		class EventHandlers:
+			expire: Callable[[Expire, list[str]], Type["Phone.Idle"]] = lambda e, s: Phone.Idle
+			hangup: Callable[[Hangup, list[str]], Type["Phone.Idle"]] = lambda e, s: Phone.Idle
+
+
+class Deposit(NamedTuple):
+	amount: int
+
+
+class Withdraw(NamedTuple):
+	amount: int
+
+
+EVENT_TYPES = (Deposit, Withdraw)
+
+sent: list[int] = []
+"""The balances that the account sent, a side effect."""
+
+
+def deposit(event: Deposit, context: list[int]) -> Type["Account.Open"]:
+	context.append(context[-1] + event.amount)
+	if not hsm_is_replaying():
+		sent.append(context[-1])
+	return Account.Open
+
+
+def withdraw(event: Withdraw, context: list[int]) -> Type["Account.Open"]:
+	if event.amount > context[-1]:
+		raise ValueError("Insufficient funds")
+	context.append(context[-1] - event.amount)
+	if not hsm_is_replaying():
+		sent.append(context[-1])
+	return Account.Open
+
+
+class Account(Node[Deposit | Withdraw, list[int], list[int]]):
+	@staticmethod
+	def entry(context: list[int]) -> tuple[Type["Account.Open"], list[int]]:
+		return Account.Open, context
+
+	@staticmethod
+	def exit(context: list[int]) -> None: ...
+
+	class Open(Node[Deposit | Withdraw, list[int], list[int]]):
+		@staticmethod
+		def entry(context: list[int]) -> tuple[Type["Account.Open"], list[int]]:
+			return Account.Open, context
+
+		@staticmethod
+		def exit(context: list[int]) -> None: ...
+
+		class EventHandlers:
+			deposit: Callable[[Deposit, list[int]], Type["Account.Open"]] = deposit
+			withdraw: Callable[[Withdraw, list[int]], Type["Account.Open"]] = withdraw
+
+
+class Ping(NamedTuple):
+	remaining: int
+
+
+class Fail(NamedTuple): ...
+
+
+type Log = list[object]
+
+
+def ping(name: str, target: Callable[[], type]) -> Callable[[Ping, Log], type]:
+	def handler(event: Ping, context: Log) -> type:
+		context.append((name, event.remaining))
+		if event.remaining:
+			hsm_post(Ping(event.remaining - 1))
+		return target()
+
+	return handler
+
+
+def fail(event: Fail, context: Log) -> type:
+	hsm_post(Ping(100))
+	raise RuntimeError("fail")
+
+
+class Relay(Node[Ping | Fail, Log, Log]):
+	@staticmethod
+	def entry(context: Log) -> tuple[Type["Relay.A"], Log]:
+		hsm_post(Ping(0))
+		return Relay.A, context
+
+	@staticmethod
+	def exit(context: Log) -> None: ...
+
+	class EventHandlers:
+		fail: Callable[[Fail, Log], type] = fail
+
+	class A(Node[Ping | Fail, Log, Log]):
+		@staticmethod
+		def entry(context: Log) -> tuple[Type["Relay.A"], Log]:
+			context.append("enter A")
+			return Relay.A, context
+
+		@staticmethod
+		def exit(context: Log) -> None:
+			context.append("exit A")
+
+		class EventHandlers:
+			ping: Callable[[Ping, Log], type] = ping("A", lambda: Relay.B)
+
+	class B(Node[Ping | Fail, Log, Log]):
+		@staticmethod
+		def entry(context: Log) -> tuple[Type["Relay.B"], Log]:
+			context.append("enter B")
+			return Relay.B, context
+
+		@staticmethod
+		def exit(context: Log) -> None:
+			context.append("exit B")
+
+		class EventHandlers:
+			ping: Callable[[Ping, Log], type] = ping("B", lambda: Relay.A)
@@ -0,0 +1,92 @@
+# Copyright (c) 2025 JP Hutchins
+# SPDX-License-Identifier: MIT
+
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable
+
+import pytest
+
+import spirea
+from spirea._common import hsm_get_running_step
+from spirea.bench.scenarios import deep_chain, long_entry_chain, self_transition, unhandled_bubbling
+from spirea.sync import (
+	Machine,
+	Node,
+	hsm_handle_entries,
+	hsm_handle_event,
+	hsm_machine_handle_entries,
+	hsm_machine_handle_event,
+)
+from tests.machines import Fail, Ping, Relay
+
+EVENTS = 100_000
+
+SPIREA = tracemalloc.Filter(True, str(Path(spirea.__file__).parent / "*"))
+
+
+def allocations(handle: Callable[[Any], object], events: list[Any]) -> tuple[int, int]:
+	"""Count the blocks that the engine leaves allocated and the peak bytes of handling events."""
+
+	# warm up the dispatch tables and the memoized transition plans
+	for event in events[:1000]:
+		handle(event)
+
+	tracemalloc.start()
+	try:
+		before = tracemalloc.take_snapshot().filter_traces((SPIREA,))
+		current, _ = tracemalloc.get_traced_memory()
+		tracemalloc.reset_peak()
+		for event in events:
+			handle(event)
+		_, peak = tracemalloc.get_traced_memory()
+		after = tracemalloc.take_snapshot().filter_traces((SPIREA,))
+	finally:
+		tracemalloc.stop()
+
+	return sum(stat.count_diff for stat in after.compare_to(before, "lineno")), peak - current
+
+
+@pytest.mark.parametrize(
+	"build", [deep_chain, self_transition, unhandled_bubbling, long_entry_chain]
+)
+def test_node_api_steady_state_allocates_nothing(build: Callable[..., Any]) -> None:
+	root, events = build(Node, EVENTS)
+	node = hsm_handle_entries(root)
+
+	def handle(event: Any) -> None:
+		nonlocal node
+		node = hsm_handle_event(node, event)
+
+	blocks, peak = allocations(handle, events)
+	assert blocks == 0
+	# the entries of the scenarios return a tuple, nothing else outlives a call
+	assert peak < 512
+
+
+def test_machine_api_steady_state_allocates_nothing() -> None:
+	root, events = deep_chain(Node, EVENTS)
+	machine = Machine(root, None)
+	hsm_machine_handle_entries(machine)
+
+	blocks, peak = allocations(lambda event: hsm_machine_handle_event(machine, event), events)
+	assert blocks == 0
+	assert peak < 512
+
+
+def test_node_api_reuses_its_queue() -> None:
+	Relay.set_context([])
+	node = hsm_handle_entries(Relay)  # type: ignore[type-abstract]
+	assert node is Relay.B
+
+	node = hsm_handle_event(node, Ping(2))
+	assert node is Relay.A
+	assert Relay.context()[-3:] == [("B", 0), "exit B", "enter A"]
+	spare = hsm_get_running_step().spare
+	assert spare is not None and not spare
+
+	with pytest.raises(RuntimeError):
+		hsm_handle_event(node, Fail())
+	assert hsm_get_running_step().spare is spare
+	assert not spare
+	assert hsm_get_running_step().posted is None
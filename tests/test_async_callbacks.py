@@ -0,0 +1,155 @@
+# Copyright (c) 2025 JP Hutchins
+# SPDX-License-Identifier: MIT
+
+import asyncio
+import inspect
+import warnings
+from typing import Awaitable, Callable, NamedTuple, Type
+
+import pytest
+
+import spirea.asyncio as hsm_async
+from spirea._common import hsm_set_latency_recorder
+from spirea.profile import LatencyHistograms
+
+
+class Push(NamedTuple): ...
+
+
+class Pull(NamedTuple): ...
+
+
+async def pull(event: Pull, context: list[str]) -> Type["Door.Closed"]:
+	await asyncio.sleep(0)
+	context.append("pull")
+	return Door.Closed
+
+
+class Door(hsm_async.Node[Push | Pull, list[str], list[str]]):
+	@staticmethod
+	def entry(context: list[str]) -> tuple[Type["Door.Closed"], list[str]]:
+		return Door.Closed, context
+
+	@staticmethod
+	def exit(context: list[str]) -> None: ...
+
+	class Closed(hsm_async.Node[Push | Pull, list[str], list[str]]):
+		@staticmethod
+		def entry(context: list[str]) -> tuple[Type["Door.Closed"], list[str]]:
+			context.append("closed")
+			return Door.Closed, context
+
+		@staticmethod
+		async def exit(context: list[str]) -> None:
+			await asyncio.sleep(0)
+			context.append("closed exit")
+
+		class EventHandlers:
+			push: Callable[[Push, list[str]], Type["Door.Open"]] = lambda e, s: Door.Open
+
+	class Open(hsm_async.Node[Push | Pull, list[str], list[str]]):
+		@staticmethod
+		async def entry(context: list[str]) -> tuple[Type["Door.Open"], list[str]]:
+			context.append("open")
+			return Door.Open, context
+
+		@staticmethod
+		def exit(context: list[str]) -> None:
+			context.append("open exit")
+
+		class EventHandlers:
+			pull: Callable[[Pull, list[str]], Awaitable[Type["Door.Closed"]]] = pull
+
+
+def test_coroutine_callbacks_are_detected() -> None:
+	assert Door._coroutine_callbacks == frozenset()
+	assert Door.Closed._coroutine_callbacks == frozenset({Door.Closed.exit})
+	assert Door.Open._coroutine_callbacks == frozenset({Door.Open.entry, pull})
+
+
+async def run_door() -> list[str]:
+	machine = hsm_async.Machine(Door, [])
+	assert await hsm_async.hsm_machine_handle_entries(machine) is Door.Closed
+	assert await hsm_async.hsm_machine_handle_event(machine, Push()) is Door.Open
+	assert await hsm_async.hsm_machine_handle_events(machine, (Pull(), Pull(), Push())) is Door.Open
+	log: list[str] = machine.contexts[Door]
+	return log
+
+
+@pytest.mark.asyncio
+async def test_mixed_callbacks() -> None:
+	assert await run_door() == [
+		"closed",
+		"closed exit",
+		"open",
+		"pull",
+		"open exit",
+		"closed",
+		"closed exit",
+		"open",
+	]
+
+
+@pytest.mark.asyncio
+async def test_mixed_callbacks_when_profiling() -> None:
+	histograms = LatencyHistograms()
+	previous = hsm_set_latency_recorder(histograms)
+	try:
+		context = await run_door()
+	finally:
+		hsm_set_latency_recorder(previous)
+
+	assert len(context) == 8
+	assert len(histograms) > 0
+
+
+async def close(name: str, context: list[str]) -> None:
+	await asyncio.sleep(0)
+	context.append(name)
+
+
+class Hatch(hsm_async.Node[Push | Pull, list[str], list[str]]):
+	@staticmethod
+	def entry(context: list[str]) -> tuple[Type["Hatch"], list[str]]:
+		return Hatch, context
+
+	@staticmethod
+	def exit(context: list[str]) -> Awaitable[None]:
+		return close("unmarked", context)
+
+	class EventHandlers:
+		push: Callable[[Push, list[str]], hsm_async.HSMStatus] = lambda e, s: (
+			hsm_async.HSMStatus.SELF_TRANSITION
+		)
+
+
+class MarkedHatch(hsm_async.Node[Push | Pull, list[str], list[str]]):
+	@staticmethod
+	def entry(context: list[str]) -> tuple[Type["MarkedHatch"], list[str]]:
+		return MarkedHatch, context
+
+	@staticmethod
+	@inspect.markcoroutinefunction
+	def exit(context: list[str]) -> Awaitable[None]:
+		return close("marked", context)
+
+	class EventHandlers:
+		push: Callable[[Push, list[str]], hsm_async.HSMStatus] = lambda e, s: (
+			hsm_async.HSMStatus.SELF_TRANSITION
+		)
+
+
+@pytest.mark.asyncio
+async def test_unmarked_awaitable_callbacks_raise() -> None:
+	machine = hsm_async.Machine(Hatch, [])
+	await hsm_async.hsm_machine_handle_entries(machine)
+	with warnings.catch_warnings():
+		# the coroutine is closed, not left unawaited
+		warnings.simplefilter("error", RuntimeWarning)
+		with pytest.raises(TypeError, match="markcoroutinefunction"):
+			await hsm_async.hsm_machine_handle_event(machine, Push())
+
+	marked = hsm_async.Machine(MarkedHatch, [])
+	await hsm_async.hsm_machine_handle_entries(marked)
+	await hsm_async.hsm_machine_handle_event(marked, Push())
+	assert marked.contexts[MarkedHatch] == ["marked"]
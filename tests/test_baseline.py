@@ -0,0 +1,96 @@
+# Copyright (c) 2025 JP Hutchins
+# SPDX-License-Identifier: MIT
+
+import json
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from spirea.bench.__main__ import main
+from spirea.bench.baseline import (
+	BASELINE_FORMAT,
+	hsm_compare,
+	hsm_load_baseline,
+	hsm_save_baseline,
+	hsm_summarize,
+)
+
+
+def report(**samples: list[float]) -> dict[str, Any]:
+	return {
+		"events": 100,
+		"repeats": 5,
+		"results": [
+			{"scenario": scenario, "engine": "sync", "ns_per_event": ns}
+			for scenario, values in samples.items()
+			for ns in values
+		],
+	}
+
+
+def test_summary_has_median_and_quartiles() -> None:
+	baseline = hsm_summarize(report(a=[1, 2, 3, 4, 100], b=[7]))
+	assert baseline["format"] == BASELINE_FORMAT
+	assert baseline["repeats"] == 5
+	a = baseline["results"]["a/sync"]
+	assert (a["q1"], a["median"], a["q3"]) == (2, 3, 4)
+	assert a["samples"] == [1, 2, 3, 4, 100]
+	b = baseline["results"]["b/sync"]
+	assert (b["q1"], b["median"], b["q3"]) == (7, 7, 7)
+
+
+def test_compare_flags_regressions_beyond_threshold_and_noise() -> None:
+	baseline = hsm_summarize(
+		report(slower=[100, 101, 102, 103, 104], noisy=[80, 90, 100, 110, 120], same=[50] * 5)
+	)
+	current = hsm_summarize(
+		report(
+			slower=[110, 111, 112, 113, 114],
+			noisy=[95, 105, 110, 115, 125],
+			same=[51] * 5,
+			new=[1] * 5,
+		)
+	)
+	deltas = {delta.key: delta for delta in hsm_compare(baseline, current)}
+	assert set(deltas) == {"slower/sync", "noisy/sync", "same/sync"}
+
+	assert deltas["slower/sync"].change == pytest.approx(0.1 / 1.02)
+	assert deltas["slower/sync"].regression
+	# 10% slower, but within the IQR of the runs
+	assert deltas["noisy/sync"].change == pytest.approx(0.1)
+	assert deltas["noisy/sync"].noise == pytest.approx(0.2)
+	assert not deltas["noisy/sync"].regression
+	# beyond the noise, but within the threshold
+	assert not deltas["same/sync"].regression
+	assert hsm_compare(baseline, current, threshold=0.01)[2].regression
+
+
+def test_load_rejects_other_formats(tmp_path: Path) -> None:
+	path = tmp_path / "baseline.json"
+	baseline = hsm_summarize(report(a=[1, 2, 3]))
+	hsm_save_baseline(baseline, path)
+	assert hsm_load_baseline(path) == baseline
+
+	path.write_text(json.dumps({**baseline, "format": BASELINE_FORMAT + 1}))
+	with pytest.raises(ValueError):
+		hsm_load_baseline(path)
+
+
+def test_cli_saves_and_compares(tmp_path: Path, capsys: pytest.CaptureFixture[str]) -> None:
+	path = tmp_path / "baseline.json"
+	arguments = ["--events", "16", "--engine", "sync", "--scenario", "deep_chain", "--repeats", "3"]
+	assert main([*arguments, "--save-baseline", str(path)]) == 0
+	baseline = hsm_load_baseline(path)
+	assert len(baseline["results"]["deep_chain/sync"]["samples"]) == 3
+
+	assert main([*arguments, "--compare", str(path), "--threshold", "1000"]) == 0
+	assert "deep_chain/sync" in capsys.readouterr().out
+
+	# a baseline a thousand times faster than any machine
+	for result in baseline["results"].values():
+		for key in ("median", "q1", "q3"):
+			result[key] /= 1000
+	hsm_save_baseline(baseline, path)
+	assert main([*arguments, "--compare", str(path)]) == 1
+	assert "REGRESSION" in capsys.readouterr().out
@@ -0,0 +1,92 @@
+# Copyright (c) 2025 JP Hutchins
+# SPDX-License-Identifier: MIT
+
+import random
+
+import pytest
+
+import spirea.asyncio as hsm_async
+from examples.samek.events import (
+	Event,
+	EventA,
+	EventB,
+	EventC,
+	EventD,
+	EventE,
+	EventF,
+	EventG,
+	EventH,
+)
+from examples.samek.hsm import s0
+from examples.samek.state import Context
+from spirea.sync import (
+	Machine,
+	hsm_handle_entries,
+	hsm_handle_event,
+	hsm_handle_events,
+	hsm_iter_events,
+	hsm_machine_handle_entries,
+	hsm_machine_handle_event,
+	hsm_machine_handle_events,
+)
+from tests.machines import Counting, Tick
+
+EVENTS = (EventA(), EventB(), EventC(), EventD(), EventE(), EventF(), EventG(), EventH())
+
+
+def random_events(count: int) -> list[Event]:
+	rng = random.Random(0)
+	return [rng.choice(EVENTS) for _ in range(count)]
+
+
+def test_batch_matches_single_events() -> None:
+	events = random_events(500)
+
+	single = Machine(s0, Context(foo=0))
+	hsm_machine_handle_entries(single)
+	nodes = [hsm_machine_handle_event(single, event) for event in events]
+
+	batch = Machine(s0, Context(foo=0))
+	hsm_machine_handle_entries(batch)
+	assert hsm_machine_handle_events(batch, events) is single.node
+	assert batch.node is single.node
+	assert batch.contexts == single.contexts
+	assert nodes[-1] is single.node
+
+
+def test_node_batch_and_iter() -> None:
+	events = random_events(50)
+
+	s0._context = Context(foo=0)
+	node = hsm_handle_entries(s0)  # type: ignore[type-abstract]
+	expected = []
+	for event in events:
+		node = hsm_handle_event(node, event)
+		expected.append(node)
+
+	s0._context = Context(foo=0)
+	node = hsm_handle_entries(s0)  # type: ignore[type-abstract]
+	assert list(hsm_iter_events(node, events)) == expected
+
+	s0._context = Context(foo=0)
+	node = hsm_handle_entries(s0)  # type: ignore[type-abstract]
+	assert hsm_handle_events(node, events) is expected[-1]
+	assert hsm_handle_events(node, ()) is node
+
+
+@pytest.mark.asyncio
+async def test_async_batch() -> None:
+	machine = hsm_async.Machine(Counting, [])
+	await hsm_async.hsm_machine_handle_entries(machine)
+
+	assert await hsm_async.hsm_machine_handle_events(machine, [Tick()] * 3) is Counting
+	assert machine.contexts[Counting] == [0, 1, 2]
+
+	Counting._context = []
+	node = await hsm_async.hsm_handle_entries(Counting)  # type: ignore[type-abstract]
+	assert [n async for n in hsm_async.hsm_iter_events(node, [Tick(), Tick()])] == [
+		Counting,
+		Counting,
+	]
+	assert await hsm_async.hsm_handle_events(node, [Tick()]) is Counting
+	assert Counting._context == [0, 1, 2]
@@ -0,0 +1,45 @@
+# Copyright (c) 2025 JP Hutchins
+# SPDX-License-Identifier: MIT
+
+import json
+from pathlib import Path
+
+import pytest
+
+from spirea.bench.__main__ import main
+from spirea.bench.scenarios import SCENARIOS
+from spirea.bench.suite import ENGINES, run_scenario, run_suite
+
+
+def test_suite_runs_every_scenario_on_every_engine() -> None:
+	report = run_suite(events=64)
+	assert report["skipped"] == []
+	results = {(result["scenario"], result["engine"]): result for result in report["results"]}
+	assert set(results) == {(scenario.name, engine) for scenario in SCENARIOS for engine in ENGINES}
+
+	for result in results.values():
+		assert result["events"] == 64
+		assert result["events_per_sec"] > 0
+	assert results["deep_chain", "sync"]["transitions"] == 64
+	assert results["unhandled_bubbling", "asyncio"]["transitions"] == 0
+	assert results["unhandled_bubbling", "asyncio"]["ns_per_transition"] is None
+
+	# each asyncio step allocates a coroutine, a `RunningStep` and a queue
+	for scenario in SCENARIOS:
+		sync = results[scenario.name, "sync"]["transient_bytes_per_event"]
+		assert 0 <= sync < results[scenario.name, "asyncio"]["transient_bytes_per_event"]
+
+
+def test_cli_writes_json(tmp_path: Path) -> None:
+	output = tmp_path / "bench.json"
+	assert (
+		main(["--events", "16", "--engine", "sync", "--scenario", "wide_fanout", "-o", str(output)])
+		== 0
+	)
+	report = json.loads(output.read_text())
+	assert [(result["scenario"], result["engine"]) for result in report["results"]] == [
+		("wide_fanout", "sync")
+	]
+
+	with pytest.raises(ValueError):
+		run_scenario(SCENARIOS[0], "threads", 16)
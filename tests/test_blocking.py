@@ -0,0 +1,189 @@
+# Copyright (c) 2025 JP Hutchins
+# SPDX-License-Identifier: MIT
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, NamedTuple, Type
+
+import pytest
+
+import spirea.asyncio as hsm_async
+from spirea._common import RunningStep, hsm_get_running_step
+from spirea.asyncio import blocking, hsm_post, hsm_set_executor
+
+
+class Save(NamedTuple): ...
+
+
+class Done(NamedTuple): ...
+
+
+def save(event: Save, context: list[str]) -> Type["Store.Saved"]:
+	context.append(threading.current_thread().name)
+	return Store.Saved
+
+
+class Store(hsm_async.Node[Save | Done, list[str], list[str]]):
+	@staticmethod
+	def entry(context: list[str]) -> tuple[Type["Store.Dirty"], list[str]]:
+		return Store.Dirty, context
+
+	@staticmethod
+	def exit(context: list[str]) -> None: ...
+
+	class Dirty(hsm_async.Node[Save | Done, list[str], list[str]]):
+		@staticmethod
+		def entry(context: list[str]) -> tuple[Type["Store.Dirty"], list[str]]:
+			return Store.Dirty, context
+
+		@staticmethod
+		@blocking
+		def exit(context: list[str]) -> None:
+			context.append(threading.current_thread().name)
+
+		class EventHandlers:
+			save: Callable[[Save, list[str]], Type["Store.Saved"]] = save
+
+	@blocking
+	class Saved(hsm_async.Node[Save | Done, list[str], list[str]]):
+		@staticmethod
+		def entry(context: list[str]) -> tuple[Type["Store.Saved"], list[str]]:
+			context.append(threading.current_thread().name)
+			return Store.Saved, context
+
+		@staticmethod
+		def exit(context: list[str]) -> None: ...
+
+		class EventHandlers:
+			done: Callable[[Done, list[str]], hsm_async.HSMStatus] = lambda e, s: (
+				hsm_async.HSMStatus.NO_TRANSITION
+			)
+
+
+def record(event: Save, context: list[str]) -> hsm_async.HSMStatus:
+	context.append(threading.current_thread().name)
+	return hsm_async.HSMStatus.NO_TRANSITION
+
+
+@blocking
+class Mixed(hsm_async.Node[Save | Done, list[str], list[str]]):
+	@staticmethod
+	async def entry(context: list[str]) -> tuple[Type["Mixed"], list[str]]:
+		context.append(threading.current_thread().name)
+		return Mixed, context
+
+	@staticmethod
+	def exit(context: list[str]) -> None: ...
+
+	class EventHandlers:
+		save: Callable[[Save, list[str]], hsm_async.HSMStatus] = record
+
+
+def test_blocking_callbacks_are_awaited() -> None:
+	assert Store.Dirty._coroutine_callbacks == frozenset({Store.Dirty.exit})
+	assert Store.Saved._coroutine_callbacks == frozenset(
+		{Store.Saved.entry, Store.Saved.exit, Store.Saved._event_handlers[0][1]}
+	)
+
+	with pytest.raises(TypeError):
+		blocking(hsm_async.hsm_handle_event)
+
+
+@pytest.mark.asyncio
+async def test_blocking_callbacks_run_on_the_executor() -> None:
+	executor = ThreadPoolExecutor(1, thread_name_prefix="store")
+	previous = hsm_set_executor(executor)
+	try:
+		machine = hsm_async.Machine(Store, [])
+		await hsm_async.hsm_machine_handle_entries(machine)
+		assert await hsm_async.hsm_machine_handle_event(machine, Save()) is Store.Saved
+		assert await hsm_async.hsm_machine_handle_event(machine, Done()) is Store.Saved
+	finally:
+		hsm_set_executor(previous)
+		executor.shutdown()
+
+	main = threading.current_thread().name
+	assert machine.contexts[Store] == [main, "store_0", "store_0"]
+
+
+@pytest.mark.asyncio
+async def test_blocking_callbacks_do_not_block_the_loop() -> None:
+	ticks = 0
+
+	async def tick() -> None:
+		nonlocal ticks
+		while True:
+			await asyncio.sleep(0)
+			ticks += 1
+
+	@blocking
+	def wait(event: Save, context: list[str]) -> None:
+		threading.Event().wait(0.05)
+
+	ticker = asyncio.create_task(tick())
+	await wait(Save(), [])
+	ticker.cancel()
+	assert ticks > 0
+
+
+@pytest.mark.asyncio
+async def test_blocking_node_keeps_its_coroutine_functions() -> None:
+	assert Mixed._coroutine_callbacks == frozenset(
+		{Mixed.entry, Mixed.exit, Mixed._event_handlers[0][1]}
+	)
+
+	executor = ThreadPoolExecutor(1, thread_name_prefix="mixed")
+	previous = hsm_set_executor(executor)
+	try:
+		machine = hsm_async.Machine(Mixed, [])
+		await hsm_async.hsm_machine_handle_entries(machine)
+		await hsm_async.hsm_machine_handle_event(machine, Save())
+	finally:
+		hsm_set_executor(previous)
+		executor.shutdown()
+
+	assert machine.contexts[Mixed] == [threading.current_thread().name, "mixed_0"]
+
+
+steps: list[RunningStep] = []
+
+
+@blocking
+def post_done(event: Save, context: list[str]) -> hsm_async.HSMStatus:
+	steps.append(hsm_get_running_step())
+	hsm_post(Done())
+	return hsm_async.HSMStatus.NO_TRANSITION
+
+
+def done(event: Done, context: list[str]) -> hsm_async.HSMStatus:
+	steps.append(hsm_get_running_step())
+	context.append("done")
+	return hsm_async.HSMStatus.NO_TRANSITION
+
+
+class Poster(hsm_async.Node[Save | Done, list[str], list[str]]):
+	@staticmethod
+	def entry(context: list[str]) -> tuple[Type["Poster"], list[str]]:
+		return Poster, context
+
+	@staticmethod
+	def exit(context: list[str]) -> None: ...
+
+	class EventHandlers:
+		save: Callable[[Save, list[str]], Awaitable[hsm_async.HSMStatus]] = post_done
+		done: Callable[[Done, list[str]], hsm_async.HSMStatus] = done
+
+
+@pytest.mark.asyncio
+async def test_blocking_callbacks_get_a_running_step_of_their_own() -> None:
+	steps.clear()
+	machine = hsm_async.Machine(Poster, [])
+	await hsm_async.hsm_machine_handle_entries(machine)
+	await hsm_async.hsm_machine_handle_event(machine, Save())
+
+	assert machine.contexts[Poster] == ["done"]
+	offloaded, step = steps
+	assert offloaded is not step
+	# the events that the callback posts still go to the step that awaits it
+	assert offloaded.posted is step.posted
@@ -0,0 +1,81 @@
+# Copyright (c) 2025 JP Hutchins
+# SPDX-License-Identifier: MIT
+
+from typing import Callable, NamedTuple, Type
+
+from spirea.sync import HSMStatus, Node, hsm_handle_event
+
+
+class Base(NamedTuple):
+	value: int
+
+
+class Derived(Base): ...
+
+
+class Other(NamedTuple): ...
+
+
+class Unrelated(NamedTuple): ...
+
+
+type Event = Base | Derived | Other | Unrelated
+
+
+def base_handler(event: Base, context: None) -> Type["Target"]:
+	return Target
+
+
+def derived_handler(event: Derived, context: None) -> Type["Target"]:
+	raise AssertionError("shadowed by the Base handler")
+
+
+def union_handler(event: Other | Unrelated, context: None) -> HSMStatus:
+	return HSMStatus.NO_TRANSITION
+
+
+class Source(Node[Event, None, None]):
+	@staticmethod
+	def entry(context: None) -> tuple[Type["Source"], None]:
+		return Source, None
+
+	class EventHandlers:
+		base: Callable[[Base, None], Type["Target"]] = base_handler
+		derived: Callable[[Derived, None], Type["Target"]] = derived_handler
+		other: Callable[[Other | Unrelated, None], HSMStatus] = union_handler
+
+	@staticmethod
+	def exit(context: None) -> None: ...
+
+
+class Target(Node[Event, None, None]):
+	@staticmethod
+	def entry(context: None) -> tuple[Type["Target"], None]:
+		return Target, None
+
+	@staticmethod
+	def exit(context: None) -> None: ...
+
+
+def test_dispatch_table_is_precompiled() -> None:
+	assert Source._event_dispatch[Base] is base_handler
+	# declaration order wins, just like the isinstance scan
+	assert Source._event_dispatch[Derived] is base_handler
+	# unions are resolved lazily
+	assert Other not in Source._event_dispatch
+	assert Target._event_dispatch == {}
+
+
+def test_dispatch_resolves_and_caches_subclasses() -> None:
+	class MoreDerived(Derived): ...
+
+	assert hsm_handle_event(Source, MoreDerived(1)) is Target  # type: ignore[type-abstract]
+	assert Source._event_dispatch[MoreDerived] is base_handler
+
+	assert hsm_handle_event(Source, Unrelated()) is Source  # type: ignore[type-abstract]
+	assert Source._event_dispatch[Unrelated] is union_handler
+
+
+def test_dispatch_caches_unhandled_events() -> None:
+	assert hsm_handle_event(Target, Base(0)) is Target  # type: ignore[type-abstract]
+	assert Target._event_dispatch[Base] is None
@@ -0,0 +1,80 @@
+# Copyright (c) 2025 JP Hutchins
+# SPDX-License-Identifier: MIT
+
+from typing import Any
+
+import pytest
+
+import spirea.asyncio as hsm_async
+import spirea.sync as hsm_sync
+from spirea._common import HSMStatus, hsm_set_trace_hook, is_pure
+from spirea.bench.generator import hsm_generate_events, hsm_generate_machine
+from spirea.bench.scenarios import hsm_generated_scenario
+from spirea.bench.suite import run_scenario
+
+
+@pytest.mark.parametrize(
+	"states, depth, branching, handlers_per_state",
+	((1, 1, 1, 1), (50, 50, 1, 2), (2000, 8, 4, 3), (3000, 4, 16, 8)),
+)
+def test_generated_machines_have_the_requested_shape(
+	states: int, depth: int, branching: int, handlers_per_state: int
+) -> None:
+	generated = hsm_generate_machine(
+		hsm_sync.Node,
+		states,
+		depth,
+		branching,
+		handlers_per_state,
+		event_types=8,
+		seed=states,
+	)
+	assert len(generated.nodes) == states
+	assert generated.root._superstate is None
+	assert max(node._depth for node in generated.nodes) == depth - 1
+	assert all(len(node._substates) <= branching for node in generated.nodes)
+	for node, targets in zip(generated.nodes, generated.targets):
+		assert len(node._event_handlers) == len(targets) == handlers_per_state
+		assert all(is_pure(handler) for _, handler in node._event_handlers)
+
+
+def test_event_streams_follow_the_machine() -> None:
+	results: list[Any] = []
+	previous = hsm_set_trace_hook(
+		lambda source, event, handling_node, result: results.append(result)
+	)
+	try:
+		for seed in range(5):
+			generated = hsm_generate_machine(hsm_sync.Node, 500, 10, 3, seed=seed)
+			node = hsm_sync.hsm_handle_entries(generated.root)
+			hsm_sync.hsm_handle_events(node, hsm_generate_events(generated, 2000, seed=seed))
+	finally:
+		hsm_set_trace_hook(previous)
+	assert len(results) == 10_000
+	assert HSMStatus.EVENT_UNHANDLED not in results
+
+	generated = hsm_generate_machine(hsm_sync.Node, 10, 3, seed=0)
+	events = hsm_generate_events(generated, 1000, handled=0.0, seed=0)
+	assert {type(event) for event in events} == set(generated.event_types)
+
+
+@pytest.mark.asyncio
+async def test_async_flavour() -> None:
+	generated = hsm_generate_machine(hsm_async.Node, 300, 6, coroutines=True, seed=7)
+	assert generated.root._coroutine_callbacks == frozenset(
+		{generated.root.entry, generated.root.exit}
+	)
+	node = await hsm_async.hsm_handle_entries(generated.root)
+	node = await hsm_async.hsm_handle_events(node, hsm_generate_events(generated, 1000, seed=7))
+	assert node in generated.nodes
+
+
+def test_generated_scenario() -> None:
+	scenario = hsm_generated_scenario("generated", states=200, depth=8, seed=3)
+	result = run_scenario(scenario, "sync", 100)
+	assert (result.scenario, result.events, result.transitions) == ("generated", 100, 100)
+
+	with pytest.raises(ValueError):
+		hsm_generate_machine(hsm_sync.Node, 100, 3, branching=2)
+	with pytest.raises(ValueError):
+		hsm_generate_machine(hsm_sync.Node, 10, 3, handlers_per_state=9)
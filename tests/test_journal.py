@@ -0,0 +1,78 @@
+# Copyright (c) 2025 JP Hutchins
+# SPDX-License-Identifier: MIT
+
+from pathlib import Path
+
+import pytest
+
+from spirea.journal import (
+	Journal,
+	hsm_journal_handle_event,
+	hsm_read_journal,
+	hsm_replay,
+)
+from tests.machines import EVENT_TYPES, Account, Deposit, Withdraw, entered, sent
+
+
+def test_replay_rebuilds_the_state(tmp_path: Path) -> None:
+	machine = entered(Account, [0])
+	clock = iter(range(100))
+	with Journal(tmp_path, EVENT_TYPES, segment_size=64, clock=lambda: next(clock)) as journal:
+		for event in [Deposit(10), Withdraw(3), Deposit(5), Withdraw(100), Deposit(1)]:
+			try:
+				hsm_journal_handle_event(journal, machine, event)
+			except ValueError:
+				pass
+
+	# the records are split across segments and the rejected withdrawal is not appended
+	assert len(list(tmp_path.iterdir())) > 1
+	assert list(hsm_read_journal(tmp_path, EVENT_TYPES)) == [
+		(0, Deposit(10)),
+		(1, Withdraw(3)),
+		(2, Deposit(5)),
+		(3, Deposit(1)),
+	]
+
+	sent.clear()
+	replayed = entered(Account, [0])
+	assert hsm_replay(tmp_path, EVENT_TYPES, replayed) is Account.Open
+	assert replayed.contexts[Account.Open] == machine.contexts[Account.Open] == [0, 10, 7, 12, 13]
+	assert sent == []
+
+	sent.clear()
+	partial = entered(Account, [0])
+	hsm_replay(tmp_path, EVENT_TYPES, partial, side_effect_free=False, until=1)
+	assert partial.contexts[Account.Open] == [0, 10, 7]
+	assert sent == [10, 7]
+
+
+def test_journal_appends_to_a_new_segment(tmp_path: Path) -> None:
+	with Journal(tmp_path, EVENT_TYPES) as journal:
+		journal.append(Deposit(1))
+	with Journal(tmp_path, EVENT_TYPES) as journal:
+		journal.append(Deposit(2))
+		journal.flush(fsync=True)
+		assert [record.event for record in hsm_read_journal(tmp_path, EVENT_TYPES)] == [
+			Deposit(1),
+			Deposit(2),
+		]
+	assert sorted(path.name for path in tmp_path.iterdir()) == [
+		"00000000.journal",
+		"00000001.journal",
+	]
+
+
+def test_truncated_records_are_skipped(tmp_path: Path) -> None:
+	with Journal(tmp_path, EVENT_TYPES) as journal:
+		journal.append(Deposit(1))
+		journal.append(Deposit(2))
+	(segment,) = tmp_path.iterdir()
+	segment.write_bytes(segment.read_bytes()[:-3])
+	assert [record.event for record in hsm_read_journal(tmp_path, EVENT_TYPES)] == [Deposit(1)]
+
+	segment.write_bytes(b"nonsense")
+	with pytest.raises(ValueError):
+		list(hsm_read_journal(tmp_path, EVENT_TYPES))
+
+	with pytest.raises(KeyError):
+		Journal(tmp_path, EVENT_TYPES).append(object())
@@ -0,0 +1,64 @@
+# Copyright (c) 2025 JP Hutchins
+# SPDX-License-Identifier: MIT
+
+import pytest
+
+import spirea.asyncio as hsm_async
+from examples.samek.events import EventC, EventG, EventH
+from examples.samek.hsm import s0
+from examples.samek.state import Context
+from spirea.sync import Machine, hsm_machine_handle_entries, hsm_machine_handle_event
+from tests.machines import ActiveContext, Counting, Login, Logout, Session, Tick
+
+
+def test_machines_share_a_node_tree() -> None:
+	machine1 = Machine(s0, Context(foo=0))
+	machine2 = Machine(s0, Context(foo=0))
+
+	assert hsm_machine_handle_entries(machine1) is s0.s1.s11
+	assert hsm_machine_handle_entries(machine2) is s0.s1.s11
+
+	assert hsm_machine_handle_event(machine1, EventC()) is s0.s2.s21.s211
+	assert machine1.node is s0.s2.s21.s211
+	assert machine2.node is s0.s1.s11
+
+	hsm_machine_handle_event(machine1, EventH())
+	assert machine1.contexts[s0.s2.s21].foo == 1
+	assert machine2.contexts[s0.s1.s11].foo == 0
+
+	assert hsm_machine_handle_event(machine1, EventG()) is s0
+	assert hsm_machine_handle_event(machine2, EventG()) is s0.s2.s21.s211
+
+
+def test_machines_have_scoped_contexts() -> None:
+	machine1 = Machine(Session, "session_1")
+	machine2 = Machine(Session, "session_2")
+	assert hsm_machine_handle_entries(machine1) is Session.Idle
+	assert hsm_machine_handle_entries(machine2) is Session.Idle
+
+	assert hsm_machine_handle_event(machine1, Login()) is Session.Active
+	assert machine1.contexts[Session.Active] == ActiveContext("session_1", 1)
+	assert machine2.contexts[Session.Idle] == "session_2"
+
+	assert hsm_machine_handle_event(machine2, Login()) is Session.Active
+	assert machine2.contexts[Session.Active] == ActiveContext("session_2", 1)
+
+	assert hsm_machine_handle_event(machine1, Logout()) is Session.Idle
+	assert hsm_machine_handle_event(machine1, Logout()) is Session.Idle
+	assert machine1.contexts[Session.Idle] == "session_1"
+	assert machine2.node is Session.Active
+
+
+@pytest.mark.asyncio
+async def test_async_machines() -> None:
+	machine1 = hsm_async.Machine(Counting, [])
+	machine2 = hsm_async.Machine(Counting, [])
+	await hsm_async.hsm_machine_handle_entries(machine1)
+	await hsm_async.hsm_machine_handle_entries(machine2)
+
+	for _ in range(3):
+		await hsm_async.hsm_machine_handle_event(machine1, Tick())
+	await hsm_async.hsm_machine_handle_event(machine2, Tick())
+
+	assert machine1.contexts[Counting] == [0, 1, 2]
+	assert machine2.contexts[Counting] == [0]
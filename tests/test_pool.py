@@ -0,0 +1,129 @@
+# Copyright (c) 2025 JP Hutchins
+# SPDX-License-Identifier: MIT
+
+import random
+
+import pytest
+
+import spirea.asyncio as hsm_async
+from examples.samek.driver import MAP_CHAR_TO_EVENT
+from examples.samek.headless import build, silenced
+from examples.samek.state import Context
+from spirea._common import hsm_get_event_handlers, hsm_get_node
+from spirea.sync import (
+	Machine,
+	MachinePool,
+	Node,
+	hsm_machine_handle_entries,
+	hsm_machine_handle_event,
+	hsm_pool_handle_entries,
+	hsm_pool_handle_event,
+)
+from tests.machines import ActiveContext, Counting, Login, Logout, Session, Tick
+
+
+def test_state_ids_are_unique() -> None:
+	nodes = (Session, Session.Idle, Session.Active)
+	assert len({node._id for node in nodes}) == len(nodes)
+	for node in nodes:
+		assert hsm_get_node(node._id) is node
+
+
+def test_pool_handles_events_for_subsets() -> None:
+	pool = MachinePool(Session, 5, (f"session_{i}" for i in range(5)))
+	assert pool.node(0) is Session
+
+	hsm_pool_handle_entries(pool)
+	assert pool.group_by_state() == {Session.Idle: [0, 1, 2, 3, 4]}
+
+	hsm_pool_handle_event(pool, Login(), indices=(1, 3))
+	assert pool.group_by_state() == {Session.Idle: [0, 2, 4], Session.Active: [1, 3]}
+	assert pool.contexts[Session.Active][1] == ActiveContext("session_1", 1)
+	assert pool.contexts[Session.Active][3] == ActiveContext("session_3", 1)
+	assert pool.contexts[Session.Active][0] is None
+
+	# instances in Idle ignore the logout
+	hsm_pool_handle_event(pool, Logout())
+	assert pool.group_by_state() == {Session.Idle: [0, 1, 2, 3, 4]}
+	assert pool.contexts[Session.Idle] == [f"session_{i}" for i in range(5)]
+
+
+def test_pool_groups_subsets() -> None:
+	pool = MachinePool(Session, 4, ("a", "b", "c", "d"))
+	hsm_pool_handle_entries(pool)
+	hsm_pool_handle_event(pool, Login(), indices=(0,))
+	assert pool.group_by_state((3, 0)) == {Session.Idle: [3], Session.Active: [0]}
+
+
+def test_event_handlers_bubble_to_the_root() -> None:
+	s0 = build(Node)
+	handlers = hsm_get_event_handlers(s0.s2.s21.s211, MAP_CHAR_TO_EVENT["g"])
+	assert [node for node, _ in handlers] == [s0.s2.s21.s211]
+	handlers = hsm_get_event_handlers(s0.s2.s21.s211, MAP_CHAR_TO_EVENT["e"])
+	assert [node for node, _ in handlers] == [s0]
+	assert hsm_get_event_handlers(s0.s2.s21.s211, MAP_CHAR_TO_EVENT["a"]) == ()
+
+
+def test_pool_matches_machines() -> None:
+	# with bubbling, self-transitions and exits to a superstate, for any subset
+	s0 = build(Node)
+	rng = random.Random(5)
+	size = 8
+	pool = MachinePool(s0, size, (Context(foo=0) for _ in range(size)))
+	machines = [Machine(s0, Context(foo=0)) for _ in range(size)]
+	with silenced():
+		hsm_pool_handle_entries(pool)
+		for machine in machines:
+			hsm_machine_handle_entries(machine)
+		for _ in range(200):
+			event = rng.choice(list(MAP_CHAR_TO_EVENT.values()))
+			indices = rng.sample(range(size), rng.randint(1, size))
+			hsm_pool_handle_event(pool, event, indices)
+			for index in indices:
+				hsm_machine_handle_event(machines[index], event)
+
+			assert [pool.node(index) for index in range(size)] == [
+				machine.node for machine in machines
+			]
+	assert pool.contexts[s0] == [machine.contexts[s0] for machine in machines]
+
+
+def test_pool_checks_contexts() -> None:
+	with pytest.raises(ValueError):
+		MachinePool(Session, 3, ("a", "b"))
+
+
+@pytest.mark.asyncio
+async def test_async_pool() -> None:
+	pool = hsm_async.MachinePool(Counting, 3, ([], [], []))
+	await hsm_async.hsm_pool_handle_entries(pool)
+
+	await hsm_async.hsm_pool_handle_event(pool, Tick())
+	await hsm_async.hsm_pool_handle_event(pool, Tick(), indices=(2,))
+
+	assert pool.contexts[Counting] == [[0], [0], [0, 1]]
+	assert pool.group_by_state() == {Counting: [0, 1, 2]}
+
+
+@pytest.mark.asyncio
+async def test_async_pool_matches_machines() -> None:
+	s0 = build(hsm_async.Node)
+	rng = random.Random(7)
+	size = 4
+	pool = hsm_async.MachinePool(s0, size, (Context(foo=0) for _ in range(size)))
+	machines = [hsm_async.Machine(s0, Context(foo=0)) for _ in range(size)]
+	with silenced():
+		await hsm_async.hsm_pool_handle_entries(pool)
+		for machine in machines:
+			await hsm_async.hsm_machine_handle_entries(machine)
+		for _ in range(100):
+			event = rng.choice(list(MAP_CHAR_TO_EVENT.values()))
+			indices = rng.sample(range(size), rng.randint(1, size))
+			await hsm_async.hsm_pool_handle_event(pool, event, indices)
+			for index in indices:
+				await hsm_async.hsm_machine_handle_event(machines[index], event)
+
+			assert [pool.node(index) for index in range(size)] == [
+				machine.node for machine in machines
+			]
+	assert pool.contexts[s0] == [machine.contexts[s0] for machine in machines]
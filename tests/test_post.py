@@ -0,0 +1,111 @@
+# Copyright (c) 2025 JP Hutchins
+# SPDX-License-Identifier: MIT
+
+from typing import Callable, NamedTuple, Type
+
+import pytest
+
+import spirea.asyncio as hsm_async
+from spirea.sync import (
+	Machine,
+	hsm_machine_handle_entries,
+	hsm_machine_handle_event,
+	hsm_machine_handle_events,
+	hsm_post,
+)
+from tests.machines import Fail, Log, Ping, Relay, entered
+
+
+def test_posted_events_run_after_the_entries() -> None:
+	machine = Machine(Relay, [])
+	# the entry of the root posts a ping
+	assert hsm_machine_handle_entries(machine) is Relay.B
+	assert machine.contexts[Relay] == ["enter A", ("A", 0), "exit A", "enter B"]
+	assert not machine.posted
+
+
+def test_posted_events_run_after_the_step() -> None:
+	machine = entered(Relay, [])
+	machine.contexts[Relay].clear()
+	assert hsm_machine_handle_event(machine, Ping(2)) is Relay.A
+	assert machine.contexts[Relay] == [
+		("B", 2),
+		"exit B",
+		"enter A",
+		("A", 1),
+		"exit A",
+		"enter B",
+		("B", 0),
+		"exit B",
+		"enter A",
+	]
+	assert not machine.posted
+
+
+def test_posted_events_do_not_recurse() -> None:
+	machine = entered(Relay, [])
+	machine.contexts[Relay].clear()
+	assert hsm_machine_handle_events(machine, [Ping(5000)]) is Relay.A
+	assert len(machine.contexts[Relay]) == 3 * 5001
+
+
+def test_posted_events_are_dropped_on_error() -> None:
+	machine = entered(Relay, [])
+	with pytest.raises(RuntimeError):
+		hsm_machine_handle_event(machine, Fail())
+	assert not machine.posted
+	assert machine.node is Relay.B
+
+
+def test_post_needs_a_running_machine() -> None:
+	with pytest.raises(RuntimeError):
+		hsm_post(Ping(0))
+
+
+class Start(NamedTuple): ...
+
+
+class Stop(NamedTuple): ...
+
+
+class Engine(hsm_async.Node[Start | Stop, Log, Log]):
+	@staticmethod
+	def entry(context: Log) -> tuple[Type["Engine.Off"], Log]:
+		return Engine.Off, context
+
+	@staticmethod
+	def exit(context: Log) -> None: ...
+
+	class Off(hsm_async.Node[Start | Stop, Log, Log]):
+		@staticmethod
+		def entry(context: Log) -> tuple[Type["Engine.Off"], Log]:
+			context.append("off")
+			return Engine.Off, context
+
+		@staticmethod
+		def exit(context: Log) -> None: ...
+
+		class EventHandlers:
+			start: Callable[[Start, Log], Type["Engine.On"]] = lambda e, s: Engine.On
+
+	class On(hsm_async.Node[Start | Stop, Log, Log]):
+		@staticmethod
+		@hsm_async.blocking
+		def entry(context: Log) -> tuple[Type["Engine.On"], Log]:
+			context.append("on")
+			hsm_post(Stop())
+			return Engine.On, context
+
+		@staticmethod
+		async def exit(context: Log) -> None: ...
+
+		class EventHandlers:
+			stop: Callable[[Stop, Log], Type["Engine.Off"]] = lambda e, s: Engine.Off
+
+
+@pytest.mark.asyncio
+async def test_async_posted_events() -> None:
+	machine = hsm_async.Machine(Engine, [])
+	await hsm_async.hsm_machine_handle_entries(machine)
+	assert await hsm_async.hsm_machine_handle_event(machine, Start()) is Engine.Off
+	assert machine.contexts[Engine] == ["off", "on", "off"]
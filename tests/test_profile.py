@@ -0,0 +1,70 @@
+# Copyright (c) 2025 JP Hutchins
+# SPDX-License-Identifier: MIT
+
+from typing import Iterator
+
+import pytest
+
+import spirea.asyncio as hsm_async
+from spirea._common import Callback, hsm_set_latency_recorder
+from spirea.profile import HistogramKey, LatencyHistograms
+from spirea.sync import (
+	Machine,
+	hsm_machine_handle_entries,
+	hsm_machine_handle_event,
+	hsm_machine_handle_events,
+)
+from tests.machines import Counting, Login, Logout, Session, Tick
+
+
+@pytest.fixture
+def histograms() -> Iterator[LatencyHistograms]:
+	histograms = LatencyHistograms()
+	previous = hsm_set_latency_recorder(histograms)
+	yield histograms
+	hsm_set_latency_recorder(previous)
+
+
+def totals(histograms: LatencyHistograms) -> dict[HistogramKey, int]:
+	return {key: histogram.total for key, histogram in histograms.snapshot().items()}
+
+
+def test_callbacks_are_timed(histograms: LatencyHistograms) -> None:
+	machine = Machine(Session, "session")
+	hsm_machine_handle_entries(machine)
+	hsm_machine_handle_event(machine, Login())
+	hsm_machine_handle_events(machine, (Logout(), Login()))
+
+	assert totals(histograms) == {
+		HistogramKey(Session, Callback.ENTRY, None): 1,
+		HistogramKey(Session.Idle, Callback.ENTRY, None): 1,
+		HistogramKey(Session.Idle, Callback.HANDLER, Login): 2,
+		HistogramKey(Session.Idle, Callback.EXIT, Login): 2,
+		HistogramKey(Session.Active, Callback.ENTRY, Login): 2,
+		HistogramKey(Session.Active, Callback.HANDLER, Logout): 1,
+		HistogramKey(Session.Active, Callback.EXIT, Logout): 1,
+		HistogramKey(Session.Idle, Callback.ENTRY, Logout): 1,
+	}
+
+	histograms.reset()
+	assert histograms.snapshot() == {}
+
+
+@pytest.mark.asyncio
+async def test_async_callbacks_are_timed(histograms: LatencyHistograms) -> None:
+	machine = hsm_async.Machine(Counting, [])
+	await hsm_async.hsm_machine_handle_entries(machine)
+	await hsm_async.hsm_machine_handle_event(machine, Tick())
+
+	assert totals(histograms) == {
+		HistogramKey(Counting, Callback.ENTRY, None): 1,
+		HistogramKey(Counting, Callback.HANDLER, Tick): 1,
+	}
+
+
+def test_no_histograms_when_disabled() -> None:
+	histograms = LatencyHistograms()
+	machine = Machine(Session, "session")
+	hsm_machine_handle_entries(machine)
+	hsm_machine_handle_event(machine, Login())
+	assert len(histograms) == 0
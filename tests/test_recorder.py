@@ -0,0 +1,38 @@
+# Copyright (c) 2025 JP Hutchins
+# SPDX-License-Identifier: MIT
+
+from pathlib import Path
+
+import pytest
+
+from spirea.recorder import TimeTravelRecorder, hsm_seek
+from tests.machines import EVENT_TYPES, Account, Deposit, Withdraw, entered, sent
+
+
+def test_seek_rebuilds_any_point(tmp_path: Path) -> None:
+	machine = entered(Account, [0])
+	with TimeTravelRecorder(tmp_path, EVENT_TYPES, machine, interval=4) as recorder:
+		for amount in range(1, 11):
+			recorder.handle_event(Deposit(amount))
+			with pytest.raises(ValueError):
+				recorder.handle_event(Withdraw(1000))
+		assert recorder.sequence == 10
+
+	balances = machine.contexts[Account.Open]
+	assert len(balances) == 11
+	sent.clear()
+	for sequence in range(11):
+		rebuilt = hsm_seek(tmp_path, EVENT_TYPES, sequence)
+		assert rebuilt.node is Account.Open
+		assert rebuilt.contexts[Account.Open] == balances[: sequence + 1]
+	assert sent == []
+
+	# one snapshot per interval, no matter how many events were rejected
+	assert (tmp_path / "index").stat().st_size == 3 * 32
+
+	with pytest.raises(IndexError):
+		hsm_seek(tmp_path, EVENT_TYPES, 11)
+	with pytest.raises(IndexError):
+		hsm_seek(tmp_path, EVENT_TYPES, -1)
+	with pytest.raises(FileExistsError):
+		TimeTravelRecorder(tmp_path, EVENT_TYPES, machine)
@@ -0,0 +1,185 @@
+# Copyright (c) 2025 JP Hutchins
+# SPDX-License-Identifier: MIT
+
+import asyncio
+from typing import Awaitable, Callable, NamedTuple, Type
+
+import pytest
+
+import spirea.asyncio as hsm_async
+from spirea.runner import AsyncMachineRunner, AsyncMachineScheduler, Overflow
+from tests.machines import async_entered
+
+
+class Append(NamedTuple):
+	value: int
+
+
+class Fail(NamedTuple): ...
+
+
+in_flight = [0, 0]
+"""The number of append handlers running now and the most that ran at once."""
+
+
+async def append(event: Append, context: list[int]) -> hsm_async.HSMStatus:
+	in_flight[0] += 1
+	in_flight[1] = max(in_flight)
+	await asyncio.sleep(0)
+	context.append(event.value)
+	in_flight[0] -= 1
+	return hsm_async.HSMStatus.NO_TRANSITION
+
+
+async def fail(event: Fail, context: list[int]) -> hsm_async.HSMStatus:
+	raise RuntimeError("fail")
+
+
+class Log(hsm_async.Node[Append | Fail, list[int], list[int]]):
+	@staticmethod
+	async def entry(context: list[int]) -> tuple[Type["Log"], list[int]]:
+		return Log, context
+
+	class EventHandlers:
+		append: Callable[[Append, list[int]], Awaitable[hsm_async.HSMStatus]] = append
+		fail: Callable[[Fail, list[int]], Awaitable[hsm_async.HSMStatus]] = fail
+
+	@staticmethod
+	async def exit(context: list[int]) -> None: ...
+
+
+@pytest.mark.asyncio
+async def test_events_are_handled_in_order() -> None:
+	machine = await async_entered(Log, [])
+	async with AsyncMachineRunner(machine, maxsize=4) as runner:
+		for value in range(20):
+			assert await runner.post(Append(value))
+
+	assert machine.contexts[Log] == list(range(20))
+	stats = runner.stats()
+	assert (stats.depth, stats.handled, stats.dropped, stats.errors) == (0, 20, 0, 0)
+	assert stats.queueing_delay_ns_max >= stats.queueing_delay_ns_mean > 0
+
+
+@pytest.mark.asyncio
+async def test_overflow_policies() -> None:
+	machine = await async_entered(Log, [])
+	blocking = AsyncMachineRunner(machine, maxsize=2)
+	assert blocking.post_nowait(Append(0))
+	assert blocking.post_nowait(Append(1))
+	with pytest.raises(asyncio.QueueFull):
+		blocking.post_nowait(Append(2))
+
+	oldest = AsyncMachineRunner(machine, maxsize=2, overflow=Overflow.DROP_OLDEST)
+	for value in range(5):
+		assert await oldest.post(Append(value))
+	assert (oldest.depth, oldest.dropped) == (2, 3)
+	async with oldest:
+		pass
+	assert machine.contexts[Log] == [3, 4]
+
+	newest = AsyncMachineRunner(machine, maxsize=2, overflow=Overflow.DROP_NEWEST)
+	assert [await newest.post(Append(value)) for value in range(5, 10)] == [
+		True,
+		True,
+		False,
+		False,
+		False,
+	]
+	async with newest:
+		pass
+	assert machine.contexts[Log] == [3, 4, 5, 6]
+
+	with pytest.raises(ValueError):
+		AsyncMachineRunner(machine, overflow=Overflow.DROP_OLDEST)
+
+
+@pytest.mark.asyncio
+async def test_errors_are_counted() -> None:
+	machine = await async_entered(Log, [])
+	async with AsyncMachineRunner(machine) as runner:
+		await runner.post(Fail())
+		await runner.post(Append(1))
+
+	assert machine.contexts[Log] == [1]
+	assert (runner.handled, runner.errors) == (2, 1)
+
+
+@pytest.mark.asyncio
+async def test_stop_finishes_the_current_event() -> None:
+	machine = await async_entered(Log, [])
+	runner = AsyncMachineRunner(machine)
+	for value in range(3):
+		runner.post_nowait(Append(value))
+
+	runner.start()
+	await asyncio.sleep(0)
+	await runner.stop()
+	assert machine.contexts[Log] == [0]
+	assert runner.depth == 2
+
+	async with runner:
+		pass
+	assert machine.contexts[Log] == [0, 1, 2]
+
+
+@pytest.mark.asyncio
+async def test_scheduler_handles_each_machine_in_order() -> None:
+	machines = [await async_entered(Log, []) for _ in range(10)]
+	scheduler = AsyncMachineScheduler(workers=3)
+	for machine in machines:
+		scheduler.add(machine)
+
+	async with scheduler:
+		for value in range(20):
+			for machine in machines:
+				assert await scheduler.post(machine, Append(value))
+
+	for machine in machines:
+		assert machine.contexts[Log] == list(range(20))
+	stats = scheduler.stats()
+	assert (stats.machines, stats.depth, stats.handled, stats.dropped, stats.errors) == (
+		10,
+		0,
+		200,
+		0,
+		0,
+	)
+	assert stats.throughput > 0
+	assert stats.latency_ns_p99 > 0
+
+
+@pytest.mark.asyncio
+async def test_scheduler_is_fair() -> None:
+	handled: list[int] = []
+	chatty = await async_entered(Log, handled)
+	quiet = await async_entered(Log, handled)
+	scheduler = AsyncMachineScheduler(workers=1)
+	scheduler.add(chatty)
+	scheduler.add(quiet)
+
+	for value in range(50):
+		scheduler.post_nowait(chatty, Append(value))
+	scheduler.post_nowait(quiet, Append(100))
+	assert scheduler.depth(chatty) == 50
+
+	async with scheduler:
+		pass
+	assert handled.index(100) == 1
+
+
+@pytest.mark.asyncio
+async def test_scheduler_limits_in_flight_handlers() -> None:
+	machines = [await async_entered(Log, []) for _ in range(8)]
+	scheduler = AsyncMachineScheduler(workers=8, max_in_flight=2)
+	for machine in machines:
+		scheduler.add(machine, maxsize=1, overflow=Overflow.DROP_NEWEST)
+		assert scheduler.post_nowait(machine, Append(0))
+		assert not scheduler.post_nowait(machine, Append(1))
+
+	in_flight[:] = [0, 0]
+	async with scheduler:
+		pass
+	assert in_flight[1] == 2
+	assert scheduler.stats().dropped == 8
+	assert all(machine.contexts[Log] == [0] for machine in machines)
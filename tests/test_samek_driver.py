@@ -0,0 +1,60 @@
+# Copyright (c) 2025 JP Hutchins
+# SPDX-License-Identifier: MIT
+
+import io
+import pstats
+from pathlib import Path
+
+import pytest
+
+from examples.samek.driver import main, parse_script, run_script
+from examples.samek.events import EventA, EventB, EventE, EventG
+from examples.samek.hsm import mock
+
+
+def test_parse_script() -> None:
+	assert parse_script("ab*2 # comment\n\ne g*3") == [
+		EventA(),
+		EventB(),
+		EventA(),
+		EventB(),
+		EventE(),
+		EventG(),
+		EventG(),
+		EventG(),
+	]
+	assert parse_script("# only a comment") == []
+	with pytest.raises(ValueError, match="Line 2"):
+		parse_script("abc\nxyz")
+
+
+def test_run_script_is_silent(capsys: pytest.CaptureFixture[str]) -> None:
+	mock.reset_mock()
+	report = run_script(parse_script("g h*3"))
+	assert capsys.readouterr().out == ""
+	assert report.events == 4
+	assert report.node.__qualname__ == "s0.s2.s21.s211"
+	assert report.context.foo == 1
+	assert report.events_per_sec > 0
+	# the mock of the example records nothing
+	assert mock.mock_calls == []
+
+
+def test_cli_reads_stdin_and_profiles(
+	tmp_path: Path, monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]
+) -> None:
+	monkeypatch.setattr("sys.stdin", io.StringIO("abcdefgh*100\n"))
+	assert main(["-"]) == 0
+	assert capsys.readouterr().out.startswith("800 events in ")
+
+	script = tmp_path / "script.txt"
+	script.write_text("abcdefgh*10")
+	profile = tmp_path / "samek.pstats"
+	assert main([str(script), "--repeat", "3", "--profile", str(profile), "--limit", "5"]) == 0
+	out = capsys.readouterr().out
+	assert "240 events in " in out
+	assert "hsm_handle_event" in out
+	assert any(
+		"hsm_handle_event" in name
+		for name in pstats.Stats(str(profile)).get_stats_profile().func_profiles
+	)
@@ -0,0 +1,58 @@
+# Copyright (c) 2025 JP Hutchins
+# SPDX-License-Identifier: MIT
+
+import random
+from unittest.mock import Mock
+
+import pytest
+
+import spirea.asyncio as hsm_async
+import spirea.sync as hsm
+from examples.samek.driver import MAP_CHAR_TO_EVENT
+from examples.samek.events import Event
+from examples.samek.headless import build, silenced
+from examples.samek.hsm import mock, s0
+from examples.samek.state import Context
+
+EVENTS: list[Event] = [MAP_CHAR_TO_EVENT[random.Random(0).choice("abcdefgh")] for _ in range(500)]
+
+
+def test_headless_machine_matches_the_example(capsys: pytest.CaptureFixture[str]) -> None:
+	mock.reset_mock()
+	s0.set_context(Context(foo=0))
+	node = hsm.hsm_handle_entries(s0)  # type: ignore[type-abstract]
+	expected = []
+	for event in EVENTS:
+		node = hsm.hsm_handle_event(node, event)
+		expected.append(node.__qualname__)
+	printed = capsys.readouterr().out
+
+	recorder = Mock()
+	root = build(hsm.Node, recorder)
+	root._context = Context(foo=0)
+	node = hsm.hsm_handle_entries(root)
+	actual = []
+	for event in EVENTS:
+		node = hsm.hsm_handle_event(node, event)
+		actual.append(node.__qualname__)
+
+	assert actual == expected
+	assert recorder.mock_calls == mock.mock_calls
+	assert capsys.readouterr().out == printed
+
+
+@pytest.mark.asyncio
+async def test_headless_machine_on_the_async_base(capsys: pytest.CaptureFixture[str]) -> None:
+	root = build(hsm_async.Node)
+	assert hsm_async.Node in root.__mro__
+	assert hsm_async.Node in root.s2.s21.s211.__mro__
+
+	root._context = context = Context(foo=0)
+	with silenced():
+		node = await hsm_async.hsm_handle_entries(root)
+		node = await hsm_async.hsm_handle_events(
+			node, [MAP_CHAR_TO_EVENT["g"], MAP_CHAR_TO_EVENT["h"]]
+		)
+	assert capsys.readouterr().out == ""
+	assert node is root.s2.s21.s211
+	assert context.foo == 1
@@ -0,0 +1,68 @@
+# Copyright (c) 2025 JP Hutchins
+# SPDX-License-Identifier: MIT
+
+import random
+
+import pytest
+
+from spirea._common import TIMERS
+from spirea.simulation import Simulation
+from tests.machines import Dial, Hangup, Phone, entered
+
+
+def test_simulation_advances_the_virtual_clock() -> None:
+	simulation = Simulation(resolution=0.01)
+	answered, missed = entered(Phone, []), entered(Phone, [])
+	simulation.schedule(answered, Dial(), delay=10.0)
+	simulation.schedule(answered, Hangup(), delay=10.2)
+	simulation.schedule(missed, Dial(), delay=20.0)
+
+	assert simulation.run(until=10.1) == 1
+	assert simulation.now == pytest.approx(10.1)
+	assert answered.node is Phone.Ringing
+
+	# the hangup cancels the timeout of the answered phone
+	assert simulation.run() == 3
+	assert simulation.now == pytest.approx(20.5)
+	assert answered.contexts[Phone] == ["idle", "ringing", "idle"]
+	assert missed.contexts[Phone] == ["idle", "ringing", "idle"]
+	assert not simulation
+	assert TIMERS.service is None
+
+
+def test_timeouts_are_handled_before_events_of_the_same_tick() -> None:
+	simulation = Simulation(resolution=0.1)
+	phone = entered(Phone, [])
+	simulation.schedule(phone, Dial())
+	simulation.schedule(phone, Hangup(), delay=0.5)
+	simulation.schedule(phone, Dial(), delay=0.5)
+
+	nodes = []
+	for _ in range(4):
+		assert simulation.step()
+		nodes.append(phone.node)
+	assert nodes == [Phone.Ringing, Phone.Idle, Phone.Idle, Phone.Ringing]
+	assert simulation.run(until=0.9) == 0
+	assert simulation.run() == 1
+	assert simulation.handled == 5
+
+
+def test_simulation_runs_days_of_behaviour() -> None:
+	rng = random.Random(17)
+	simulation = Simulation()
+	machines = [entered(Phone, []) for _ in range(100)]
+	day = 24 * 60 * 60.0
+	for machine in machines:
+		for _ in range(100):
+			at = rng.uniform(0, day)
+			simulation.schedule(machine, Dial(), delay=at)
+			if rng.random() < 0.5:
+				simulation.schedule(machine, Hangup(), delay=at + rng.uniform(0, 1.0))
+
+	simulation.run()
+	assert simulation.now <= day + 0.5
+	assert all(machine.node is Phone.Idle for machine in machines)
+	assert len(simulation.timers.wheel) == 0
+
+	with pytest.raises(ValueError):
+		simulation.schedule(machines[0], Dial(), delay=-1.0)
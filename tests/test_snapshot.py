@@ -0,0 +1,85 @@
+# Copyright (c) 2025 JP Hutchins
+# SPDX-License-Identifier: MIT
+
+import pickle
+import time
+from typing import Any, SupportsIndex
+
+from examples.samek.events import EventC, EventH
+from examples.samek.hsm import s0
+from examples.samek.state import Context
+from spirea.snapshot import hsm_get_node_by_state_id, hsm_get_state_id, hsm_restore, hsm_snapshot
+from spirea.sync import Machine, Node, hsm_machine_handle_entries, hsm_machine_handle_event
+from tests.machines import ActiveContext, Login, Logout, Session
+
+
+def test_state_ids_are_stable() -> None:
+	assert hsm_get_state_id(Session.Active) == "tests.machines:Session.Active"
+	assert hsm_get_node_by_state_id("tests.machines:Session.Active") is Session.Active
+	assert hsm_get_node_by_state_id("examples.samek.hsm:s0.s2.s21.s211") is s0.s2.s21.s211
+
+
+def test_restore_does_not_run_entries(capsys) -> None:  # type: ignore[no-untyped-def]
+	machine = Machine(s0, Context(foo=0))
+	hsm_machine_handle_entries(machine)
+	hsm_machine_handle_event(machine, EventC())
+	hsm_machine_handle_event(machine, EventH())
+	capsys.readouterr()
+
+	(restored,) = hsm_restore(hsm_snapshot([machine]))
+	assert capsys.readouterr().out == ""
+	assert restored is not machine
+	assert restored.node is s0.s2.s21.s211
+	assert restored.contexts[s0.s2.s21] == Context(foo=1)
+	assert set(restored.contexts) == {s0, s0.s2, s0.s2.s21, s0.s2.s21.s211}
+
+	# the restored machine continues like the original
+	assert hsm_machine_handle_event(restored, EventH()) is hsm_machine_handle_event(
+		machine, EventH()
+	)
+
+
+class Frame:
+	def __init__(self, data: bytearray | pickle.PickleBuffer) -> None:
+		self.data = data
+
+	def __reduce_ex__(self, protocol: SupportsIndex) -> tuple[type["Frame"], tuple[Any, ...]]:
+		return type(self), (pickle.PickleBuffer(self.data),)
+
+
+class Blob(Node[Login, Frame, Frame]):
+	@staticmethod
+	def entry(context: Frame) -> tuple[type["Blob"], Frame]:
+		return Blob, context
+
+	@staticmethod
+	def exit(context: Frame) -> None: ...
+
+
+def test_large_contexts_are_out_of_band() -> None:
+	machine = Machine(Blob, Frame(bytearray(b"x" * (1 << 20))))
+	hsm_machine_handle_entries(machine)
+	snapshot = hsm_snapshot([machine])
+	assert len(snapshot.data) < 1024
+	assert len(snapshot.buffers) == 1
+	(restored,) = hsm_restore(snapshot)
+	assert memoryview(restored.contexts[Blob].data) == machine.contexts[Blob].data
+
+
+def test_snapshot_many_machines() -> None:
+	machines = [Machine(Session, f"s{i}") for i in range(100_000)]
+	for machine in machines:
+		hsm_machine_handle_entries(machine)
+	for machine in machines[::2]:
+		hsm_machine_handle_event(machine, Login())
+
+	start = time.perf_counter()
+	snapshot = hsm_snapshot(machines)
+	elapsed = time.perf_counter() - start
+	assert elapsed < 1.0
+
+	restored = hsm_restore(snapshot)
+	assert [machine.node for machine in restored] == [machine.node for machine in machines]
+	assert restored[2].contexts[Session.Active] == ActiveContext("s2", 1)
+	assert hsm_machine_handle_event(restored[2], Logout()) is Session.Idle
+	assert restored[2].contexts[Session.Idle] == "s2"
@@ -0,0 +1,204 @@
+# Copyright (c) 2025 JP Hutchins
+# SPDX-License-Identifier: MIT
+
+import random
+from typing import Any, Callable, NamedTuple, Type
+
+import pytest
+
+from spirea._common import hsm_set_trace_hook
+from spirea.sync import (
+	HSMStatus,
+	MachinePool,
+	Node,
+	hsm_pool_handle_entries,
+	hsm_pool_handle_event,
+	pure,
+)
+
+pytest.importorskip("numpy")
+
+from spirea.table import FALLBACK, TransitionTable, hsm_table_handle_event  # noqa: E402
+
+
+class PowerOn(NamedTuple): ...
+
+
+class PowerOff(NamedTuple): ...
+
+
+class Toggle(NamedTuple): ...
+
+
+class Fault(NamedTuple): ...
+
+
+type Event = PowerOn | PowerOff | Toggle | Fault
+
+
+def fault_handler(event: Fault, context: list[str]) -> Type["Device.Faulted"] | HSMStatus:
+	"""Guarded and side-effecting: never compiled."""
+	context.append("fault")
+	return Device.Faulted if len(context) > 1 else HSMStatus.NO_TRANSITION
+
+
+class Device(Node[Event, list[str], list[str]]):
+	@staticmethod
+	@pure
+	def entry(context: list[str]) -> tuple[Type["Device.Off"], list[str]]:
+		return Device.Off, context
+
+	@staticmethod
+	@pure
+	def exit(context: list[str]) -> None: ...
+
+	class EventHandlers:
+		fault: Callable[[Fault, list[str]], Type["Device.Faulted"] | HSMStatus] = fault_handler
+
+	class Off(Node[Event, list[str], list[str]]):
+		@staticmethod
+		@pure
+		def entry(context: list[str]) -> tuple[Type["Device.Off"], list[str]]:
+			return Device.Off, context
+
+		@staticmethod
+		@pure
+		def exit(context: list[str]) -> None: ...
+
+		class EventHandlers:
+			power_on: Callable[[PowerOn, list[str]], Type["Device.On"]] = pure(
+				lambda e, s: Device.On
+			)
+
+	class On(Node[Event, list[str], list[str]]):
+		@staticmethod
+		@pure
+		def entry(context: list[str]) -> tuple[Type["Device.On.Dim"], list[str]]:
+			return Device.On.Dim, context
+
+		@staticmethod
+		@pure
+		def exit(context: list[str]) -> None: ...
+
+		class EventHandlers:
+			power_off: Callable[[PowerOff, list[str]], Type["Device.Off"]] = pure(
+				lambda e, s: Device.Off
+			)
+
+		class Dim(Node[Event, list[str], list[str]]):
+			@staticmethod
+			@pure
+			def entry(context: list[str]) -> tuple[Type["Device.On.Dim"], list[str]]:
+				return Device.On.Dim, context
+
+			@staticmethod
+			@pure
+			def exit(context: list[str]) -> None: ...
+
+			class EventHandlers:
+				toggle: Callable[[Toggle, list[str]], Type["Device.On.Bright"]] = pure(
+					lambda e, s: Device.On.Bright
+				)
+
+		class Bright(Node[Event, list[str], list[str]]):
+			@staticmethod
+			@pure
+			def entry(context: list[str]) -> tuple[Type["Device.On.Bright"], list[str]]:
+				return Device.On.Bright, context
+
+			@staticmethod
+			def exit(context: list[str]) -> None:
+				context.append("bright exit")
+
+			class EventHandlers:
+				toggle: Callable[[Toggle, list[str]], Type["Device.On.Dim"]] = pure(
+					lambda e, s: Device.On.Dim
+				)
+
+	class Faulted(Node[Event, list[str], list[str]]):
+		@staticmethod
+		@pure
+		def entry(context: list[str]) -> tuple[Type["Device.Faulted"], list[str]]:
+			return Device.Faulted, context
+
+		@staticmethod
+		@pure
+		def exit(context: list[str]) -> None: ...
+
+		class EventHandlers:
+			reset: Callable[[PowerOff, list[str]], Type["Device.Off"]] = pure(
+				lambda e, s: Device.Off
+			)
+
+
+TABLE = TransitionTable(Device, (PowerOn, PowerOff, Toggle, Fault))
+
+
+def cell(node: Any, event_type: type) -> int:
+	return int(TABLE.matrix[node._id - TABLE.base, TABLE.columns[event_type]])
+
+
+def test_pure_transitions_are_compiled() -> None:
+	assert cell(Device.Off, PowerOn) == Device.On.Dim._id
+	assert cell(Device.Off, Toggle) == Device.Off._id
+	assert cell(Device.On.Dim, Toggle) == Device.On.Bright._id
+	assert cell(Device.On.Dim, PowerOn) == Device.On.Dim._id
+	assert cell(Device.On.Dim, PowerOff) == Device.Off._id
+	assert cell(Device.Faulted, PowerOn) == Device.Faulted._id
+	assert cell(Device.Faulted, PowerOff) == Device.Off._id
+
+
+def test_side_effects_and_guards_fall_back() -> None:
+	# Bright has an impure exit
+	assert cell(Device.On.Bright, Toggle) == FALLBACK
+	assert cell(Device.On.Bright, PowerOff) == FALLBACK
+	# the fault handler is guarded
+	for node in (Device.Off, Device.On.Dim, Device.Faulted):
+		assert cell(node, Fault) == FALLBACK
+
+
+def test_table_matches_python_engine() -> None:
+	size = 200
+	table_pool = MachinePool(Device, size, ([] for _ in range(size)))
+	python_pool = MachinePool(Device, size, ([] for _ in range(size)))
+	hsm_pool_handle_entries(table_pool)
+	hsm_pool_handle_entries(python_pool)
+
+	rng = random.Random(0)
+	events = (PowerOn(), PowerOff(), Toggle(), Fault())
+	for _ in range(100):
+		event = rng.choice(events)
+		indices = rng.sample(range(size), rng.randrange(1, size))
+		hsm_table_handle_event(TABLE, table_pool, event, indices)
+		hsm_pool_handle_event(python_pool, event, indices)
+		assert table_pool.states == python_pool.states
+
+	assert table_pool.contexts == python_pool.contexts
+	assert len(table_pool.group_by_state()) > 1
+
+
+def test_hooks_take_the_python_engine() -> None:
+	size = 20
+	table_pool = MachinePool(Device, size, ([] for _ in range(size)))
+	python_pool = MachinePool(Device, size, ([] for _ in range(size)))
+	hsm_pool_handle_entries(table_pool)
+	hsm_pool_handle_entries(python_pool)
+
+	table_traces: list[tuple[Any, ...]] = []
+	python_traces: list[tuple[Any, ...]] = []
+	events = (PowerOn(), Toggle(), PowerOff())
+
+	previous = hsm_set_trace_hook(lambda *args: table_traces.append(args))
+	try:
+		for event in events:
+			hsm_table_handle_event(TABLE, table_pool, event)
+		hsm_set_trace_hook(lambda *args: python_traces.append(args))
+		for event in events:
+			hsm_pool_handle_event(python_pool, event)
+	finally:
+		hsm_set_trace_hook(previous)
+
+	# the instances in the compiled cells are traced too
+	assert len(table_traces) == len(events) * size
+	assert table_traces == python_traces
+	assert table_pool.states == python_pool.states
@@ -0,0 +1,248 @@
+# Copyright (c) 2025 JP Hutchins
+# SPDX-License-Identifier: MIT
+
+import asyncio
+import random
+import threading
+from typing import Callable, Type
+
+import pytest
+
+import spirea.asyncio as hsm_async
+from spirea._common import hsm_set_timeout_service
+from spirea.sync import Machine, hsm_machine_handle_entries, hsm_machine_handle_event
+from spirea.timers import (
+	BITS,
+	LEVELS,
+	AsyncTimerService,
+	Timer,
+	TimerService,
+	TimingWheel,
+	hsm_arm_timeout,
+)
+from tests.machines import Dial, Expire, Hangup, Phone
+
+
+def test_wheel_expires_timers_in_order() -> None:
+	rng = random.Random(16)
+	wheel = TimingWheel(current=rng.randrange(1 << 20))
+	start = wheel.current
+	machine = Machine(Phone, [])
+	timers = [
+		Timer(
+			start + 1 + rng.randrange(1 << rng.randrange(1, BITS * LEVELS + 4)), machine, Phone, i
+		)
+		for i in range(2000)
+	]
+	for timer in timers:
+		wheel.schedule(timer)
+	cancelled = set(rng.sample(range(len(timers)), 200))
+	for i in cancelled:
+		wheel.cancel(timers[i])
+	assert len(wheel) == len(timers) - len(cancelled)
+
+	expired: list[Timer] = []
+	tick = start
+	while wheel.count:
+		tick += rng.randrange(1, 1 << rng.randrange(1, BITS * LEVELS + 4))
+		for timer in wheel.advance(tick):
+			assert start < timer.deadline <= tick
+			expired.append(timer)
+		assert wheel.current == tick
+
+	assert sorted((timer.deadline, timer.event) for timer in expired) == sorted(
+		(timer.deadline, timer.event) for timer in timers if timer.event not in cancelled
+	)
+	assert [timer.deadline for timer in expired] == sorted(timer.deadline for timer in expired)
+	assert len(expired) == len(timers) - len(cancelled)
+	assert all(timer.slot is None for timer in timers)
+
+
+def test_wheel_rejects_past_deadlines() -> None:
+	wheel = TimingWheel(current=10)
+	with pytest.raises(ValueError):
+		wheel.schedule(Timer(10, Machine(Phone, []), Phone, None))
+
+
+def test_timeouts_expire() -> None:
+	service = TimerService(resolution=0.01)
+	previous = hsm_set_timeout_service(service)
+	try:
+		machines = [Machine(Phone, []) for _ in range(3)]
+		for machine in machines:
+			hsm_machine_handle_entries(machine)
+
+		hsm_machine_handle_event(machines[0], Dial())
+		assert service.tick(0.3) == 0
+		hsm_machine_handle_event(machines[1], Dial())
+		hsm_machine_handle_event(machines[2], Dial())
+		assert len(service.wheel) == 3
+
+		assert service.tick(0.5) == 1
+		assert [machine.node for machine in machines] == [
+			Phone.Idle,
+			Phone.Ringing,
+			Phone.Ringing,
+		]
+
+		# the exit of the node cancels its timeout
+		hsm_machine_handle_event(machines[1], Hangup())
+		assert len(service.wheel) == 1
+		assert service.tick(10.0) == 1
+		assert [machine.node for machine in machines] == [Phone.Idle] * 3
+		assert machines[0].contexts[Phone] == ["idle", "ringing", "idle"]
+	finally:
+		hsm_set_timeout_service(previous)
+
+
+def test_rearming_replaces_the_timeout() -> None:
+	service = TimerService(resolution=0.01)
+	previous = hsm_set_timeout_service(service)
+	try:
+		machine = Machine(Phone, [])
+		hsm_machine_handle_entries(machine)
+		hsm_machine_handle_event(machine, Dial())
+		service.tick(0.4)
+		service.arm(machine, Phone.Ringing, 0.5, Expire())
+		assert len(service.wheel) == 1
+		assert service.tick(0.8) == 0
+		assert service.tick(0.9) == 1
+		assert machine.node is Phone.Idle
+	finally:
+		hsm_set_timeout_service(previous)
+
+
+def test_a_failed_delivery_does_not_drop_the_others(caplog: pytest.LogCaptureFixture) -> None:
+	delivered: list[Machine] = []
+
+	def deliver(machine: Machine, event: object) -> None:
+		delivered.append(machine)
+		if machine is machines[0]:
+			raise RuntimeError("delivery failed")
+
+	service = TimerService(resolution=0.01, deliver=deliver)
+	machines = [Machine(Phone, []) for _ in range(3)]
+	for machine in machines:
+		service.arm(machine, Phone.Ringing, 0.5, Expire())
+
+	assert service.tick(1.0) == 3
+	assert delivered == machines
+	assert len(service.wheel) == 0
+	assert "delivery failed" in caplog.text
+	# the timeouts are no longer armed
+	service.cancel(machines[1], Phone.Ringing)
+	assert service.tick(2.0) == 0
+
+
+def test_arming_needs_a_service_and_a_machine() -> None:
+	with pytest.raises(RuntimeError):
+		hsm_arm_timeout(Phone.Ringing, 1.0, Expire())
+
+	previous = hsm_set_timeout_service(TimerService())
+	try:
+		with pytest.raises(RuntimeError):
+			hsm_arm_timeout(Phone.Ringing, 1.0, Expire())
+	finally:
+		hsm_set_timeout_service(previous)
+
+
+def expired(event: Expire, context: list[str]) -> hsm_async.HSMStatus:
+	context.append("expired")
+	return hsm_async.HSMStatus.NO_TRANSITION
+
+
+class Wait(hsm_async.Node[Dial | Expire, list[str], list[str]]):
+	@staticmethod
+	async def entry(context: list[str]) -> tuple[Type["Wait"], list[str]]:
+		return Wait, context
+
+	@staticmethod
+	async def exit(context: list[str]) -> None: ...
+
+	class EventHandlers:
+		dial: Callable[[Dial, list[str]], hsm_async.HSMStatus] = lambda e, s: (
+			hsm_arm_timeout(Wait, 0.02, Expire()) and hsm_async.HSMStatus.NO_TRANSITION
+		)
+		expire: Callable[[Expire, list[str]], hsm_async.HSMStatus] = expired
+
+
+@pytest.mark.asyncio
+async def test_async_timeouts_expire_on_the_loop() -> None:
+	delivered: asyncio.Queue[tuple[hsm_async.Machine, object]] = asyncio.Queue()
+	service = AsyncTimerService(lambda machine, event: delivered.put_nowait((machine, event)))
+	previous = hsm_set_timeout_service(service)
+	try:
+		machine = hsm_async.Machine(Wait, [])
+		await hsm_async.hsm_machine_handle_entries(machine)
+		await hsm_async.hsm_machine_handle_event(machine, Dial())
+		assert delivered.empty()
+
+		target, event = await asyncio.wait_for(delivered.get(), 1.0)
+		assert target is machine
+		await hsm_async.hsm_machine_handle_event(machine, event)
+		assert machine.contexts[Wait] == ["expired"]
+		assert len(service.service.wheel) == 0
+	finally:
+		service.close()
+		hsm_set_timeout_service(previous)
+
+
+@pytest.mark.asyncio
+async def test_async_service_survives_a_failed_delivery() -> None:
+	delivered: asyncio.Queue[str] = asyncio.Queue()
+
+	def deliver(machine: hsm_async.Machine, event: object) -> None:
+		delivered.put_nowait(machine.contexts[Wait][0])
+		if machine.contexts[Wait][0] == "first":
+			raise RuntimeError("delivery failed")
+
+	service = AsyncTimerService(deliver)
+	try:
+		service.arm(hsm_async.Machine(Wait, ["first"]), Wait, 0.01, Expire())
+		service.arm(hsm_async.Machine(Wait, ["second"]), Wait, 0.05, Expire())
+		assert await asyncio.wait_for(delivered.get(), 1.0) == "first"
+		# the loop callback was rescheduled for the later timeout
+		assert await asyncio.wait_for(delivered.get(), 1.0) == "second"
+		assert len(service.service.wheel) == 0
+	finally:
+		service.close()
+
+
+class Kiln(hsm_async.Node[Dial | Expire, list[str], list[str]]):
+	@staticmethod
+	@hsm_async.blocking
+	def entry(context: list[str]) -> tuple[Type["Kiln"], list[str]]:
+		context.append(threading.current_thread().name)
+		hsm_arm_timeout(Kiln, 0.01, Expire())
+		return Kiln, context
+
+	@staticmethod
+	async def exit(context: list[str]) -> None: ...
+
+	class EventHandlers:
+		expire: Callable[[Expire, list[str]], hsm_async.HSMStatus] = expired
+
+
+@pytest.mark.asyncio
+async def test_blocking_entry_arms_on_the_loop_thread() -> None:
+	# in debug mode, the loop raises if it is scheduled from another thread
+	loop = asyncio.get_running_loop()
+	debug = loop.get_debug()
+	loop.set_debug(True)
+	delivered: asyncio.Queue[tuple[hsm_async.Machine, object]] = asyncio.Queue()
+	service = AsyncTimerService(lambda machine, event: delivered.put_nowait((machine, event)))
+	previous = hsm_set_timeout_service(service)
+	try:
+		machine = hsm_async.Machine(Kiln, [])
+		await hsm_async.hsm_machine_handle_entries(machine)
+		assert machine.contexts[Kiln] != [threading.current_thread().name]
+		assert len(service.service.wheel) == 1
+
+		target, event = await asyncio.wait_for(delivered.get(), 1.0)
+		assert target is machine
+		assert event == Expire()
+		assert len(service.service.wheel) == 0
+	finally:
+		service.close()
+		hsm_set_timeout_service(previous)
+		loop.set_debug(debug)
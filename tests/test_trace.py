@@ -0,0 +1,79 @@
+# Copyright (c) 2025 JP Hutchins
+# SPDX-License-Identifier: MIT
+
+import logging
+from typing import Any, Iterator
+
+import pytest
+
+from examples.samek.events import EventA, EventC, EventD, EventE
+from examples.samek.hsm import s0
+from examples.samek.state import Context
+from spirea._common import TRACE, HSMStatus, hsm_log_trace, hsm_set_trace_hook
+from spirea.sync import Machine, hsm_machine_handle_entries, hsm_machine_handle_events
+from spirea.trace import TraceRecord, TraceRingBuffer
+
+type Step = tuple[Any, Any, Any, Any]
+
+
+@pytest.fixture
+def steps() -> Iterator[list[Step]]:
+	steps: list[Step] = []
+	previous = hsm_set_trace_hook(lambda *step: steps.append(step))
+	yield steps
+	hsm_set_trace_hook(previous)
+
+
+def test_trace_hook_gets_each_step(steps: list[Step]) -> None:
+	machine = Machine(s0, Context(foo=0))
+	hsm_machine_handle_entries(machine)
+
+	# A is a self-transition of s1, C is handled by s1, D by s211, E by s0
+	events = (EventA(), EventC(), EventD(), EventE())
+	hsm_machine_handle_events(machine, events)
+
+	assert [(source, handling_node, result) for source, _, handling_node, result in steps] == [
+		(s0.s1.s11, s0.s1, HSMStatus.SELF_TRANSITION),
+		(s0.s1.s11, s0.s1, s0.s2),
+		(s0.s2.s21.s211, s0.s2.s21.s211, s0.s2.s21),
+		(s0.s2.s21, s0, s0.s2.s21.s211),
+	]
+	assert [event for _, event, _, _ in steps] == list(events)
+
+
+def test_no_hook_by_default() -> None:
+	assert TRACE.hook is None
+
+
+def test_log_trace(caplog: pytest.LogCaptureFixture) -> None:
+	with caplog.at_level(logging.DEBUG, logger="spirea"):
+		hsm_log_trace(s0.s1.s11, EventA(), s0.s1, HSMStatus.SELF_TRANSITION)
+		hsm_log_trace(s0.s1.s11, EventC(), s0.s1, s0.s2)
+		hsm_log_trace(s0.s1.s11, EventE(), s0, HSMStatus.EVENT_UNHANDLED)
+	assert [record.getMessage() for record in caplog.records] == [
+		"Self-transition for EventA() in state s1",
+		"Transition for EventC() from state s11 to s2 in state s1",
+		"Unhandled event EventE() in state s11, reached root state s0",
+	]
+
+
+def test_ring_buffer_keeps_the_last_steps() -> None:
+	ring = TraceRingBuffer(3, clock=iter(range(100)).__next__)
+	previous = hsm_set_trace_hook(ring)
+	try:
+		machine = Machine(s0, Context(foo=0))
+		hsm_machine_handle_entries(machine)
+		hsm_machine_handle_events(machine, (EventA(), EventC(), EventD(), EventE(), EventA()))
+	finally:
+		hsm_set_trace_hook(previous)
+
+	assert len(ring) == 3
+	assert ring.count == 5
+	assert ring.dump() == [
+		TraceRecord(2, s0.s2.s21.s211, EventD, s0.s2.s21.s211, s0.s2.s21),
+		TraceRecord(3, s0.s2.s21, EventE, s0, s0.s2.s21.s211),
+		TraceRecord(4, s0.s2.s21.s211, EventA, s0, HSMStatus.EVENT_UNHANDLED),
+	]
+
+	ring.clear()
+	assert ring.dump() == []
@@ -0,0 +1,98 @@
+# Copyright (c) 2025 JP Hutchins
+# SPDX-License-Identifier: MIT
+
+from typing import Type
+
+from examples.samek.events import EventC, EventD
+from examples.samek.hsm import s0
+from examples.samek.state import Context
+from spirea._common import (
+	TransitionPlan,
+	hsm_get_lca,
+	hsm_get_node_lca,
+	hsm_get_path_to_root,
+	hsm_get_transition_plan,
+)
+from spirea.sync import Node, hsm_handle_entries, hsm_handle_event
+
+
+def test_ancestry_is_precomputed() -> None:
+	assert s0._depth == 0
+	assert s0._ancestors == (s0,)
+	assert s0.s2.s21.s211._depth == 3
+	assert s0.s2.s21.s211._ancestors == (s0.s2.s21.s211, s0.s2.s21, s0.s2, s0)
+	assert hsm_get_path_to_root(s0.s1) == (s0.s1, s0, None)  # type: ignore[type-abstract, comparison-overlap]
+
+
+def test_node_lca_matches_path_lca() -> None:
+	nodes = (s0, s0.s1, s0.s1.s11, s0.s2, s0.s2.s21, s0.s2.s21.s211)
+	for node1 in nodes:
+		for node2 in nodes:
+			assert hsm_get_node_lca(node1, node2) is hsm_get_lca(
+				hsm_get_path_to_root(node1), hsm_get_path_to_root(node2)
+			)
+
+
+class Idle(Node[object, None, None]):
+	@staticmethod
+	def entry(context: None) -> tuple[Type["Idle"], None]:
+		return Idle, None
+
+	@staticmethod
+	def exit(context: None) -> None: ...
+
+
+class Broken(Node[object, None, None]):
+	@staticmethod
+	def entry(context: None) -> tuple[Type["Broken"], None]:
+		return Broken, None
+
+	@staticmethod
+	def exit(context: None) -> None: ...
+
+
+def test_node_lca_of_unrelated_roots() -> None:
+	assert hsm_get_node_lca(Idle, Broken) is None  # type: ignore[type-abstract]
+	assert hsm_get_transition_plan(Idle, Idle, Broken) == TransitionPlan(  # type: ignore[type-abstract]
+		exits=(Idle,), lca=None, entries=(Broken,)
+	)
+
+
+def test_plan_to_sibling_substate() -> None:
+	plan = hsm_get_transition_plan(s0.s1.s11, s0.s1, s0.s2)  # type: ignore[type-abstract]
+	assert plan == TransitionPlan(
+		exits=(s0.s1.s11, s0.s1),
+		lca=s0,
+		entries=(s0.s2,),
+	)
+
+
+def test_plan_to_superstate() -> None:
+	plan = hsm_get_transition_plan(s0.s2.s21.s211, s0.s2.s21.s211, s0.s2.s21)  # type: ignore[type-abstract]
+	assert plan == TransitionPlan(exits=(s0.s2.s21.s211,), lca=s0.s2.s21, entries=())
+
+
+def test_plan_depends_on_handling_node() -> None:
+	# handled in s1, the transition to s11 exits down to s1
+	plan = hsm_get_transition_plan(s0.s1.s11, s0.s1, s0.s1.s11)  # type: ignore[type-abstract]
+	assert plan == TransitionPlan(exits=(s0.s1.s11,), lca=s0.s1, entries=(s0.s1.s11,))
+
+	# handled in s11, the same target does not leave s11
+	plan = hsm_get_transition_plan(s0.s1.s11, s0.s1.s11, s0.s1.s11)  # type: ignore[type-abstract]
+	assert plan == TransitionPlan(exits=(), lca=s0.s1.s11, entries=())
+
+
+def test_plans_are_memoized() -> None:
+	context = Context(foo=0)
+	s0._context = context
+	node = hsm_handle_entries(s0)  # type: ignore[type-abstract]
+	assert node is s0.s1.s11
+
+	node = hsm_handle_event(node, EventC())
+	assert node is s0.s2.s21.s211
+	plan = s0.s1.s11._transition_plans[s0.s1, s0.s2]
+	assert hsm_get_transition_plan(s0.s1.s11, s0.s1, s0.s2) is plan  # type: ignore[type-abstract]
+
+	node = hsm_handle_event(node, EventD())
+	assert node is s0.s2.s21
+	assert (s0.s2.s21.s211, s0.s2.s21) in s0.s2.s21.s211._transition_plans